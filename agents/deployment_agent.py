@@ -1,12 +1,13 @@
 # agents/deployment_agents.py
 
 from crewai import Agent
+from utils.llm_gateway import get_llm, DEFAULT_MODEL
 import logging
 
 def create_deployment_agents():
     """Tạo agent cho giai đoạn Deployment."""
 
-    model_string = "gemini/gemini-1.5-flash-latest"
+    model_string = DEFAULT_MODEL
     logging.info(f"Configuring Deployment Agents with LLM: {model_string}")
 
     # Agent cho Deployment (dựa trên bảng trong Structure_MAS.docx)
@@ -15,7 +16,7 @@ def create_deployment_agents():
         role='DevOps Engineer',
         goal='Tạo kế hoạch triển khai, tài liệu bàn giao sản phẩm và thiết lập giám sát hệ thống.',
         backstory='Bạn là một kỹ sư DevOps giàu kinh nghiệm với hơn 10 năm trong việc tự động hóa và quản lý các quy trình triển khai phần mềm, đảm bảo hệ thống vận hành ổn định và hiệu quả sau khi Go-Live.',
-        llm=model_string,
+        llm=get_llm(model_string),
         allow_delegation=False,
         verbose=True
     )
@@ -1,10 +1,11 @@
 from crewai import Agent
+from utils.llm_gateway import get_llm, DEFAULT_MODEL
 import logging
 
 def create_development_agent():
     """Tạo Agent cho Giai đoạn 4: PHÁT TRIỂN trong SDLC."""
 
-    model_string = "gemini/gemini-1.5-flash-latest" # Chèn chuỗi mô hình LLM tại đây, ví dụ: "gpt-3.5-turbo" hoặc "gpt-4
+    model_string = DEFAULT_MODEL
     logging.info(f"Khởi tạo Development Agent với LLM: {model_string}")
 
     development_agent = Agent(
@@ -19,7 +20,7 @@ def create_development_agent():
             "Bạn hiểu sâu sắc về vòng đời phát triển phần mềm, kiểm soát mã nguồn, kiểm thử đơn vị, xây dựng CI/CD pipeline, và viết tài liệu kỹ thuật rõ ràng. "
             "Bạn đảm nhiệm việc đảm bảo chất lượng, hiệu quả và sự phối hợp giữa các bên liên quan trong giai đoạn phát triển."
         ),
-        llm=model_string,
+        llm=get_llm(model_string),
         allow_delegation=False,
         verbose=True
     )
@@ -1,9 +1,10 @@
 from crewai import Agent
+from utils.llm_gateway import get_llm, DEFAULT_MODEL
 import logging
 
 def create_initiation_agents():
     """Tạo các agent cho giai đoạn Khởi tạo Dự án."""
-    model_string = "gemini/gemini-1.5-flash-latest"
+    model_string = DEFAULT_MODEL
     logging.info(f"Cấu hình các Agent Khởi tạo với LLM: {model_string}")
     
     initiation_agent = Agent(
@@ -19,7 +20,7 @@ def create_initiation_agents():
         Bạn có sự kết hợp hiếm có giữa tầm nhìn chiến lược, sự nhạy bén về tài chính và kỷ luật quản lý dự án. 
         Bạn nổi tiếng với khả năng biến một ý tưởng sơ khai thành một dự án được định nghĩa rõ ràng, 
         được chứng minh là khả thi và được phê duyệt chính thức, tạo ra nền móng vững chắc cho mọi công việc trong tương lai.""",
-        llm=model_string,
+        llm=get_llm(model_string),
         allow_delegation=False,
         verbose=True
     )
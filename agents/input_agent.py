@@ -1,6 +1,7 @@
 from crewai import Agent
+from utils.llm_gateway import get_llm, DEFAULT_MODEL
 def create_input_agent():
-    model_string = "gemini/gemini-1.5-flash-latest"
+    model_string = DEFAULT_MODEL
 
     input_agent = Agent(
         role="Chuyên Gia Phân Tích Nghiệp Vụ (Business Analyst)",
@@ -12,7 +13,7 @@ def create_input_agent():
             "Khả năng của bạn là đặt những câu hỏi sâu sắc, đúng trọng tâm để khám phá mọi khía cạnh "
             "của dự án, từ mục tiêu kinh doanh đến các chi tiết kỹ thuật phức tạp."
         ),
-        llm=model_string,
+        llm=get_llm(model_string),
         allow_delegation=False,
         verbose=True
     )
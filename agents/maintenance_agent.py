@@ -1,12 +1,13 @@
 # agents/maintenance_agents.py
 
 from crewai import Agent
+from utils.llm_gateway import get_llm, DEFAULT_MODEL
 import logging
 
 def create_maintenance_agents():
     """Tạo agent cho giai đoạn Maintenance."""
 
-    model_string = "gemini/gemini-1.5-flash-latest"
+    model_string = DEFAULT_MODEL
     logging.info(f"Configuring Maintenance Agents with LLM: {model_string}")
 
     # Agent cho Maintenance (dựa trên bảng trong Structure_MAS.docx)
@@ -15,7 +16,7 @@ def create_maintenance_agents():
         role='Site Reliability Engineer',
         goal='Đảm bảo hệ thống hoạt động ổn định, thực hiện bảo trì định kỳ, xử lý các yêu cầu thay đổi và cung cấp hỗ trợ sau triển khai.',
         backstory='Bạn là một kỹ sư tin cậy hệ thống (SRE) chuyên nghiệp với hơn 10 năm kinh nghiệm, tập trung vào việc tối ưu hóa hiệu suất, khả năng mở rộng và độ tin cậy của các hệ thống sản xuất.',
-        llm=model_string,
+        llm=get_llm(model_string),
         allow_delegation=False,
         verbose=True
     )
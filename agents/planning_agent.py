@@ -1,9 +1,10 @@
 from crewai import Agent
+from utils.llm_gateway import get_llm, DEFAULT_MODEL
 import logging
 
 def create_planning_agents():
     """Tạo các agent cho giai đoạn Lập kế hoạch Dự án."""
-    model_string = "gemini/gemini-1.5-flash-latest"
+    model_string = DEFAULT_MODEL
     logging.info(f"Cấu hình các Agent Lập kế hoạch với LLM: {model_string}")
     
     planning_agent = Agent(
@@ -18,7 +19,7 @@ def create_planning_agents():
         Với khả năng nhìn xa trông rộng, bạn có thể phân rã các mục tiêu cấp cao thành các nhiệm vụ cụ thể (WBS), 
         sắp xếp chúng thành một lịch trình hợp lý, ước tính chi phí chính xác, lường trước các rủi ro, và thiết lập một kế hoạch giao tiếp hiệu quả. 
         Bạn là người điều phối để mọi khía cạnh của kế hoạch hoạt động hài hòa như một bản giao hưởng được dàn dựng công phu.""",
-        llm=model_string,
+        llm=get_llm(model_string),
         allow_delegation=False, # Có thể đặt là True nếu có các agent chuyên biệt hơn (vd: Risk Analyst, Scheduler)
         verbose=True
     )
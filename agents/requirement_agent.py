@@ -1,4 +1,5 @@
 from crewai import Agent
+from utils.llm_gateway import get_llm, DEFAULT_MODEL
 import logging
 
 def create_requirement_agents():
@@ -6,7 +7,7 @@ def create_requirement_agents():
     Tạo các agent cho Giai đoạn 2: Phân tích Yêu cầu (Requirements).
     """
 
-    model_string = "gemini/gemini-1.5-flash-latest"
+    model_string = DEFAULT_MODEL
 
     requirement_agent = Agent(
         role='Senior Requirement Analyst / Business Analyst',
@@ -24,7 +25,7 @@ def create_requirement_agents():
             'mô hình hóa quy trình (sử dụng UML/BPMN), và viết các tài liệu yêu cầu cực kỳ rõ ràng, không mơ hồ. '
             'Nhiệm vụ của bạn là đảm bảo rằng những gì đội ngũ phát triển xây dựng chính xác là những gì khách hàng cần.'
         ),
-        llm=model_string,
+        llm=get_llm(model_string),
         allow_delegation=True, 
         verbose=True
     )
@@ -1,10 +1,11 @@
 from crewai import Agent
+from utils.llm_gateway import get_llm, DEFAULT_MODEL
 import logging
 
 def create_testing_agents():
     """Tạo Agent cho Giai đoạn 5: KIỂM THỬ trong SDLC."""
 
-    model_string = "gemini/gemini-1.5-flash-latest"  # Hoặc "gpt-4", "claude-3-sonnet", tùy mô hình bạn đang sử dụng
+    model_string = DEFAULT_MODEL
 
     logging.info(f"Khởi tạo Testing Agent với LLM: {model_string}")
 
@@ -22,7 +23,7 @@ def create_testing_agents():
             "sử dụng thành thạo các công cụ kiểm thử như Selenium, Postman, Pytest, JUnit và tích hợp CI/CD với Jenkins hoặc GitHub Actions. "
             "Bạn hiểu rõ mô hình kiểm thử Agile, có khả năng đánh giá coverage, traceability, và phối hợp hiệu quả với các Developer và Product Owner."
         ),
-        llm=model_string,
+        llm=get_llm(model_string),
         allow_delegation=False,
         verbose=True
     )
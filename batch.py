@@ -0,0 +1,245 @@
+# batch.py
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_BATCH_OUTPUT_DIR = "batch_output"
+
+
+def read_requests(jsonl_path: str):
+    """
+    Đọc lần lượt từng system request trong file JSONL (một JSON mỗi dòng) mà không nạp cả file.
+
+    Mỗi dòng cần có `system_request` (hoặc `body`); định danh lấy từ `id` / `request_id`,
+    nếu không có thì dùng số dòng. Định danh là tên thư mục của dự án nên được chuẩn hóa
+    (`_safe_project_id`); định danh trùng với dòng trước được thêm hậu tố "-<số dòng>".
+    """
+    seen = set()
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                logging.error(f"Dòng {line_no} không phải JSON hợp lệ, bỏ qua: {e}")
+                continue
+            system_request = item.get("system_request") or item.get("body")
+            if not system_request:
+                logging.error(f"Dòng {line_no} thiếu 'system_request', bỏ qua.")
+                continue
+            raw_id = str(item.get("id") or item.get("request_id") or "")
+            project_id = _safe_project_id(raw_id) or f"request_{line_no:04d}"
+            while project_id.lower() in seen:
+                project_id = f"{project_id}-{line_no}"
+            if raw_id and project_id != raw_id:
+                logging.warning(f"Dòng {line_no}: định danh '{raw_id}' được đổi thành '{project_id}'.")
+            seen.add(project_id.lower())
+            yield project_id, system_request
+
+
+def _safe_project_id(raw_id: str) -> str:
+    """
+    Chuyển định danh thành một tên thư mục an toàn: chỉ giữ chữ, số, '.', '-', '_' và bỏ dấu chấm ở hai đầu,
+    nên không thể là đường dẫn tuyệt đối, '..' hay trỏ ra ngoài thư mục batch. Trả về "" nếu không còn gì.
+    """
+    return re.sub(r"[^\w.-]+", "_", raw_id).strip("._")[:100]
+
+
+def llm_limits_per_process(max_processes: int) -> dict:
+    """
+    Chia quota của provider cho các tiến trình worker.
+
+    Rate limiter và concurrency thích ứng của LLMGateway nằm trong từng tiến trình, nên mỗi worker chỉ
+    được dùng 1/`max_processes` của MAS_LLM_RPM, MAS_LLM_TPM và MAS_LLM_MAX_CONCURRENCY để tổng các worker
+    không vượt quota. Phần quota của worker đang rảnh không được chia lại cho worker khác.
+    """
+    limits = {}
+    for name, default in (("MAS_LLM_RPM", 15), ("MAS_LLM_TPM", 1_000_000), ("MAS_LLM_MAX_CONCURRENCY", 8)):
+        limits[name] = str(max(1, int(os.getenv(name, default)) // max_processes))
+    return limits
+
+
+def shared_cache_env(output_dir: str) -> dict:
+    """
+    Đường dẫn tuyệt đối của các cache dùng chung giữa các dự án trong batch.
+
+    Build cache và cache response LLM dùng chung: các task không phụ thuộc system request (template) chỉ sinh một lần.
+    Entry của build cache chỉ chứa hash, nên kho blob và từ điển nén cũng phải dùng chung; mọi đường dẫn
+    được chuyển thành tuyệt đối vì mỗi worker chuyển vào thư mục dự án của nó. Giá trị đã đặt sẵn trong
+    môi trường được giữ nguyên.
+    """
+    env = {}
+    for name, default in (("MAS_BUILD_CACHE_DIR", "build"), ("MAS_LLM_CACHE_PATH", "llm_responses.sqlite"),
+                          ("MAS_BLOB_DIR", "blobs"), ("MAS_COMPRESSION_DICT_DIR", "zdict")):
+        env[name] = os.path.abspath(os.getenv(name) or os.path.join(output_dir, ".cache", default))
+    return env
+
+
+@contextmanager
+def _project_context(project_dir: str, env: dict):
+    """Đặt `env` vào biến môi trường và chuyển vào `project_dir`; khôi phục cả hai khi ra khỏi khối `with`."""
+    saved_env = {name: os.environ.get(name) for name in env}
+    saved_cwd = os.getcwd()
+    os.environ.update(env)
+    os.makedirs(project_dir, exist_ok=True)
+    os.chdir(project_dir)
+    try:
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _run_project(project_id: str, system_request: str, project_dir: str, max_workers: int,
+                 env: dict = None) -> dict:
+    """
+    Chạy một dự án trong tiến trình worker riêng.
+
+    Tiến trình chuyển vào thư mục của dự án nên mọi đường dẫn tương đối (output/, runs/) và
+    SharedMemory (singleton theo tiến trình) đều tách biệt giữa các dự án. `env` (cache dùng chung và quota
+    LLM, xem `shared_cache_env` và `llm_limits_per_process`) được đặt vào biến môi trường trước khi
+    LLMGateway được tạo; môi trường và thư mục làm việc được khôi phục khi dự án kết thúc.
+    """
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    if repo_dir not in sys.path:
+        sys.path.insert(0, repo_dir)
+    started = time.time()
+    with _project_context(project_dir, env or {}), open("run.log", "w", encoding="utf-8") as log_file, \
+            redirect_stdout(log_file), redirect_stderr(log_file):
+        handler = logging.StreamHandler(log_file)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        root_logger = logging.getLogger()
+        root_logger.handlers = [handler]
+
+        from memory.shared_memory import shared_memory
+        from bootstrap import run_project_crew
+
+        from memory.checkpoint import RunCheckpoint, DEFAULT_RUNS_DIR
+
+        shared_memory.clear()
+        run_id = run_project_crew(system_request, max_workers=max_workers)
+        meta = RunCheckpoint(run_id, os.getenv("MAS_RUNS_DIR", DEFAULT_RUNS_DIR)).load_meta()
+
+    return {
+        "id": project_id,
+        "status": meta.get("status", "failed"),
+        "failed_phases": meta.get("failed_phases", []),
+        "run_id": run_id,
+        "output_dir": project_dir,
+        "duration_s": round(time.time() - started, 2),
+    }
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"phải là số nguyên >= 1, nhận được {value}")
+    return number
+
+
+def _write_manifest(path: str, entries: list):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"projects": entries}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_batch(jsonl_path: str, output_dir: str = DEFAULT_BATCH_OUTPUT_DIR, max_processes: int = 2,
+              max_workers: int = None) -> list[dict]:
+    """
+    Chạy nhiều dự án từ file JSONL song song trên một pool tiến trình.
+
+    Args:
+        jsonl_path (str): File JSONL, mỗi dòng một system request.
+        output_dir (str): Thư mục gốc; mỗi dự án có thư mục con `<output_dir>/<id>/`.
+        max_processes (int): Giới hạn toàn cục số dự án chạy đồng thời.
+        max_workers (int): Số task đồng thời trong mỗi dự án (mặc định theo MAS_MAX_WORKERS).
+
+    Returns:
+        list[dict]: Các mục của manifest (`<output_dir>/manifest.json`).
+    """
+    if max_processes < 1:
+        raise ValueError(f"max_processes phải >= 1, nhận được {max_processes}")
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    entries = []
+    llm_limits = llm_limits_per_process(max_processes)
+    logging.info(f"Quota LLM cho mỗi tiến trình: {llm_limits}")
+    # Môi trường của worker được truyền tường minh cho từng dự án thay vì sửa os.environ của tiến trình gọi.
+    worker_env = {**shared_cache_env(output_dir), **llm_limits}
+    requests = read_requests(jsonl_path)
+    # spawn + max_tasks_per_child=1: mỗi dự án một tiến trình mới, không kế thừa trạng thái của dự án trước.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_processes, mp_context=context, max_tasks_per_child=1) as pool:
+        running = {}
+
+        def submit_next() -> bool:
+            item = next(requests, None)
+            if item is None:
+                return False
+            project_id, system_request = item
+            project_dir = os.path.join(output_dir, project_id)
+            future = pool.submit(_run_project, project_id, system_request, project_dir, max_workers, worker_env)
+            running[future] = (project_id, project_dir, time.time())
+            logging.info(f"Đã đưa dự án '{project_id}' vào hàng đợi.")
+            return True
+
+        # Chỉ giữ một số lượng giới hạn dự án đang chờ để không đọc cả file JSONL vào bộ nhớ.
+        while len(running) < max_processes * 2 and submit_next():
+            pass
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                project_id, project_dir, submitted = running.pop(future)
+                try:
+                    entry = future.result()
+                    if entry["status"] == "completed":
+                        logging.info(f"Hoàn thành dự án '{project_id}' trong {entry['duration_s']}s.")
+                    else:
+                        logging.error(f"Dự án '{project_id}' kết thúc với trạng thái '{entry['status']}', "
+                                      f"phase lỗi: {entry['failed_phases']}")
+                except Exception as e:
+                    logging.error(f"Dự án '{project_id}' thất bại: {e}")
+                    entry = {
+                        "id": project_id,
+                        "status": "failed",
+                        "error": str(e),
+                        "output_dir": project_dir,
+                        "duration_s": round(time.time() - submitted, 2),
+                    }
+                entries.append(entry)
+                _write_manifest(manifest_path, entries)
+                submit_next()
+
+    failed = sum(1 for entry in entries if entry["status"] != "completed")
+    logging.info(f"Batch hoàn tất: {len(entries) - failed}/{len(entries)} dự án thành công. Manifest: {manifest_path}")
+    return entries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chạy hàng loạt system request từ file JSONL.")
+    parser.add_argument("jsonl_path", help="File JSONL, mỗi dòng một system request.")
+    parser.add_argument("--output-dir", default=DEFAULT_BATCH_OUTPUT_DIR, help="Thư mục gốc chứa output của các dự án.")
+    parser.add_argument("--processes", type=_positive_int, default=2, help="Số dự án tối đa chạy đồng thời; quota LLM (MAS_LLM_RPM/TPM/MAX_CONCURRENCY) được chia đều cho chúng.")
+    parser.add_argument("--workers", type=_positive_int, default=None, help="Số task đồng thời trong mỗi dự án.")
+    args = parser.parse_args()
+
+    results = run_batch(args.jsonl_path, args.output_dir, args.processes, args.workers)
+    sys.exit(0 if all(entry["status"] == "completed" for entry in results) else 1)
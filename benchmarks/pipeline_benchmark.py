@@ -0,0 +1,342 @@
+# benchmarks/pipeline_benchmark.py
+"""
+Benchmark pipeline (`run_project_crew`) và theo từng factory task với backend LLM giả lập.
+
+Phần pipeline chỉ gồm các phase mà bootstrap `_create_phase_groups` đăng ký (hiện là Initiation, Deployment,
+Maintenance; Planning đến Testing còn bị tắt ở đó); các phase đã chạy được ghi trong `pipeline.summary.phases_run`.
+Phần factory đo mọi phase có agent: Initiation, Planning, Requirements, Development, Testing, Deployment,
+Maintenance. Phase Design (tasks/design_task.py) không được đo vì agents/design_agent.py còn trống, chưa có
+agent nào để giao task; thêm nó vào FACTORY_AGENTS khi agent được viết.
+"""
+
+import os
+import sys
+import json
+import time
+import inspect
+import logging
+import argparse
+import platform
+import tempfile
+import importlib
+import statistics
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_SYSTEM_REQUEST = (
+    "Tạo một hệ thống quản lý thư viện trực tuyến đơn giản bao gồm quản lý sách, thành viên và cho phép mượn/trả sách."
+)
+
+# Module task -> (module agent, hàm tạo agent). Các hàm `create_*_tasks` ở cấp module được đo, cùng các
+# factory khai báo trong NESTED_FACTORIES.
+FACTORY_AGENTS = {
+    "tasks.initiation_tasks": ("agents.initiation_agent", "create_initiation_agents"),
+    "tasks.planning_tasks": ("agents.planning_agent", "create_planning_agents"),
+    "tasks.requirement_tasks": ("agents.requirement_agent", "get_requirement_agent"),
+    "tasks.development_tasks": ("agents.development_agent", "create_development_agent"),
+    "tasks.testing_tasks": ("agents.testing_agent", "create_testing_agents"),
+    "tasks.deployment_tasks": ("agents.deployment_agent", "create_deployment_agents"),
+    "tasks.maintenance_tasks": ("agents.maintenance_agent", "create_maintenance_agents"),
+}
+
+# Module task -> factory nằm trong một lớp (không có `self`, gọi qua lớp).
+NESTED_FACTORIES = {
+    "tasks.requirement_tasks": "RequirementTasksFactory.create_requirement_tasks",
+}
+
+# Chỉ số so sánh với baseline: (đường dẫn trong kết quả, True nếu giá trị lớn hơn là tốt hơn).
+COMPARED_METRICS = [
+    (("pipeline", "summary", "total_s"), False),
+    (("pipeline", "summary", "tasks_per_s"), True),
+    (("pipeline", "summary", "prompt_tokens"), False),
+    (("pipeline", "summary", "output_bytes"), False),
+    (("peak_rss_mb",), False),
+]
+
+
+def configure_environment(latency: str, seed: int):
+    """Dùng backend LLM giả lập, tắt cache LLM/build cache và nới giới hạn tốc độ để chỉ đo tầng điều phối."""
+    os.environ["MAS_LLM_BACKEND"] = "fake"
+    os.environ["MAS_LLM_CACHE"] = "0"
+    os.environ["MAS_INCREMENTAL"] = "0"
+    os.environ["MAS_LLM_RPM"] = "1000000"
+    os.environ["MAS_LLM_TPM"] = "1000000000"
+    os.environ["MAS_FAKE_LLM_LATENCY"] = latency
+    os.environ["MAS_FAKE_LLM_SEED"] = str(seed)
+
+
+def peak_rss_mb() -> float | None:
+    """RSS đỉnh của tiến trình (MB); None nếu nền tảng không hỗ trợ module `resource`."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _report(message: str):
+    """In tiến độ ra terminal; stdout của các task được chuyển vào benchmark.log."""
+    print(message, file=sys.__stdout__, flush=True)
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+@contextmanager
+def record_tasks(records: list):
+    """Ghi thời gian và lượng token của từng task mà scheduler chạy trong khối `with` (`observe_tasks`)."""
+    from utils.task_scheduler import observe_tasks
+
+    unsubscribe = observe_tasks(records.append)
+    try:
+        yield records
+    finally:
+        unsubscribe()
+
+
+def summarize(records: list, total_s: float, output_dir: str) -> dict:
+    """Tổng hợp số liệu theo phase (wall time từ lúc task đầu tiên bắt đầu đến khi task cuối kết thúc) và toàn bộ."""
+    phases = {}
+    for record in records:
+        phase = phases.setdefault(record["phase"], {"tasks": 0, "start": record["start_s"], "end": 0.0,
+                                                    "prompt_tokens": 0})
+        phase["tasks"] += 1
+        phase["start"] = min(phase["start"], record["start_s"])
+        phase["end"] = max(phase["end"], record["start_s"] + record["wall_s"])
+        phase["prompt_tokens"] += record["prompt_tokens"]
+    completed = sum(1 for record in records if record["status"] == "completed")
+    return {
+        "phases_run": sorted(phases),
+        "total_s": round(total_s, 4),
+        "tasks": len(records),
+        "completed": completed,
+        "tasks_per_s": round(completed / total_s, 3) if total_s else 0.0,
+        "prompt_tokens": sum(record["prompt_tokens"] for record in records),
+        "completion_tokens": sum(record["completion_tokens"] for record in records),
+        "llm_requests": sum(record["requests"] for record in records),
+        "output_bytes": directory_size(output_dir) if os.path.isdir(output_dir) else 0,
+        "phases": {
+            name: {"tasks": p["tasks"], "wall_s": round(p["end"] - p["start"], 4), "prompt_tokens": p["prompt_tokens"]}
+            for name, p in phases.items()
+        },
+    }
+
+
+def _strip_start(records: list, origin: float) -> list:
+    return [{**record, "start_s": round(record["start_s"] - origin, 4)} for record in records]
+
+
+def bench_pipeline(workdir: str, system_request: str, max_workers: int, dataflow: bool, repeat: int) -> dict:
+    """
+    Chạy `run_project_crew` `repeat` lần, mỗi lần trong một thư mục làm việc mới.
+    Chỉ gồm các phase mà bootstrap đăng ký (xem docstring của module), không phải toàn bộ SDLC.
+    """
+    from memory.shared_memory import shared_memory
+    from bootstrap import run_project_crew
+
+    runs = []
+    for i in range(repeat):
+        run_dir = os.path.join(workdir, f"pipeline_{i}")
+        os.makedirs(run_dir, exist_ok=True)
+        os.chdir(run_dir)
+        shared_memory.clear()
+        records = []
+        with record_tasks(records):
+            started = time.perf_counter()
+            run_project_crew(system_request, max_workers=max_workers, dataflow=dataflow)
+            total_s = time.perf_counter() - started
+        run = summarize(records, total_s, os.path.join(run_dir, "output"))
+        run["tasks_detail"] = _strip_start(records, started)
+        runs.append(run)
+        _report(f"Pipeline lần {i + 1}/{repeat}: {run['total_s']}s, {run['completed']}/{run['tasks']} task, "
+                f"{run['tasks_per_s']} task/s ({len(run['phases_run'])} phase: {', '.join(run['phases_run'])})")
+
+    summary = {
+        key: statistics.median(run[key] for run in runs)
+        for key in ("total_s", "tasks_per_s", "prompt_tokens", "completion_tokens", "llm_requests", "output_bytes")
+    }
+    summary["phases_run"] = runs[-1]["phases_run"] if runs else []
+    return {"summary": summary, "runs": runs}
+
+
+def discover_factories() -> list:
+    """Liệt kê các hàm `create_*_tasks` cấp module cùng hàm tạo agent tương ứng."""
+    factories = []
+    for module_name, (agent_module, agent_factory) in FACTORY_AGENTS.items():
+        module = importlib.import_module(module_name)
+        for name, func in inspect.getmembers(module, inspect.isfunction):
+            if func.__module__ == module_name and name.startswith("create_") and name.endswith("_tasks"):
+                factories.append((f"{module_name}.{name}", func, agent_module, agent_factory))
+        if module_name in NESTED_FACTORIES:
+            func = module
+            for attr in NESTED_FACTORIES[module_name].split("."):
+                func = getattr(func, attr)
+            factories.append((f"{module_name}.{NESTED_FACTORIES[module_name]}", func, agent_module, agent_factory))
+    return factories
+
+
+def bench_factories(workdir: str, system_request: str, max_workers: int, only: str = None) -> dict:
+    """Dựng và chạy riêng từng factory với shared_memory chỉ chứa system request."""
+    from memory.shared_memory import shared_memory
+    from agents.project_manager_agent import create_project_manager_agent
+    from utils.task_scheduler import run_tasks
+
+    run_dir = os.path.join(workdir, "factories")
+    os.makedirs(run_dir, exist_ok=True)
+    os.chdir(run_dir)
+    project_manager_agent = create_project_manager_agent()
+    results = {}
+    for name, factory, agent_module, agent_factory in discover_factories():
+        if only and only not in name:
+            continue
+        shared_memory.clear()
+        shared_memory.set("phase_0", "system_request", system_request)
+        agent = getattr(importlib.import_module(agent_module), agent_factory)()
+        args = (agent, project_manager_agent)[:len(inspect.signature(factory).parameters)]
+        records = []
+        try:
+            started = time.perf_counter()
+            tasks = factory(*args)
+            build_s = time.perf_counter() - started
+            with record_tasks(records):
+                started = time.perf_counter()
+                run_tasks(tasks, max_workers=max_workers, name=name)
+                run_s = time.perf_counter() - started
+        except Exception as e:
+            results[name] = {"error": str(e)}
+            _report(f"Factory {name}: lỗi {e}")
+            continue
+        summary = summarize(records, run_s, os.path.join(run_dir, "output"))
+        results[name] = {
+            "build_s": round(build_s, 4),
+            "run_s": summary["total_s"],
+            "tasks": summary["tasks"],
+            "tasks_per_s": summary["tasks_per_s"],
+            "prompt_tokens": summary["prompt_tokens"],
+            "tasks_detail": _strip_start(records, started),
+        }
+        _report(f"Factory {name}: {summary['tasks']} task, dựng {results[name]['build_s']}s, chạy {summary['total_s']}s")
+    return results
+
+
+def _lookup(result: dict, path: tuple):
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    So sánh kết quả với baseline; trả về danh sách chỉ số bị chậm/tệ hơn quá `threshold` (tỷ lệ, ví dụ 0.1 = 10%).
+    Thời gian chạy của từng factory cũng được so sánh.
+    """
+    metrics = list(COMPARED_METRICS)
+    for name in current.get("factories", {}):
+        metrics.append((("factories", name, "run_s"), False))
+
+    old_phases = _lookup(baseline, ("pipeline", "summary", "phases_run"))
+    new_phases = _lookup(current, ("pipeline", "summary", "phases_run"))
+    if old_phases is not None and old_phases != new_phases:
+        print(f"Cảnh báo: pipeline của baseline chạy các phase {old_phases}, lần này chạy {new_phases}.")
+
+    regressions = []
+    print(f"\n{'Chỉ số':<70} {'Baseline':>12} {'Hiện tại':>12} {'Thay đổi':>9}")
+    for path, higher_is_better in metrics:
+        old, new = _lookup(baseline, path), _lookup(current, path)
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or old == 0:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "  <-- tệ hơn" if worse > threshold else ""
+        label = ".".join(path)
+        print(f"{label[-70:]:<70} {old:>12.6g} {new:>12.6g} {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(label)
+    return regressions
+
+
+def compare_with_baseline(current: dict, baseline_path: str, threshold: float) -> list[str]:
+    """Đọc kết quả JSON của một lần chạy trước (`--baseline`) và so sánh với `current` (xem `compare`)."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    return compare(current, baseline, threshold)
+
+
+def run_benchmark(output_path: str, system_request: str = DEFAULT_SYSTEM_REQUEST, max_workers: int = 4,
+                  dataflow: bool = False, repeat: int = 3, latency: str = "fixed:0.05", seed: int = 0,
+                  factories: bool = True, only: str = None, workdir: str = None) -> dict:
+    """
+    Chạy benchmark pipeline (các phase bootstrap đăng ký) và theo từng factory, ghi kết quả JSON ra `output_path`.
+
+    Mọi lời gọi LLM đi qua backend giả lập (utils/fake_llm.py) nên kết quả phản ánh chi phí của
+    scheduler, shared_memory và việc ghi file, với độ trễ LLM cố định theo `latency`.
+    """
+    configure_environment(latency, seed)
+    output_path = os.path.abspath(output_path)
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix="mas_bench_"))
+    os.makedirs(workdir, exist_ok=True)
+    cwd = os.getcwd()
+    with open(os.path.join(workdir, "benchmark.log"), "w", encoding="utf-8") as log_file, redirect_stdout(log_file):
+        try:
+            result = {
+                "meta": {
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "config": {"max_workers": max_workers, "dataflow": dataflow, "repeat": repeat,
+                               "latency": latency, "seed": seed, "workdir": workdir},
+                },
+                "pipeline": bench_pipeline(workdir, system_request, max_workers, dataflow, repeat),
+            }
+            if factories:
+                result["factories"] = bench_factories(workdir, system_request, max_workers, only)
+        finally:
+            os.chdir(cwd)
+    result["peak_rss_mb"] = peak_rss_mb()
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"Đã ghi kết quả benchmark vào {output_path}")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark thông lượng và độ trễ của pipeline SDLC với LLM giả lập.")
+    parser.add_argument("--output", default="benchmark_results.json", help="File JSON kết quả.")
+    parser.add_argument("--baseline", help="File JSON kết quả trước đó để so sánh.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Ngưỡng tệ hơn cho phép so với baseline (0.1 = 10%%).")
+    parser.add_argument("--workers", type=int, default=4, help="Số task tối đa chạy đồng thời.")
+    parser.add_argument("--dataflow", action="store_true", help="Chạy pipeline ở chế độ dataflow.")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần chạy pipeline (lấy trung vị).")
+    parser.add_argument("--latency", default="fixed:0.05", help="Phân phối độ trễ của LLM giả lập (MAS_FAKE_LLM_LATENCY).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed của LLM giả lập.")
+    parser.add_argument("--no-factories", action="store_true", help="Chỉ đo run_project_crew.")
+    parser.add_argument("--only", help="Chỉ đo các factory có tên chứa chuỗi này.")
+    parser.add_argument("--workdir", help="Thư mục làm việc (mặc định: thư mục tạm).")
+    args = parser.parse_args()
+
+    current = run_benchmark(args.output, max_workers=args.workers, dataflow=args.dataflow, repeat=args.repeat,
+                            latency=args.latency, seed=args.seed, factories=not args.no_factories,
+                            only=args.only, workdir=args.workdir)
+    if args.baseline:
+        regressions = compare_with_baseline(current, args.baseline, args.threshold)
+        if regressions:
+            print(f"\nCó {len(regressions)} chỉ số tệ hơn baseline quá {args.threshold:.0%}.")
+            sys.exit(1)
+        print("\nKhông có chỉ số nào tệ hơn baseline.")
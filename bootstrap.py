@@ -1,7 +1,7 @@
 # bootstrap.py (MODIFIED)
 
 import os
-from crewai import Crew, Process
+import argparse
 from dotenv import load_dotenv
 import logging
 
@@ -44,180 +44,178 @@ from agents.maintenance_agent import create_maintenance_agents
 from tasks.maintenance_tasks import create_maintenance_tasks
 
 from memory.shared_memory import shared_memory
+from memory.checkpoint import RunCheckpoint, new_run_id, DEFAULT_RUNS_DIR
+from memory.build_cache import BuildCache, DEFAULT_BUILD_CACHE_DIR
+from memory.sqlite_memory import SQLiteMemoryBackend
 from utils.file_writer import write_output
+from utils.task_scheduler import TaskGroup, run_tasks, run_dataflow, DEFAULT_MAX_WORKERS
+from utils.tracing import tracer
+from memory.artifact_registry import artifact_registry
+from memory.artifact_store import artifact_store
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def run_project_crew(system_request: str):
+def _create_phase_groups(project_manager_agent) -> list[TaskGroup]:
+    """
+    Khai báo các phase đã triển khai dưới dạng TaskGroup, theo đúng thứ tự SDLC.
+    `writes` là các phase trong shared_memory mà callback của nhóm ghi vào.
+    """
+    initiation_agent = create_initiation_agents()
+    deployment_agent = create_deployment_agents()
+    maintenance_agent = create_maintenance_agents()
+
+    return [
+        TaskGroup(
+            "Giai đoạn 0: Khởi tạo dự án (Initiation Phase)",
+            lambda: create_initiation_tasks(initiation_agent),
+            writes={"phase_0"}
+        ),
+        # TaskGroup("Giai đoạn 1: Lập kế hoạch (Planning Phase)", lambda: create_planning_tasks(planning_agents, project_manager_agent), writes={"phase_1", "phase_1_planning"}),
+        # TaskGroup("Giai đoạn 2: Yêu cầu (Requirements Phase)", lambda: create_requirement_tasks(requirement_agents, project_manager_agent), writes={"phase_2"}),
+        # TaskGroup("Giai đoạn 3: Thiết kế (Design Phase)", lambda: create_design_tasks(design_agents, project_manager_agent), writes={"phase_3"}),
+        # TaskGroup("Giai đoạn 4: Phát triển (Development Phase)", lambda: create_development_tasks(development_agent, project_manager_agent), writes={"phase_4_development"}),
+        # TaskGroup("Giai đoạn 5: Kiểm thử (Testing Phase)", lambda: create_testing_tasks(testing_agent, project_manager_agent), writes={"phase_5_testing"}),
+        TaskGroup(
+            "Giai đoạn 6: Triển khai (Deployment Phase)",
+            lambda: create_deployment_tasks(deployment_agent, project_manager_agent),
+            writes={"phase_6_deployment"}
+        ),
+        TaskGroup(
+            "Giai đoạn 7: Bảo trì (Maintenance Phase)",
+            lambda: create_maintenance_tasks(maintenance_agent, project_manager_agent),
+            writes={"phase_7_maintenance"}
+        ),
+    ]
+
+def _check_artifacts(groups: list[TaskGroup]):
+    """
+    Kiểm tra lúc khởi động: mọi key mà các nhóm đọc phải có producer trong config/artifacts.yaml
+    và producer đó phải thuộc một phase sẽ chạy. Chỉ cảnh báo, không dừng quy trình.
+    """
+    produced_phases = set().union(*(group.writes for group in groups))
+    reads = set()
+    for group in groups:
+        try:
+            reads |= group.discover_reads()
+        except Exception as e:
+            logging.warning(f"Không dựng thử được {group.name} để kiểm tra artifact: {e}")
+    problems = artifact_registry.check_consumers(reads, produced_phases)
+    for problem in problems:
+        logging.warning(f"Artifact: {problem}.")
+    if not problems:
+        logging.info(f"Artifact: {len(reads)} key đầu vào đều có producer.")
+    return problems
+
+def run_project_crew(system_request: str, max_workers: int = None, dataflow: bool = None, resume: str = None,
+                     incremental: bool = None, trace: bool = None):
     """
     Chạy toàn bộ quy trình dự án qua các phase.
+
+    Args:
+        system_request (str): Yêu cầu hệ thống ban đầu.
+        max_workers (int): Số task tối đa chạy đồng thời.
+            Mặc định lấy từ biến môi trường MAS_MAX_WORKERS; đặt 1 để chạy tuần tự.
+        dataflow (bool): Nếu True, bỏ rào chắn giữa các phase: mỗi phase bắt đầu ngay khi các key
+            shared_memory mà nó đọc đã sẵn sàng. Mặc định lấy từ biến môi trường MAS_DATAFLOW.
+        resume (str): run_id của một lần chạy trước. Các task đã hoàn thành trong lần chạy đó được
+            bỏ qua và output của chúng được nạp lại vào shared_memory.
+        incremental (bool): Nếu True, chỉ sinh lại các task có fingerprint (mô tả, cấu hình agent,
+            output upstream) thay đổi; các task khác dùng lại output đã cache. Mặc định lấy từ
+            biến môi trường MAS_INCREMENTAL (bật).
+        trace (bool): Nếu True, ghi span của mọi task, lời gọi LLM, SharedMemory.set/get và write_output
+            vào runs/<run_id>/trace.jsonl và trace.json (Chrome trace). Mặc định lấy từ MAS_TRACE.
+
+    Returns:
+        str: run_id của lần chạy (thư mục checkpoint nằm trong runs/<run_id>; manifest.json trong đó
+            ánh xạ mọi key và file output sang hash, so sánh hai lần chạy bằng `python -m memory.artifact_store diff`).
+            Kết quả của lần chạy được ghi vào runs/<run_id>/meta.json: `status` là "completed",
+            "partial" (một số phase có task thất bại) hoặc "failed" (mọi phase đều thất bại), kèm `failed_phases`.
     """
     load_dotenv()
-
-    # Đảm bảo thư mục output tồn tại
-    output_base_dir = "output"
-    # Tạo các thư mục cho từng phase
-    for i in range(8): # Từ phase 0 đến phase 7
-        os.makedirs(os.path.join(output_base_dir, f"{i}_" + ("initiation" if i==0 else "planning" if i==1 else "requirements" if i==2 else "design" if i==3 else "development" if i==4 else "testing" if i==5 else "deployment" if i==6 else "maintenance")), exist_ok=True)
-
-
-    # --- KHỞI TẠO CÁC AGENT CHUNG (RESEARCHER VÀ PROJECT MANAGER) MỘT LẦN ---
-    project_manager_agent = create_project_manager_agent()
-    # researcher_agent = create_researcher_agent() # Nếu bạn đã tạo researcher_agent
-
-    # 0. Giai đoạn Khởi tạo (Initiation)
-    logging.info("Bắt đầu Giai đoạn 0: Khởi tạo dự án (Initiation Phase)")
-    shared_memory.set("phase_0", "system_request", system_request)
-
-    vision_agent, conops_agent, charter_agent = create_initiation_agents()
-    # Truyền project_manager_agent vào hàm tạo tasks
-    initiation_tasks = create_initiation_tasks(vision_agent, conops_agent, charter_agent, project_manager_agent) [cite: 78, 94]
-
-    initiation_crew = Crew(
-        agents=[vision_agent, conops_agent, charter_agent, project_manager_agent], # Thêm project_manager_agent 
-        tasks=initiation_tasks,
-        process=Process.sequential,
-        verbose=True
-    )
-    initiation_result = initiation_crew.kickoff()
-    logging.info("Hoàn thành Giai đoạn 0: Khởi tạo dự án.")
-    logging.info(f"Kết quả Initiation Phase:\n{initiation_result}")
-
-    # 1. Giai đoạn Lập kế hoạch (Planning)
-    logging.info("Bắt đầu Giai đoạn 1: Lập kế hoạch (Planning Phase)")
-    try:
-        # planning_agents = create_planning_agents()
-        # planning_tasks = create_planning_tasks(planning_agents, project_manager_agent) # THÊM project_manager_agent
-
-        # planning_crew = Crew(
-        #     agents=[planning_agents, project_manager_agent], # THÊM project_manager_agent 
-        #     tasks=planning_tasks,
-        #     process=Process.sequential,
-        #     verbose=True
-        # )
-        # planning_result = planning_crew.kickoff()
-        # logging.info("Hoàn thành Giai đoạn 1: Lập kế hoạch.")
-        # logging.info(f"Kết quả Planning Phase:\n{planning_result}")
-        logging.info("Giai đoạn 1 (Planning) chưa được triển khai đầy đủ. Bỏ qua.")
-    except Exception as e:
-        logging.error(f"Lỗi khi chạy Giai đoạn 1 (Planning): {e}")
-
-    # 2. Giai đoạn Yêu cầu (Requirements)
-    logging.info("Bắt đầu Giai đoạn 2: Yêu cầu (Requirements Phase)")
-    try:
-        # requirement_agents = create_requirement_agents()
-        # requirement_tasks = create_requirement_tasks(requirement_agents, project_manager_agent)
-
-        # requirement_crew = Crew(
-        #     agents=[requirement_agents, project_manager_agent], 
-        #     tasks=requirement_tasks,
-        #     process=Process.sequential,
-        #     verbose=True
-        # )
-        # requirement_result = requirement_crew.kickoff()
-        # logging.info("Hoàn thành Giai đoạn 2: Yêu cầu.")
-        # logging.info(f"Kết quả Requirements Phase:\n{requirement_result}")
-        logging.info("Giai đoạn 2 (Requirements) chưa được triển khai đầy đủ. Bỏ qua.")
-    except Exception as e:
-        logging.error(f"Lỗi khi chạy Giai đoạn 2 (Requirements): {e}")
-
-    # 3. Giai đoạn Thiết kế (Design)
-    logging.info("Bắt đầu Giai đoạn 3: Thiết kế (Design Phase)")
-    try:
-        # design_agents = create_design_agents()
-        # design_tasks = create_design_tasks(design_agents, project_manager_agent)
-
-        # design_crew = Crew(
-        #     agents=[design_agents, project_manager_agent], 
-        #     tasks=design_tasks,
-        #     process=Process.sequential,
-        #     verbose=True
-        # )
-        # design_result = design_crew.kickoff()
-        # logging.info("Hoàn thành Giai đoạn 3: Thiết kế.")
-        # logging.info(f"Kết quả Design Phase:\n{design_result}")
-        logging.info("Giai đoạn 3 (Design) chưa được triển khai đầy đủ. Bỏ qua.")
-    except Exception as e:
-        logging.error(f"Lỗi khi chạy Giai đoạn 3 (Design): {e}")
-
-    # 4. Giai đoạn Phát triển (Development)
-    logging.info("Bắt đầu Giai đoạn 4: Phát triển (Development Phase)")
-    try:
-        # development_agent = create_development_agents()
-        # development_tasks = create_development_tasks(development_agent, project_manager_agent)
-
-        # development_crew = Crew(
-        #     agents=[development_agent, project_manager_agent], 
-        #     tasks=development_tasks,
-        #     process=Process.sequential,
-        #     verbose=True
-        # )
-        # development_result = development_crew.kickoff()
-        # logging.info("Hoàn thành Giai đoạn 4: Phát triển.")
-        # logging.info(f"Kết quả Development Phase:\n{development_result}")
-        logging.info("Giai đoạn 4 (Development) chưa được triển khai đầy đủ. Bỏ qua.")
-    except Exception as e:
-        logging.error(f"Lỗi khi chạy Giai đoạn 4 (Development): {e}")
-
-    # 5. Giai đoạn Kiểm thử (Testing)
-    logging.info("Bắt đầu Giai đoạn 5: Kiểm thử (Testing Phase)")
-    try:
-        # testing_agent = create_testing_agents()
-        # testing_tasks = create_testing_tasks(testing_agent, project_manager_agent)
-
-        # testing_crew = Crew(
-        #     agents=[testing_agent, project_manager_agent], 
-        #     tasks=testing_tasks,
-        #     process=Process.sequential,
-        #     verbose=True
-        # )
-        # testing_result = testing_crew.kickoff()
-        # logging.info("Hoàn thành Giai đoạn 5: Kiểm thử.")
-        # logging.info(f"Kết quả Testing Phase:\n{testing_result}")
-        logging.info("Giai đoạn 5 (Testing) chưa được triển khai đầy đủ. Bỏ qua.")
-    except Exception as e:
-        logging.error(f"Lỗi khi chạy Giai đoạn 5 (Testing): {e}")
-
-    # 6. Giai đoạn Triển khai (Deployment)
-    logging.info("Bắt đầu Giai đoạn 6: Triển khai (Deployment Phase)")
-    try:
-        deployment_agent = create_deployment_agents()
-        # Truyền project_manager_agent vào hàm tạo tasks
-        deployment_tasks = create_deployment_tasks(deployment_agent, project_manager_agent) [cite: 90, 106]
-
-        deployment_crew = Crew(
-            agents=[deployment_agent, project_manager_agent], # Thêm project_manager_agent 
-            tasks=deployment_tasks,
-            process=Process.sequential,
-            verbose=True
-        )
-        deployment_result = deployment_crew.kickoff()
-        logging.info("Hoàn thành Giai đoạn 6: Triển khai.")
-        logging.info(f"Kết quả Deployment Phase:\n{deployment_result}")
-    except Exception as e:
-        logging.error(f"Lỗi khi chạy Giai đoạn 6 (Deployment): {e}")
-
-    # 7. Giai đoạn Bảo trì (Maintenance)
-    logging.info("Bắt đầu Giai đoạn 7: Bảo trì (Maintenance Phase)")
-    try:
-        maintenance_agent = create_maintenance_agents()
-        # Truyền project_manager_agent vào hàm tạo tasks
-        maintenance_tasks = create_maintenance_tasks(maintenance_agent, project_manager_agent) [cite: 92, 108]
-
-        maintenance_crew = Crew(
-            agents=[maintenance_agent, project_manager_agent], # Thêm project_manager_agent 
-            tasks=maintenance_tasks,
-            process=Process.sequential,
-            verbose=True
-        )
-        maintenance_result = maintenance_crew.kickoff()
-        logging.info("Hoàn thành Giai đoạn 7: Bảo trì.")
-        logging.info(f"Kết quả Maintenance Phase:\n{maintenance_result}")
-    except Exception as e:
-        logging.error(f"Lỗi khi chạy Giai đoạn 7 (Maintenance): {e}")
-
-    logging.info("Toàn bộ quy trình dự án đã hoàn tất.")
+    # MappedText của lần chạy mmap blob trong kho: `artifact_store pack` không được nén chúng lúc này.
+    with artifact_store.in_use():
+        if max_workers is None:
+            max_workers = int(os.getenv("MAS_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+        if dataflow is None:
+            dataflow = os.getenv("MAS_DATAFLOW", "0") == "1"
+        if incremental is None:
+            incremental = os.getenv("MAS_INCREMENTAL", "1") == "1"
+        if trace is None:
+            trace = os.getenv("MAS_TRACE", "0") == "1"
+        if trace:
+            tracer.enable()
+
+        # Đảm bảo thư mục output tồn tại
+        output_base_dir = "output"
+        # Tạo các thư mục cho từng phase
+        for i in range(8): # Từ phase 0 đến phase 7
+            os.makedirs(os.path.join(output_base_dir, f"{i}_" + ("initiation" if i==0 else "planning" if i==1 else "requirements" if i==2 else "design" if i==3 else "development" if i==4 else "testing" if i==5 else "deployment" if i==6 else "maintenance")), exist_ok=True)
+
+
+        # --- KHỞI TẠO CÁC AGENT CHUNG (RESEARCHER VÀ PROJECT MANAGER) MỘT LẦN ---
+        project_manager_agent = create_project_manager_agent()
+        # researcher_agent = create_researcher_agent() # Nếu bạn đã tạo researcher_agent
+
+        checkpoint = RunCheckpoint(resume or new_run_id(), os.getenv("MAS_RUNS_DIR", DEFAULT_RUNS_DIR))
+        if resume:
+            system_request = checkpoint.load_meta().get("system_request", system_request)
+            logging.info(f"Tiếp tục lần chạy '{checkpoint.run_id}' từ checkpoint.")
+        checkpoint.save_meta(system_request=system_request)
+        logging.info(f"Run ID: {checkpoint.run_id}")
+        cache = BuildCache(os.getenv("MAS_BUILD_CACHE_DIR", DEFAULT_BUILD_CACHE_DIR)) if incremental else None
+        if os.getenv("MAS_MEMORY_BACKEND") == "sqlite":
+            # Mặc định mỗi lần chạy một file trong runs/<run_id>/ để xem lại trạng thái sau khi chạy.
+            memory_path = os.getenv("MAS_MEMORY_PATH") or os.path.join(checkpoint.run_dir, "memory.sqlite")
+            shared_memory.configure(SQLiteMemoryBackend(memory_path))
+            logging.info(f"SharedMemory lưu tại {memory_path}.")
+
+        shared_memory.set("phase_0", "system_request", system_request)
+        phase_groups = _create_phase_groups(project_manager_agent)
+        _check_artifacts(phase_groups)
+        logging.info("Giai đoạn 1-5 (Planning, Requirements, Design, Development, Testing) chưa được triển khai đầy đủ. Bỏ qua.")
+
+        failed_phases = []
+        if dataflow:
+            logging.info("Chạy toàn bộ dự án ở chế độ dataflow (không có rào chắn giữa các phase).")
+            try:
+                run_dataflow(phase_groups, max_workers=max_workers, checkpoint=checkpoint, cache=cache)
+            except Exception as e:
+                logging.error(f"Lỗi khi chạy dự án ở chế độ dataflow: {e}")
+                failed_phases = getattr(e, "failed_groups", [group.name for group in phase_groups])
+        else:
+            for group in phase_groups:
+                logging.info(f"Bắt đầu {group.name}")
+                try:
+                    result = run_tasks(group.build(), max_workers=max_workers, checkpoint=checkpoint, cache=cache,
+                                       name=group.name, materialize=group.materializer)
+                    logging.info(f"Hoàn thành {group.name}.")
+                    logging.info(f"Kết quả {group.name}:\n{result}")
+                except Exception as e:
+                    logging.error(f"Lỗi khi chạy {group.name}: {e}")
+                    failed_phases.append(group.name)
+
+        status = "completed" if not failed_phases else "failed" if len(failed_phases) == len(phase_groups) else "partial"
+        checkpoint.save_meta(system_request=system_request, status=status, failed_phases=failed_phases)
+        shared_memory.flush()
+        artifact_store.snapshot(checkpoint.run_dir, shared_memory, output_base_dir)
+        if failed_phases:
+            logging.warning(f"Quy trình dự án kết thúc ({status}); phase lỗi: {failed_phases}")
+        else:
+            logging.info("Toàn bộ quy trình dự án đã hoàn tất.")
+        if trace:
+            tracer.export(checkpoint.run_dir)
+            tracer.disable()
+        return checkpoint.run_id
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chạy toàn bộ quy trình SDLC đa agent.")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Tiếp tục một lần chạy trước từ checkpoint trong runs/<RUN_ID>.")
+    parser.add_argument("--workers", type=int, default=None, help="Số task tối đa chạy đồng thời (mặc định: MAS_MAX_WORKERS hoặc 4).")
+    parser.add_argument("--dataflow", action="store_true", default=None, help="Bỏ rào chắn giữa các phase.")
+    parser.add_argument("--full", action="store_true", help="Sinh lại toàn bộ tài liệu, bỏ qua build cache.")
+    parser.add_argument("--trace", action="store_true", default=None, help="Ghi trace của lần chạy vào runs/<RUN_ID>/.")
+    args = parser.parse_args()
+
     initial_request = "Tạo một hệ thống quản lý thư viện trực tuyến đơn giản bao gồm quản lý sách, thành viên và cho phép mượn/trả sách."
-    run_project_crew(initial_request)
\ No newline at end of file
+    run_project_crew(initial_request, max_workers=args.workers, dataflow=args.dataflow, resume=args.resume,
+                     incremental=False if args.full else None, trace=args.trace)
\ No newline at end of file
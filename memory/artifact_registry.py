@@ -0,0 +1,73 @@
+# memory/artifact_registry.py
+
+import os
+import logging
+
+import yaml
+
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "artifacts.yaml")
+
+
+class ArtifactRegistry:
+    """
+    Registry khai báo các artifact trong SharedMemory (config/artifacts.yaml).
+
+    Mỗi artifact có ID chuẩn (phase, key), module producer và các alias. Các bảng tra được dựng
+    một lần khi nạp nên `resolve` chỉ gồm hai lần tra dict: alias của key trước, rồi alias của phase.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("MAS_ARTIFACT_REGISTRY", DEFAULT_REGISTRY_PATH)
+        self.producers = {}
+        self.aliases = {}
+        self.phase_aliases = {}
+        self.load()
+
+    def load(self):
+        """Nạp (lại) file registry; thiếu file thì registry rỗng và `resolve` giữ nguyên key."""
+        if not os.path.exists(self.path):
+            logging.warning(f"ArtifactRegistry: không tìm thấy {self.path}, bỏ qua việc chuẩn hóa key.")
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        self.phase_aliases = dict(config.get("phase_aliases") or {})
+        self.producers = {}
+        for module, phases in (config.get("producers") or {}).items():
+            for phase, keys in phases.items():
+                for key in keys:
+                    self.producers[(phase, key)] = module
+        self.aliases = {}
+        for alias, canonical in (config.get("aliases") or {}).items():
+            self.aliases[tuple(alias.split("/", 1))] = tuple(canonical.split("/", 1))
+
+    def resolve(self, phase: str, key: str) -> tuple[str, str]:
+        """ID chuẩn của (phase, key)."""
+        canonical = self.aliases.get((phase, key))
+        if canonical is not None:
+            return canonical
+        return self.phase_aliases.get(phase, phase), key
+
+    def resolve_phase(self, phase: str) -> str:
+        return self.phase_aliases.get(phase, phase)
+
+    def producer_of(self, phase: str, key: str) -> str | None:
+        """Module ghi (phase, key), hoặc None nếu không có producer nào được khai báo."""
+        return self.producers.get(self.resolve(phase, key))
+
+    def check_consumers(self, reads, produced_phases=None) -> list[str]:
+        """
+        Các vấn đề của tập key được đọc (`reads`, gồm các cặp (phase, key)): key không có producer,
+        hoặc producer thuộc phase không chạy trong lần này (`produced_phases`).
+        """
+        problems = []
+        for canonical in sorted({self.resolve(phase, key) for phase, key in reads}):
+            producer = self.producers.get(canonical)
+            if producer is None:
+                problems.append(f"'{'/'.join(canonical)}' không có producer nào")
+            elif produced_phases is not None and canonical[0] not in produced_phases:
+                problems.append(f"'{'/'.join(canonical)}' do {producer} ghi nhưng phase '{canonical[0]}' không chạy")
+        return problems
+
+
+# Khởi tạo instance duy nhất
+artifact_registry = ArtifactRegistry()
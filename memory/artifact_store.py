@@ -0,0 +1,256 @@
+# memory/artifact_store.py
+
+import os
+import json
+import shutil
+import difflib
+import hashlib
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, file khóa còn tồn tại được coi là đang bị giữ.
+    fcntl = None
+
+from memory.mapped_text import MappedText, blob_path, spill, spill_threshold
+from utils.compression import get_codec, is_compressed
+
+
+class ArtifactStore:
+    """
+    Kho artifact theo địa chỉ nội dung, dùng chung thư mục blob với SharedMemory (.cache/blobs).
+
+    Mỗi phiên bản của một artifact được lưu đúng một lần dưới hash sha256 của nó, nên các output
+    giống nhau giữa các lần chạy và các dự án chỉ tốn đĩa một lần. Một lần chạy được chụp thành
+    `runs/<run_id>/manifest.json` ánh xạ key -> hash: chụp là O(số key), so sánh hai lần chạy
+    chỉ cần so hash và chỉ đọc nội dung của các key thực sự thay đổi.
+
+    Blob luôn là bản sao riêng của nội dung, không bao giờ là hard link tới file trong output/, nên
+    sửa file output không làm thay đổi phiên bản đã lưu.
+
+    Với MAS_COMPRESSION, giá trị nhỏ được lưu nén (`<hash>.z`), còn `pack()` nén các blob lớn khi
+    không có lần chạy nào đang dùng kho. Trong lúc chạy, giá trị lớn để nguyên để SharedMemory đọc qua mmap;
+    mỗi lần chạy giữ một file khóa trong `<kho>/.locks` (`in_use()`) và `pack()` từ chối chạy khi còn khóa.
+    """
+
+    def __init__(self, blob_dir: str = None):
+        self.blob_dir = blob_dir
+
+    def put(self, value) -> str:
+        """Lưu một giá trị (chuỗi hoặc MappedText) và trả về hash của nó."""
+        if isinstance(value, MappedText):
+            digest = os.path.basename(value.path)
+            if os.path.abspath(value.path) == os.path.abspath(blob_path(digest, self.blob_dir)):
+                # Giá trị đã nằm trong kho: hash chính là tên file blob.
+                return digest
+        text = str(value)
+        data = text.encode("utf-8")
+        if get_codec().enabled and not 0 < spill_threshold() <= len(data):
+            digest = hashlib.sha256(data).hexdigest()
+            path = blob_path(digest, self.blob_dir)
+            if not os.path.exists(path) and not os.path.exists(f"{path}.z"):
+                compressed = get_codec().compress(data)
+                self._write(f"{path}.z" if is_compressed(compressed) else path, compressed)
+            return digest
+        return os.path.basename(spill(text, self.blob_dir).path)
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _root(self) -> str:
+        return os.path.dirname(os.path.dirname(blob_path("00", self.blob_dir)))
+
+    @contextmanager
+    def in_use(self):
+        """
+        Đánh dấu kho đang được một lần chạy dùng (MappedText của SharedMemory mmap trực tiếp file blob).
+        Mỗi lần chạy có file khóa riêng nên nhiều lần chạy (chế độ batch) dùng chung kho được.
+        """
+        lock_dir = os.path.join(self._root(), ".locks")
+        os.makedirs(lock_dir, exist_ok=True)
+        path = os.path.join(lock_dir, f"{os.getpid()}.{threading.get_ident()}.lock")
+        with open(path, "w") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        os.remove(path)
+
+    def _held_locks(self) -> list:
+        """Các file khóa của lần chạy còn sống; khóa của tiến trình đã chết (flock đã được nhả) bị xóa."""
+        lock_dir = os.path.join(self._root(), ".locks")
+        held = []
+        for name in os.listdir(lock_dir) if os.path.isdir(lock_dir) else []:
+            path = os.path.join(lock_dir, name)
+            if fcntl is None:
+                held.append(path)
+                continue
+            with open(path, "a") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    held.append(path)
+                    continue
+                fcntl.flock(f, fcntl.LOCK_UN)
+            os.remove(path)
+        return held
+
+    def put_file(self, path: str) -> str:
+        """Sao chép một file vào kho và trả về hash nội dung."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        target = blob_path(digest, self.blob_dir)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        return digest
+
+    def get(self, digest: str):
+        """
+        Nội dung của một hash: MappedText nếu đủ lớn để đọc lười, ngược lại là str.
+        Ném FileNotFoundError nếu blob, hoặc từ điển đã nén nó, không còn; các cache coi đó là chưa có entry.
+        """
+        path = blob_path(digest, self.blob_dir)
+        if not os.path.exists(path):
+            with open(f"{path}.z", "rb") as f:
+                return get_codec().decompress(f.read()).decode("utf-8")
+        size = os.path.getsize(path)  # Byte UTF-8, cùng đơn vị với ngưỡng trong `put`.
+        if 0 < spill_threshold() <= size:
+            return MappedText(path, nbytes=size)
+        with open(path, "rb") as f:
+            # Đọc byte rồi giải mã: chế độ văn bản sẽ đổi "\r\n" thành "\n" và sai với nội dung đã băm.
+            return f.read().decode("utf-8")
+
+    def put_writes(self, writes: list) -> list:
+        """(phase, key, value) -> [phase, key, hash], dùng cho checkpoint và BuildCache."""
+        return [[phase, key, self.put(value)] for phase, key, value in writes]
+
+    def get_writes(self, refs: list) -> list:
+        return [[phase, key, self.get(digest)] for phase, key, digest in refs]
+
+    def snapshot(self, run_dir: str, memory, output_dir: str = "output") -> dict:
+        """Ghi manifest của một lần chạy: mọi key trong `memory` và mọi file trong `output_dir`."""
+        manifest = {
+            "memory": {f"{phase}/{key}": self.put(memory.get(phase, key)) for phase, key in memory.keys()},
+            "files": {},
+        }
+        for directory, _, names in os.walk(output_dir):
+            for name in names:
+                path = os.path.join(directory, name)
+                manifest["files"][path] = self.put_file(path)
+        os.makedirs(run_dir, exist_ok=True)
+        with open(os.path.join(run_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        logging.info(f"ArtifactStore: manifest của {run_dir} gồm {len(manifest['memory'])} key, "
+                     f"{len(manifest['files'])} file.")
+        return manifest
+
+    def pack(self) -> tuple[int, int, int]:
+        """
+        Nén các blob chưa nén của kho (phiên bản file output và giá trị của các lần chạy trước).
+        Ném RuntimeError nếu một lần chạy đang giữ khóa của kho (xem `in_use`): blob thô bị xóa sau khi nén,
+        trong khi MappedText của lần chạy đó có thể đang mmap nó.
+
+        Returns:
+            (số blob đã nén, tổng byte trước, tổng byte sau)
+        """
+        codec = get_codec()
+        if not codec.enabled:
+            raise ValueError("Cần đặt MAS_COMPRESSION=zlib hoặc lzma để nén kho artifact.")
+        held = self._held_locks()
+        if held:
+            raise RuntimeError(f"Kho artifact đang được {len(held)} lần chạy dùng ({', '.join(held)}); "
+                               f"chạy lại pack khi chúng kết thúc.")
+        root = self._root()
+        packed, before, after = 0, 0, 0
+        for directory, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(directory, name)
+                if "." in name:
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+                compressed = codec.compress(data)
+                if not is_compressed(compressed):
+                    continue
+                self._write(f"{path}.z", compressed)
+                os.remove(path)
+                packed, before, after = packed + 1, before + len(data), after + len(compressed)
+        logging.info(f"ArtifactStore: đã nén {packed} blob, {before} -> {after} byte.")
+        return packed, before, after
+
+    def diff_text(self, old_digest: str, new_digest: str, name: str = "") -> str:
+        """Unified diff giữa hai phiên bản (chỉ đọc nội dung khi hash khác nhau)."""
+        if old_digest == new_digest:
+            return ""
+        old = str(self.get(old_digest)).splitlines(keepends=True) if old_digest else []
+        new = str(self.get(new_digest)).splitlines(keepends=True) if new_digest else []
+        return "".join(difflib.unified_diff(old, new, f"a/{name}", f"b/{name}"))
+
+
+def load_manifest(run_dir: str) -> dict:
+    with open(os.path.join(run_dir, "manifest.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def diff_manifests(old: dict, new: dict) -> dict:
+    """So hai manifest theo hash: các mục thêm, xóa, thay đổi và số mục giữ nguyên."""
+    result = {"added": [], "removed": [], "changed": [], "unchanged": 0}
+    for section in ("memory", "files"):
+        a, b = old.get(section, {}), new.get(section, {})
+        result["added"] += [f"{section}:{name}" for name in sorted(b.keys() - a.keys())]
+        result["removed"] += [f"{section}:{name}" for name in sorted(a.keys() - b.keys())]
+        for name in sorted(a.keys() & b.keys()):
+            if a[name] != b[name]:
+                result["changed"].append(f"{section}:{name}")
+            else:
+                result["unchanged"] += 1
+    return result
+
+
+# Khởi tạo instance duy nhất
+artifact_store = ArtifactStore()
+
+
+if __name__ == "__main__":
+    # So sánh hai lần chạy: python -m memory.artifact_store diff runs/<run_a> runs/<run_b> --show phase_2/srs_document
+    # Nén lịch sử artifact: MAS_COMPRESSION=zlib python -m memory.artifact_store pack
+    parser = argparse.ArgumentParser(description="Xem và bảo trì kho artifact theo địa chỉ nội dung.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    diff_parser = commands.add_parser("diff", help="So sánh manifest artifact của hai lần chạy.")
+    diff_parser.add_argument("old", help="Thư mục lần chạy cũ, ví dụ runs/<run_id>.")
+    diff_parser.add_argument("new", help="Thư mục lần chạy mới.")
+    diff_parser.add_argument("--show", action="append", default=[],
+                             help="In unified diff của một mục (key 'phase/key' hoặc đường dẫn file); lặp lại được.")
+    commands.add_parser("pack", help="Nén các blob chỉ còn thuộc về lịch sử các lần chạy.")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        packed, before, after = artifact_store.pack()
+        print(f"Đã nén {packed} blob: {before} -> {after} byte.")
+    else:
+        old_manifest, new_manifest = load_manifest(args.old), load_manifest(args.new)
+        changes = diff_manifests(old_manifest, new_manifest)
+        for kind in ("added", "removed", "changed"):
+            for name in changes[kind]:
+                print(f"{kind:<8} {name}")
+        print(f"{changes['unchanged']} mục không đổi.")
+        for name in args.show:
+            section = "memory" if name in old_manifest["memory"] or name in new_manifest["memory"] else "files"
+            print(artifact_store.diff_text(old_manifest[section].get(name), new_manifest[section].get(name), name), end="")
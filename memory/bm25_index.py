@@ -0,0 +1,182 @@
+# memory/bm25_index.py
+
+import os
+import re
+import math
+import heapq
+import threading
+from collections import Counter
+
+from memory.shared_memory import shared_memory
+from memory.artifact_registry import artifact_registry
+from utils.prompt_budget import count_tokens
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_LINE_END = re.compile(r"\n")
+# Từ rất phổ biến (tiếng Việt/tiếng Anh) không giúp phân biệt đoạn văn.
+_STOPWORDS = frozenset(
+    "và là của các có cho với được trong này một những để không khi đã theo từ như về tại "
+    "the and of to a in for is on with be as by that this are or an it from at".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Chữ thường, tách theo từ (âm tiết với tiếng Việt), kèm bigram để giữ từ ghép như 'kiểm thử'."""
+    words = [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def split_chunks(text: str, chunk_tokens: int) -> list[tuple[int, int]]:
+    """Chia văn bản thành các đoạn (start, end) khoảng `chunk_tokens` token, chỉ cắt ở cuối dòng."""
+    chunks, start, end = [], 0, 0
+    boundaries = [m.end() for m in _LINE_END.finditer(text)] + [len(text)]
+    for boundary in boundaries:
+        if end > start and count_tokens(text[start:boundary]) > chunk_tokens:
+            chunks.append((start, end))
+            start = end
+        end = boundary
+    if text[start:end].strip():
+        chunks.append((start, end))
+    return chunks
+
+
+class BM25Index:
+    """
+    Chỉ mục ngược BM25 trong tiến trình trên các artifact của SharedMemory.
+
+    Mỗi artifact (nguồn "phase/key") được chia thành các đoạn; chỉ mục lưu postings term -> {đoạn: tf}
+    và vị trí (start, end) của đoạn trong giá trị gốc, không sao chép nội dung. Được lập chỉ mục lười:
+    một nguồn chỉ được tách từ khi `retrieve_context` cần tìm trong nó và giá trị đã đổi so với lần
+    lập chỉ mục trước; ghi lại một key chỉ thay các đoạn của key đó.
+    """
+
+    def __init__(self, chunk_tokens: int = None, k1: float = 1.5, b: float = 0.75):
+        self.chunk_tokens = chunk_tokens or int(os.getenv("MAS_RETRIEVAL_CHUNK_TOKENS", 120))
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._values = {}    # nguồn -> giá trị đã lập chỉ mục
+        self._chunks = {}    # id đoạn -> (nguồn, start, end, số term)
+        self._by_source = {}  # nguồn -> [id đoạn]
+        self._postings = {}  # term -> {id đoạn: tf}
+        self._chunk_terms = {}  # id đoạn -> các term (để xóa postings khi lập chỉ mục lại)
+        self._total_terms = 0
+        self._next_id = 0
+
+    def _remove(self, source: str):
+        for chunk_id in self._by_source.pop(source, []):
+            _, _, _, length = self._chunks.pop(chunk_id)
+            self._total_terms -= length
+            for term in self._chunk_terms.pop(chunk_id):
+                posting = self._postings[term]
+                del posting[chunk_id]
+                if not posting:
+                    del self._postings[term]
+        self._values.pop(source, None)
+
+    def add(self, source: str, value, text: str = None):
+        """
+        Lập chỉ mục (lại) một artifact; các đoạn cũ của cùng nguồn bị thay thế. `text` là `str(value)`
+        nếu người gọi đã có sẵn (tránh đọc lại một MappedText).
+        """
+        text = str(value) if text is None else text
+        entries = [(start, end, Counter(tokenize(text[start:end]))) for start, end in split_chunks(text, self.chunk_tokens)]
+        with self._lock:
+            self._remove(source)
+            ids = []
+            for start, end, counts in entries:
+                chunk_id, self._next_id = self._next_id, self._next_id + 1
+                length = sum(counts.values())
+                self._chunks[chunk_id] = (source, start, end, length)
+                self._chunk_terms[chunk_id] = list(counts)
+                self._total_terms += length
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[chunk_id] = tf
+                ids.append(chunk_id)
+            self._by_source[source] = ids
+            self._values[source] = value
+
+    def indexed(self, source: str, value) -> bool:
+        indexed = self._values.get(source)
+        return indexed is value or (indexed is not None and indexed == value)
+
+    def search(self, query: str, k: int = 8, sources: set = None) -> list[tuple[float, str, int, int]]:
+        """Top-k đoạn theo điểm BM25: [(điểm, nguồn, start, end)], chỉ trong `sources` nếu có."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._chunks)
+            if n == 0:
+                return []
+            average = self._total_terms / n
+            scores = Counter()
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for chunk_id, tf in posting.items():
+                    source, _, _, length = self._chunks[chunk_id]
+                    if sources is not None and source not in sources:
+                        continue
+                    scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / average))
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(score, *self._chunks[chunk_id][:3]) for chunk_id, score in best]
+
+    def chunks_of(self, source: str) -> list[tuple[int, int]]:
+        with self._lock:
+            return [self._chunks[chunk_id][1:3] for chunk_id in self._by_source.get(source, [])]
+
+
+def retrieve_context(query: str, sources: list[tuple[str, str]], budget_tokens: int = 800, k: int = 8,
+                     default: str = "Không có") -> str:
+    """
+    Các đoạn liên quan nhất tới `query` trong các artifact `sources` [(phase, key)], gói trong
+    `budget_tokens` token và giữ thứ tự xuất hiện trong tài liệu gốc.
+
+    Giá trị được đọc qua `shared_memory.get`, nên dataflow vẫn thấy các nguồn là đầu vào của task
+    và task trong `isolated()` nhận đúng phiên bản trong snapshot của nó.
+    """
+    names = {}
+    for phase, key in sources:
+        value = shared_memory.get(phase, key)
+        if value:
+            names["/".join(artifact_registry.resolve(phase, key))] = value
+    if not names:
+        return default
+
+    texts = {source: str(value) for source, value in names.items()}
+    if sum(count_tokens(text) for text in texts.values()) <= budget_tokens:
+        # Toàn bộ tài liệu đã vừa ngân sách: không cần cắt, cũng không cần lập chỉ mục.
+        return "\n\n".join(texts.values())
+    for source, value in names.items():
+        if not artifact_index.indexed(source, value):
+            artifact_index.add(source, value, texts[source])
+    hits = [(source, start, end) for _, source, start, end in artifact_index.search(query, k=k, sources=set(names))]
+    if not hits:
+        # Không đoạn nào khớp truy vấn: lấy phần đầu của từng tài liệu.
+        hits = [(source, start, end) for source in names for start, end in artifact_index.chunks_of(source)]
+    selected, used = [], 0
+    for source, start, end in hits:
+        if not artifact_index.indexed(source, names[source]):
+            continue  # Luồng khác vừa lập chỉ mục phiên bản khác của nguồn này.
+        text = texts[source][start:end].strip()
+        tokens = count_tokens(text)
+        if used + tokens > budget_tokens:
+            # Đoạn không vừa phần ngân sách còn lại: giữ các dòng đầu vừa đủ thay vì bỏ cả đoạn.
+            lines = text.splitlines()
+            while lines and used + count_tokens("\n".join(lines)) > budget_tokens:
+                lines.pop()
+            if not lines:
+                continue
+            text = "\n".join(lines)
+            tokens = count_tokens(text)
+        selected.append((list(names).index(source), start, source, text))
+        used += tokens
+    if not selected:
+        return default
+    selected.sort()
+    return "\n...\n".join(f"[{source}] {text}" if len(names) > 1 else text for _, _, source, text in selected)
+
+
+# Khởi tạo instance duy nhất; chỉ các nguồn được truy vấn mới được lập chỉ mục.
+artifact_index = BM25Index()
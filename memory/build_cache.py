@@ -0,0 +1,101 @@
+# memory/build_cache.py
+
+import os
+import json
+import hashlib
+import logging
+import threading
+
+from memory.checkpoint import hash_task_inputs
+from memory.artifact_store import artifact_store
+from utils.file_writer import write_output
+
+DEFAULT_BUILD_CACHE_DIR = os.path.join(".cache", "build")
+
+
+def task_fingerprint(task, llm=None, context: str = None) -> str:
+    """
+    Tính khóa incremental của một task: mô tả đã render, expected_output, output các task upstream
+    (qua `hash_task_inputs`) cộng với cấu hình agent (role, goal, backstory, LLM).
+    Chỉ cần một trong các thành phần này thay đổi thì task phải được sinh lại.
+    `llm` (nếu có) là LLM thực sự chạy task thay cho LLM của agent (xem utils/model_router.py);
+    `context` là output của task liền trước được truyền ngầm (xem `hash_task_inputs`).
+    """
+    agent = task.agent
+    digest = hashlib.sha256(hash_task_inputs(task, context).encode("utf-8"))
+    if agent is not None:
+        for field in ("role", "goal", "backstory", "llm"):
+            value = llm if field == "llm" and llm is not None else getattr(agent, field, "")
+            digest.update(b"\0")
+            digest.update(str(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """
+    Cache kiểu Make cho các artifact SDLC, lưu trên đĩa theo fingerprint của task.
+
+    Mỗi entry chứa output của task, các key shared_memory và các file output mà callback đã ghi,
+    dưới dạng hash trong `artifact_store` (nội dung giống nhau giữa các entry chỉ lưu một lần).
+    Khi fingerprint không đổi, task được tái sử dụng: bộ nhớ được nạp lại và file trong output/
+    được ghi lại nếu bị thiếu hoặc khác nội dung, không cần gọi LLM.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_BUILD_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, fingerprint[:2], f"{fingerprint}.json")
+
+    def get(self, fingerprint: str) -> dict | None:
+        path = self._path(fingerprint)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if "output_sha256" in entry:
+                entry = {
+                    "output": str(artifact_store.get(entry["output_sha256"])),
+                    "memory": artifact_store.get_writes(entry["memory_refs"]),
+                    "files": {path: artifact_store.get(digest) for path, digest in entry["file_refs"].items()},
+                }
+            return entry
+        except FileNotFoundError as e:
+            # Blob mà entry trỏ tới không có trong kho blob hiện tại (ví dụ kho khác thư mục): chưa có cache.
+            logging.info(f"BuildCache: thiếu blob {e.filename} của entry {path}, sinh lại task.")
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"BuildCache: bỏ qua entry hỏng {path}: {e}")
+            return None
+
+    def put(self, fingerprint: str, output: str, writes: list, files: dict):
+        """
+        Lưu kết quả của một task vừa chạy. `files` là đường dẫn -> hash trong `artifact_store`
+        (xem `track_output_files`). Ghi qua file tạm để không để lại entry dở dang.
+        """
+        entry = {
+            "output_sha256": artifact_store.put(output),
+            "memory_refs": artifact_store.put_writes(writes),
+            "file_refs": dict(files),
+        }
+        path = self._path(fingerprint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def restore_files(self, entry: dict):
+        """
+        Ghi lại các file output của entry nếu chúng bị thiếu hoặc đã bị thay đổi. So sánh theo byte
+        (`write_output` ghi đúng byte UTF-8), nên nội dung có "\r\n" không bị ghi lại ở mỗi lần dùng cache.
+        """
+        for path, content in entry.get("files", {}).items():
+            content = str(content)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    if f.read() == content.encode("utf-8"):
+                        continue
+            write_output(path, content)
@@ -0,0 +1,118 @@
+# memory/checkpoint.py
+
+import os
+import json
+import hashlib
+import logging
+import threading
+import uuid
+from datetime import datetime
+
+from memory.artifact_store import artifact_store
+
+DEFAULT_RUNS_DIR = "runs"
+
+
+def new_run_id() -> str:
+    """Tạo run_id theo thời điểm bắt đầu kèm hậu tố ngẫu nhiên, ví dụ 20250101_093000_1a2b3c."""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def hash_task_inputs(task, context: str = None) -> str:
+    """
+    Tính hash đầu vào của một task: mô tả, expected_output và output của các task trong context.
+    `context` là output của task liền trước mà scheduler truyền cho task không khai báo `context`
+    (như `Process.sequential` của CrewAI). Hai lần chạy cho cùng hash thì task nhận đúng cùng một prompt.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(task.description).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(str(task.expected_output).encode("utf-8"))
+    for upstream in (task.context or []):
+        digest.update(b"\0")
+        digest.update(str(upstream.output.raw_output if upstream.output else "").encode("utf-8"))
+    if context is not None:
+        digest.update(b"\0")
+        digest.update(str(context).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RunCheckpoint:
+    """
+    Checkpoint bền vững của một lần chạy `run_project_crew`.
+
+    Mỗi task hoàn thành được ghi thêm một dòng vào `runs/<run_id>/tasks.jsonl` gồm output,
+    các key shared_memory mà task đã lưu và hash đầu vào. Khi resume, các task đã có bản ghi
+    được bỏ qua và output của chúng được nạp lại vào shared_memory.
+
+    Output và giá trị các key được lưu trong `artifact_store`; bản ghi chỉ chứa hash của chúng.
+    """
+
+    def __init__(self, run_id: str, runs_dir: str = DEFAULT_RUNS_DIR):
+        self.run_id = run_id
+        self.run_dir = os.path.join(runs_dir, run_id)
+        self.tasks_path = os.path.join(self.run_dir, "tasks.jsonl")
+        self._lock = threading.Lock()
+        self._records = {}
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.tasks_path):
+            return
+        with open(self.tasks_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dòng cuối có thể bị cắt dở nếu tiến trình dừng đột ngột khi đang ghi.
+                    continue
+                self._records[record["task_id"]] = record
+        logging.info(f"Checkpoint '{self.run_id}': đã nạp {len(self._records)} task hoàn thành.")
+
+    def save_meta(self, **meta):
+        """Lưu thông tin chung của lần chạy (ví dụ system_request) vào meta.json."""
+        path = os.path.join(self.run_dir, "meta.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def load_meta(self) -> dict:
+        path = os.path.join(self.run_dir, "meta.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, task_id: str, input_hash: str) -> dict | None:
+        """Trả về bản ghi của task nếu đã hoàn thành với cùng hash đầu vào."""
+        record = self._records.get(task_id)
+        if record is None:
+            return None
+        if record["input_hash"] != input_hash:
+            logging.info(f"Checkpoint: đầu vào của '{task_id}' đã thay đổi, chạy lại task.")
+            return None
+        if "output_sha256" in record:
+            try:
+                record = {**record, "output": str(artifact_store.get(record["output_sha256"])),
+                          "memory": artifact_store.get_writes(record["memory_refs"])}
+            except FileNotFoundError as e:
+                logging.warning(f"Checkpoint: không đọc được output của '{task_id}' ({e}), chạy lại task.")
+                return None
+        return record
+
+    def record(self, task_id: str, input_hash: str, output: str, writes: list):
+        """Ghi nhận một task đã hoàn thành. `writes` là danh sách (phase, key, value) task đã lưu."""
+        record = {
+            "task_id": task_id,
+            "input_hash": input_hash,
+            "output_sha256": artifact_store.put(output),
+            "memory_refs": artifact_store.put_writes(writes),
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.tasks_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._records[task_id] = record
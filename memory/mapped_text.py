@@ -0,0 +1,115 @@
+# memory/mapped_text.py
+"""
+Giá trị lớn của SharedMemory được đưa ra file blob bất biến và đọc lại qua mmap.
+
+Blob là bản sao riêng, không phải handle chỉ đọc tới file trong output/: file output có thể bị ghi đè
+hoặc bị người dùng sửa, còn blob phải giữ đúng nội dung đã băm. Vì vậy một output lớn vừa được
+`write_output` ghi vào output/ vừa được spill vào .cache/blobs, tức là tốn đĩa gấp đôi kích thước của nó.
+Blob trùng nội dung chỉ được lưu một lần giữa các lần chạy, và `python -m memory.artifact_store pack`
+nén các blob cũ để giảm phần chi phí này.
+"""
+
+import os
+import mmap
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BLOB_DIR = os.path.join(".cache", "blobs")
+
+
+def spill_threshold() -> int:
+    """Số byte UTF-8 tối thiểu để một chuỗi được đưa ra file (MAS_MEMORY_SPILL_THRESHOLD, 0 = tắt)."""
+    return int(os.getenv("MAS_MEMORY_SPILL_THRESHOLD", 16384))
+
+
+def blob_path(digest: str, blob_dir: str = None) -> str:
+    blob_dir = blob_dir or os.getenv("MAS_BLOB_DIR", DEFAULT_BLOB_DIR)
+    return os.path.join(blob_dir, digest[:2], digest)
+
+
+class MappedText:
+    """
+    Chuỗi chỉ đọc nằm trong một file blob bất biến, được đọc lười qua mmap khi cần.
+
+    Trong RAM chỉ giữ đường dẫn và độ dài; nội dung do page cache của hệ điều hành quản lý.
+    Dùng được như `str` ở những chỗ các factory cần: f-string, `or`, `len`, cắt `[:N]` (chỉ đọc
+    phần đầu file), so sánh, và các phương thức của `str` (chuyển qua chuỗi đầy đủ).
+    """
+    __slots__ = ("path", "length", "nbytes")
+
+    def __init__(self, path: str, length: int = None, nbytes: int = None):
+        self.path = path
+        self.length = length
+        self.nbytes = os.path.getsize(path) if nbytes is None else nbytes
+
+    @contextmanager
+    def _mapped(self):
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                yield m
+
+    def __str__(self) -> str:
+        with self._mapped() as m:
+            return m[:].decode("utf-8")
+
+    def __format__(self, spec: str) -> str:
+        return format(str(self), spec)
+
+    def __repr__(self) -> str:
+        return f"MappedText({self.path!r}, nbytes={self.nbytes})"
+
+    def __len__(self) -> int:
+        if self.length is None:
+            self.length = len(str(self))
+        return self.length
+
+    def __bool__(self) -> bool:
+        return self.nbytes > 0
+
+    def __getitem__(self, item):
+        if isinstance(item, slice) and item.start in (None, 0) and item.step is None \
+                and item.stop is not None and 0 <= item.stop * 4 <= self.nbytes:
+            # Mỗi ký tự UTF-8 tối đa 4 byte: `stop` ký tự đầu nằm trọn trong `stop * 4` byte đầu.
+            with self._mapped() as m:
+                return m[:item.stop * 4].decode("utf-8", errors="ignore")[:item.stop]
+        return str(self)[item]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, MappedText):
+            return self.path == other.path or str(self) == str(other)
+        if isinstance(other, str):
+            return str(self) == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def __contains__(self, item) -> bool:
+        return item in str(self)
+
+    def __add__(self, other):
+        return str(self) + other
+
+    def __radd__(self, other):
+        return other + str(self)
+
+    def __getattr__(self, name):
+        # Các phương thức còn lại của str (strip, split, replace...) chạy trên chuỗi đầy đủ.
+        if name.startswith("__") or name in MappedText.__slots__:
+            raise AttributeError(name)
+        return getattr(str(self), name)
+
+
+def spill(text: str, blob_dir: str = None) -> MappedText:
+    """Đưa `text` ra file blob theo hash nội dung (dùng lại blob đã có) và trả về MappedText."""
+    data = text.encode("utf-8")
+    path = blob_path(hashlib.sha256(data).hexdigest(), blob_dir)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return MappedText(path, len(text), len(data))
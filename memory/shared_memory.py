@@ -1,43 +1,358 @@
 # memory/shared_memory.py
 
+import os
+import logging
+import threading
+from types import MappingProxyType
+from contextlib import contextmanager
+
+from utils.tracing import tracer
+from memory.artifact_registry import artifact_registry
+from memory.mapped_text import spill, spill_threshold
+
+class DictMemoryBackend:
+    """
+    Backend mặc định: lưu trong dict của tiến trình, mất khi tiến trình kết thúc.
+
+    Copy-on-write lười: dict đã phát hành qua `snapshot()`/`get_phase()` không bao giờ bị sửa. Chỉ lần
+    `set` đầu tiên sau khi phát hành mới sao chép cấp ngoài cùng và dict của phase được ghi; các lần ghi
+    sau đó sửa tại chỗ. Nhờ vậy `get` không cần khóa, `snapshot()` là O(1), và chuỗi `set` không có
+    snapshot nào xen giữa không phải sao chép lại cả phase ở mỗi lần ghi.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._outer_owned = True
+        self._owned_phases = set()
+
+    def set(self, phase: str, key: str, value):
+        with self._lock:
+            if not self._outer_owned:
+                self._data = dict(self._data)
+                self._outer_owned = True
+            if phase not in self._owned_phases:
+                self._data[phase] = dict(self._data.get(phase, {}))
+                self._owned_phases.add(phase)
+            self._data[phase][key] = value
+
+    def get(self, phase: str, key: str):
+        return self._data.get(phase, {}).get(key)
+
+    def get_phase(self, phase: str) -> dict:
+        with self._lock:
+            self._owned_phases.discard(phase)
+            return MappingProxyType(self._data.get(phase, {}))
+
+    def keys(self) -> list:
+        with self._lock:
+            return [(phase, key) for phase, data in self._data.items() for key in data]
+
+    def snapshot(self) -> dict:
+        """Trạng thái hiện tại (bất biến) của toàn bộ bộ nhớ."""
+        with self._lock:
+            self._outer_owned = False
+            self._owned_phases = set()
+            return self._data
+
+    def flush(self):
+        pass
+
+    def clear(self):
+        with self._lock:
+            self._data = {}
+            self._outer_owned = True
+            self._owned_phases = set()
+
+
+class MemorySnapshot:
+    """
+    Góc nhìn chỉ đọc của SharedMemory tại một thời điểm, kèm version của từng key lúc chụp.
+
+    Với backend hỗ trợ `snapshot()` (dict), mọi lần đọc thấy đúng trạng thái lúc chụp. Với backend
+    khác (SQLite), giá trị được ghi nhớ ở lần đọc đầu tiên để các lần đọc sau trả về cùng giá trị.
+    `changed_keys` so version lúc chụp với version hiện tại để biết đầu vào nào đã bị ghi đè.
+    """
+
+    def __init__(self, memory, data, versions: dict, version: int):
+        self._memory = memory
+        self._data = data
+        self._memo = {}
+        self.versions = versions
+        self.version = version
+        self.reads = set()
+        self.own_writes = {}
+
+    def get(self, phase: str, key: str):
+        self.reads.add((phase, key))
+        if self._data is not None:
+            return self._data.get(phase, {}).get(key)
+        if (phase, key) not in self._memo:
+            self._memo[(phase, key)] = self._memory.backend.get(phase, key)
+        return self._memo[(phase, key)]
+
+    def get_phase_data(self, phase: str):
+        if self._data is not None:
+            return MappingProxyType(self._data.get(phase, {}))
+        return MappingProxyType(dict(self._memory.backend.get_phase(phase)))
+
+    def version_of(self, phase: str, key: str) -> int:
+        return self.versions.get((phase, key), 0)
+
+    def changed_keys(self, keys=None) -> list:
+        """
+        Các (phase, key) trong `keys` bị ghi lại sau lúc chụp. Mặc định là các key đã đọc qua snapshot,
+        trừ các key do chính luồng sở hữu snapshot ghi (trong `SharedMemory.isolated()`).
+        """
+        keys = self.reads - self.own_writes.keys() if keys is None else keys
+        return sorted(k for k in keys if self._memory.version_of(*k) != self.version_of(*k))
+
+
+def _create_backend():
+    """Chọn backend theo MAS_MEMORY_BACKEND: "memory" (mặc định) hoặc "sqlite" (file MAS_MEMORY_PATH)."""
+    name = os.getenv("MAS_MEMORY_BACKEND", "memory")
+    if name == "memory":
+        return DictMemoryBackend()
+    if name == "sqlite":
+        from memory.sqlite_memory import SQLiteMemoryBackend, DEFAULT_MEMORY_DB_PATH
+        return SQLiteMemoryBackend(os.getenv("MAS_MEMORY_PATH", DEFAULT_MEMORY_DB_PATH))
+    raise ValueError(f"MAS_MEMORY_BACKEND không hợp lệ: {name}")
+
+
 class SharedMemory:
     """
     Quản lý bộ nhớ chia sẻ giữa các agent và các phase của dự án.
+
+    Dữ liệu nằm trong một backend có thể thay đổi (`configure`): dict trong tiến trình, hoặc
+    SQLite (memory/sqlite_memory.py) để nhiều tiến trình dùng chung và xem lại sau khi chạy.
+
+    An toàn khi nhiều task chạy song song: mỗi lần ghi tăng version của key (và version chung)
+    dưới một khóa; `isolated()` cho một task góc nhìn snapshot cố định trong suốt thời gian chạy.
+
+    Chuỗi dài từ MAS_MEMORY_SPILL_THRESHOLD byte (UTF-8) trở lên được lưu dưới dạng `MappedText`
+    (memory/mapped_text.py): nội dung nằm trong file và chỉ được đọc qua mmap khi cần.
+
+    Mọi (phase, key) được quy về ID chuẩn qua `artifact_registry` (config/artifacts.yaml) trước khi
+    đọc/ghi, nên consumer dùng alias (ví dụ 'phase_3_design/hld') vẫn đọc được key producer đã ghi.
     """
     _instance = None
-    _data = {}
+    _backend = None
+    _backend_lock = threading.Lock()
+    _write_lock = threading.Lock()
+    _versions = {}
+    _versions_shared = False
+    _version = 0
+    _subscribers = {}
+    _subscribers_lock = threading.Lock()
+    _local = threading.local()
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(SharedMemory, cls).__new__(cls)
         return cls._instance
 
+    @property
+    def backend(self):
+        if SharedMemory._backend is None:
+            with SharedMemory._backend_lock:
+                if SharedMemory._backend is None:
+                    SharedMemory._backend = _create_backend()
+        return SharedMemory._backend
+
+    def configure(self, backend):
+        """Thay backend lưu trữ; các giá trị chưa commit của backend cũ được flush trước."""
+        if SharedMemory._backend is not None:
+            SharedMemory._backend.flush()
+        SharedMemory._backend = backend
+
+    def flush(self):
+        """Đảm bảo mọi giá trị đã `set` được ghi bền vững (no-op với backend dict)."""
+        self.backend.flush()
+
     def set(self, phase: str, key: str, value: any):
         """
         Lưu trữ một giá trị vào bộ nhớ chia sẻ dưới một phase và key cụ thể.
         """
-        if phase not in self._data:
-            self._data[phase] = {}
-        self._data[phase][key] = value
+        phase, key = artifact_registry.resolve(phase, key)
+        size = len(value.encode("utf-8")) if isinstance(value, str) else None
+        if size is not None and 0 < spill_threshold() <= size:
+            # Chuỗi lớn nằm trong file blob của kho artifact (một bản sao theo hash nội dung), RAM chỉ giữ handle.
+            value = spill(value)
+        with tracer.span("SharedMemory.set", "memory", phase=phase, key=key, size=size):
+            with SharedMemory._write_lock:
+                self.backend.set(phase, key, value)
+                SharedMemory._version += 1
+                if SharedMemory._versions_shared:
+                    # Snapshot còn giữ dict version cũ: sao chép một lần, các lần ghi sau sửa tại chỗ.
+                    SharedMemory._versions = dict(SharedMemory._versions)
+                    SharedMemory._versions_shared = False
+                SharedMemory._versions[(phase, key)] = SharedMemory._version
+            view = getattr(self._local, "view", None)
+            if view is not None:
+                view.own_writes[(phase, key)] = value
+            writes = getattr(self._local, "writes", None)
+            if writes is not None:
+                writes.append((phase, key, value))
         print(f"SharedMemory: Đã lưu '{key}' vào phase '{phase}'.")
+        self._notify(phase, key, value)
+
+    def subscribe(self, phase: str, key: str = None, callback=None):
+        """
+        Đăng ký `callback(phase, key, value)` được gọi sau mỗi lần `set` vào (phase, key).
+        `key=None` nghĩa là mọi key của phase; `phase=None, key=None` nghĩa là mọi lần ghi. Callback chạy trên luồng vừa ghi, sau khi giá trị
+        đã hiển thị với mọi luồng, nên cần ngắn gọn. Chỉ có hiệu lực trong tiến trình hiện tại.
+
+        Returns:
+            Hàm không tham số để hủy đăng ký.
+        """
+        if key is None:
+            phase = artifact_registry.resolve_phase(phase)
+        else:
+            phase, key = artifact_registry.resolve(phase, key)
+        with SharedMemory._subscribers_lock:
+            SharedMemory._subscribers.setdefault((phase, key), []).append(callback)
+
+        def unsubscribe():
+            with SharedMemory._subscribers_lock:
+                callbacks = SharedMemory._subscribers.get((phase, key), [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+                if not callbacks:
+                    SharedMemory._subscribers.pop((phase, key), None)
+        return unsubscribe
+
+    def _notify(self, phase: str, key: str, value):
+        with SharedMemory._subscribers_lock:
+            callbacks = (SharedMemory._subscribers.get((phase, key), []) + SharedMemory._subscribers.get((phase, None), [])
+                         + SharedMemory._subscribers.get((None, None), []))
+        for callback in callbacks:
+            try:
+                callback(phase, key, value)
+            except Exception as e:
+                logging.error(f"SharedMemory: callback của '{phase}/{key}' lỗi: {e}")
+
+    def wait_for(self, phase: str, key: str, timeout: float = None):
+        """
+        Chặn cho đến khi (phase, key) có giá trị rồi trả về giá trị đó (trả về ngay nếu đã có).
+        Đọc bộ nhớ chung, không qua snapshot của `isolated()`.
+
+        Raises:
+            TimeoutError: Hết `timeout` giây mà key vẫn chưa được ghi.
+        """
+        phase, key = artifact_registry.resolve(phase, key)
+        written = threading.Event()
+        unsubscribe = self.subscribe(phase, key, lambda *_: written.set())
+        try:
+            # Kiểm tra sau khi đăng ký để không bỏ lỡ lần ghi xảy ra giữa hai bước.
+            value = self.backend.get(phase, key)
+            if value is not None:
+                return value
+            if not written.wait(timeout):
+                raise TimeoutError(f"Hết thời gian chờ '{key}' trong phase '{phase}'.")
+            return self.backend.get(phase, key)
+        finally:
+            unsubscribe()
 
     def get(self, phase: str, key: str):
         """
         Lấy một giá trị từ bộ nhớ chia sẻ dựa trên phase và key.
         """
-        return self._data.get(phase, {}).get(key)
+        phase, key = artifact_registry.resolve(phase, key)
+        with tracer.span("SharedMemory.get", "memory", phase=phase, key=key):
+            reads = getattr(self._local, "reads", None)
+            if reads is not None:
+                reads.add((phase, key))
+            view = getattr(self._local, "view", None)
+            if view is None:
+                return self.backend.get(phase, key)
+            # Trong isolated(): task thấy các giá trị chính nó vừa ghi, còn lại đọc từ snapshot.
+            if (phase, key) in view.own_writes:
+                return view.own_writes[(phase, key)]
+            return view.get(phase, key)
+
+    @property
+    def version(self) -> int:
+        """Version chung, tăng sau mỗi lần `set`."""
+        return SharedMemory._version
+
+    def version_of(self, phase: str, key: str) -> int:
+        """Version của một key (0 nếu chưa từng được ghi)."""
+        phase, key = artifact_registry.resolve(phase, key)
+        return SharedMemory._versions.get((phase, key), 0)
+
+    def snapshot(self) -> MemorySnapshot:
+        """Chụp trạng thái hiện tại; chi phí O(1) với backend dict nhờ copy-on-write."""
+        with SharedMemory._write_lock:
+            take = getattr(self.backend, "snapshot", None)
+            SharedMemory._versions_shared = True
+            return MemorySnapshot(self, take() if take else None, SharedMemory._versions, SharedMemory._version)
+
+    @contextmanager
+    def isolated(self):
+        """
+        Cho luồng hiện tại đọc từ một snapshot chụp lúc bắt đầu khối `with` (ghi vẫn đi vào bộ nhớ chung).
+        Sau khối `with`, `view.changed_keys()` cho biết các đầu vào đã đọc có bị task khác ghi đè không.
+        """
+        previous = getattr(self._local, "view", None)
+        view = self.snapshot()
+        self._local.view = view
+        try:
+            yield view
+        finally:
+            self._local.view = previous
+
+    @contextmanager
+    def track_reads(self):
+        """
+        Ghi lại các cặp (phase, key) được `get` trong luồng hiện tại.
+        Dùng để suy ra đầu vào thực sự của một hàm tạo task.
+        """
+        previous = getattr(self._local, "reads", None)
+        reads = set()
+        self._local.reads = reads
+        try:
+            yield reads
+        finally:
+            self._local.reads = previous
+
+    @contextmanager
+    def track_writes(self):
+        """
+        Ghi lại các bộ (phase, key, value) được `set` trong luồng hiện tại.
+        Dùng để biết một task đã lưu những key nào (phục vụ checkpoint).
+        """
+        previous = getattr(self._local, "writes", None)
+        writes = []
+        self._local.writes = writes
+        try:
+            yield writes
+        finally:
+            self._local.writes = previous
+
+    def keys(self) -> list:
+        """Mọi cặp (phase, key) đang có giá trị (ID chuẩn)."""
+        return self.backend.keys()
 
     def get_phase_data(self, phase: str):
         """
-        Lấy tất cả dữ liệu của một phase cụ thể.
+        Lấy tất cả dữ liệu của một phase cụ thể (chỉ đọc).
         """
-        return self._data.get(phase, {})
+        phase = artifact_registry.resolve_phase(phase)
+        view = getattr(self._local, "view", None)
+        if view is not None:
+            return MappingProxyType({**view.get_phase_data(phase), **{
+                key: value for (p, key), value in view.own_writes.items() if p == phase
+            }})
+        return self.backend.get_phase(phase)
 
     def clear(self):
         """
         Xóa toàn bộ bộ nhớ chia sẻ.
         """
-        self._data = {}
+        with SharedMemory._write_lock:
+            self.backend.clear()
+            SharedMemory._versions = {}
+            SharedMemory._versions_shared = False
         print("SharedMemory: Đã xóa toàn bộ bộ nhớ.")
 
 # Khởi tạo instance duy nhất
@@ -0,0 +1,183 @@
+# memory/sqlite_memory.py
+
+import os
+import json
+import time
+import atexit
+import sqlite3
+import logging
+import argparse
+import threading
+
+from memory.mapped_text import MappedText
+from memory.artifact_store import artifact_store
+from utils.compression import get_codec, is_compressed
+
+DEFAULT_MEMORY_DB_PATH = os.path.join(".cache", "shared_memory.sqlite")
+# Khóa duy nhất của JSON tham chiếu tới một blob trong kho artifact thay cho nội dung.
+BLOB_REF_KEY = "$blob_sha256"
+
+
+class SQLiteMemoryBackend:
+    """
+    Backend lưu SharedMemory trong một file SQLite ở chế độ WAL, dùng chung được giữa nhiều tiến trình.
+
+    - Mỗi luồng đọc qua kết nối riêng; mọi lần ghi của tiến trình đi qua một kết nối writer.
+      WAL cho phép nhiều reader đọc song song với writer, kể cả ở tiến trình khác.
+    - Cache đọc trong tiến trình: chỉ bị xóa khi `PRAGMA data_version` của kết nối writer cho thấy
+      một tiến trình khác đã commit (commit của chính writer không làm đổi giá trị này).
+    - Ghi theo lô: các lệnh `set` được gom lại và commit trong một transaction khi đủ `batch_size`
+      bản ghi, sau `flush_interval` giây, hoặc khi gọi `flush()` (tự động khi thoát tiến trình).
+      Trong cùng tiến trình, giá trị vừa `set` đọc được ngay kể cả khi chưa commit.
+    - Giá trị được lưu dưới dạng JSON; mỗi key có `version` tăng sau mỗi lần commit có thay đổi key đó.
+      Với MAS_COMPRESSION (utils/compression.py), JSON được nén thành BLOB và giải nén khi đọc.
+    - Giá trị lớn (`MappedText`) không được nhúng vào JSON: bảng chỉ lưu `{"$blob_sha256": <hash>}` và
+      khi đọc, giá trị được lấy lại qua `artifact_store.get` (vẫn là MappedText đọc lười). Các tiến trình
+      dùng chung file SQLite cũng cần dùng chung kho blob (MAS_BLOB_DIR).
+    """
+
+    def __init__(self, path: str = DEFAULT_MEMORY_DB_PATH, batch_size: int = None, flush_interval: float = None):
+        self.path = path
+        self.batch_size = batch_size or int(os.getenv("MAS_MEMORY_BATCH_SIZE", 32))
+        self.flush_interval = flush_interval if flush_interval is not None else float(
+            os.getenv("MAS_MEMORY_FLUSH_INTERVAL", 0.5))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._cache = {}
+        self._pending = {}
+        self._timer = None
+        self._writer = self._connect(check_same_thread=False)
+        with self._writer:
+            self._writer.execute(
+                "CREATE TABLE IF NOT EXISTS memory ("
+                " phase TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " version INTEGER NOT NULL DEFAULT 1, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (phase, key))"
+            )
+        self._data_version = self._writer.execute("PRAGMA data_version").fetchone()[0]
+        atexit.register(self.flush)
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _check_external_writes(self):
+        """Xóa cache đọc nếu một tiến trình khác đã commit kể từ lần kiểm tra trước."""
+        with self._lock:
+            data_version = self._writer.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._cache.clear()
+                self._data_version = data_version
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, MappedText):
+            value = {BLOB_REF_KEY: artifact_store.put(value)}
+        encoded = json.dumps(value, ensure_ascii=False, default=str)
+        compressed = get_codec().compress(encoded.encode("utf-8"))
+        return compressed if is_compressed(compressed) else encoded
+
+    @staticmethod
+    def _decode(stored):
+        if isinstance(stored, bytes):
+            stored = get_codec().decompress(stored).decode("utf-8")
+        value = json.loads(stored)
+        if isinstance(value, dict) and value.keys() == {BLOB_REF_KEY}:
+            return artifact_store.get(value[BLOB_REF_KEY])
+        return value
+
+    def set(self, phase: str, key: str, value):
+        encoded = self._encode(value)
+        with self._lock:
+            self._pending[(phase, key)] = (value, encoded, time.time())
+            self._cache[(phase, key)] = value
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+            elif self._timer is None and self.flush_interval > 0:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if self.flush_interval == 0:
+            self.flush()
+
+    def get(self, phase: str, key: str):
+        self._check_external_writes()
+        with self._lock:
+            if (phase, key) in self._pending:
+                return self._pending[(phase, key)][0]
+            if (phase, key) in self._cache:
+                return self._cache[(phase, key)]
+        row = self._reader().execute(
+            "SELECT value FROM memory WHERE phase = ? AND key = ?", (phase, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value = self._decode(row[0])
+        with self._lock:
+            # Một lần set trong lúc đang đọc thắng giá trị vừa đọc từ DB.
+            return self._cache.setdefault((phase, key), value)
+
+    def get_phase(self, phase: str) -> dict:
+        self.flush()
+        rows = self._reader().execute("SELECT key, value FROM memory WHERE phase = ?", (phase,)).fetchall()
+        return {key: self._decode(value) for key, value in rows}
+
+    def keys(self) -> list:
+        self.flush()
+        return self._reader().execute("SELECT phase, key FROM memory ORDER BY phase, key").fetchall()
+
+    def flush(self):
+        """Commit các lần ghi đang chờ trong một transaction."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            with self._writer:
+                self._writer.executemany(
+                    "INSERT INTO memory (phase, key, value, version, updated_at) VALUES (?, ?, ?, 1, ?)"
+                    " ON CONFLICT(phase, key) DO UPDATE SET"
+                    " value = excluded.value, version = memory.version + 1, updated_at = excluded.updated_at",
+                    [(phase, key, encoded, updated_at) for (phase, key), (_, encoded, updated_at) in pending.items()],
+                )
+        logging.debug(f"SQLiteMemoryBackend: đã commit {len(pending)} bản ghi vào {self.path}.")
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._cache.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            with self._writer:
+                self._writer.execute("DELETE FROM memory")
+
+
+if __name__ == "__main__":
+    # Xem trạng thái SharedMemory của một lần chạy, ví dụ: python -m memory.sqlite_memory runs/<run_id>/memory.sqlite phase_0
+    parser = argparse.ArgumentParser(description="In nội dung SharedMemory đã lưu trong một file SQLite.")
+    parser.add_argument("path", help="File SQLite, ví dụ runs/<run_id>/memory.sqlite.")
+    parser.add_argument("phase", nargs="?", help="Chỉ in một phase.")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.path}?mode=ro", uri=True)
+    query = "SELECT phase, key, version, updated_at, length(value) FROM memory"
+    params = ()
+    if args.phase:
+        query += " WHERE phase = ?"
+        params = (args.phase,)
+    for phase, key, version, updated_at, size in conn.execute(query + " ORDER BY phase, updated_at", params):
+        print(f"{phase:<25} {key:<45} v{version:<3} {size:>8} ký tự  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(updated_at))}")
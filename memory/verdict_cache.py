@@ -0,0 +1,64 @@
+# memory/verdict_cache.py
+
+import os
+import json
+import hashlib
+import logging
+import threading
+
+from memory.artifact_store import artifact_store
+
+DEFAULT_VERDICT_CACHE_DIR = os.path.join(".cache", "verdicts")
+
+
+def review_key(*parts) -> str:
+    """Khóa của một lần review: hash của các thành phần (prompt review, nội dung tài liệu, tài liệu nó tham chiếu...)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part if part is not None else "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class VerdictCache:
+    """
+    Cache bản review của quality gate theo hash nội dung, dùng chung giữa các lần chạy.
+
+    Khóa (`review_key`) gồm nội dung tài liệu và nội dung các tài liệu mà nó tham chiếu, nên khi chạy lại
+    chỉ các tài liệu đã đổi, cùng các tài liệu phụ thuộc vào chúng, được review lại. Bản review được lưu
+    trong `artifact_store`; entry chỉ chứa hash của nó và kết luận.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir or os.getenv("MAS_GATE_VERDICT_CACHE_DIR", DEFAULT_VERDICT_CACHE_DIR)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> dict | None:
+        """Entry {"artifact", "status", "review"} của khóa, hoặc None nếu chưa review nội dung này."""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            return {"artifact": entry["artifact"], "status": entry["status"],
+                    "review": str(artifact_store.get(entry["review_sha256"]))}
+        except (OSError, KeyError, json.JSONDecodeError) as e:
+            logging.warning(f"VerdictCache: bỏ qua entry hỏng {path}: {e}")
+            return None
+
+    def put(self, key: str, artifact: str, status: str, review: str):
+        """Lưu bản review của một tài liệu. Ghi qua file tạm để không để lại entry dở dang."""
+        entry = {"artifact": artifact, "status": status, "review_sha256": artifact_store.put(review)}
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+# Khởi tạo instance duy nhất
+verdict_cache = VerdictCache()
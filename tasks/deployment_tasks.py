@@ -1,25 +1,34 @@
-ds# tasks/deployment_tasks.py (MODIFIED)
+# tasks/deployment_tasks.py (MODIFIED)
 
 from crewai import Task
+from tasks.template_task import TemplateTask
 from utils.file_writer import write_output
 from memory.shared_memory import shared_memory
-from tasks.quality_gate_tasks import create_quality_gate_task # Import task mới
+from memory.bm25_index import retrieve_context
+from tasks.quality_gate_tasks import create_quality_gate_tasks # Import task mới
 
 def create_deployment_tasks(deployment_agent, project_manager_agent): # THÊM project_manager_agent
     """
     Tạo các task liên quan đến triển khai hệ thống, sử dụng agent đã được cung cấp.
     """
-    # Lấy thông tin từ shared_memory nếu cần
-    project_plan = shared_memory.get("phase_1_planning", "project_plan") # Giả định project_plan được lưu từ phase 1
-    build_and_deployment_plan_dev = shared_memory.get("phase_4_development", "build_and_deployment_plan") # Giả định từ phase 4
+    # Lấy thông tin từ shared_memory nếu cần: chỉ các đoạn liên quan tới triển khai, không phải toàn bộ tài liệu
+    deployment_query = ("triển khai môi trường sản xuất production hạ tầng cấu hình lịch trình go-live "
+                        "rollback kiểm tra sau triển khai phát hành build release")
+    def project_plan():
+        return retrieve_context(deployment_query, [("phase_1_planning", "project_plan")],
+                                budget_tokens=800, default=None) # Giả định project_plan được lưu từ phase 1
 
-    deployment_plan_task = Task(
-        description=(
+    def build_and_deployment_plan_dev():
+        return retrieve_context(deployment_query, [("phase_4_development", "build_and_deployment_plan")],
+                                budget_tokens=800, default=None) # Giả định từ phase 4
+
+    deployment_plan_task = TemplateTask(
+        description=lambda: (
             f"Dựa trên Project Plan và Build and Deployment Plan, tạo một kế hoạch triển khai chi tiết "
             f"cho việc đưa hệ thống vào môi trường sản xuất. Kế hoạch phải bao gồm các bước triển khai, "
             f"yêu cầu về môi trường, lịch trình, và các bước kiểm tra sau triển khai.\n"
-            f"--- Project Plan: {project_plan if project_plan else 'Không có'}\n"
-            f"--- Build and Deployment Plan (từ Development): {build_and_deployment_plan_dev if build_and_deployment_plan_dev else 'Không có'}"
+            f"--- Project Plan: {project_plan() or 'Không có'}\n"
+            f"--- Build and Deployment Plan (từ Development): {build_and_deployment_plan_dev() or 'Không có'}"
         ),
         expected_output="Tài liệu tiếng Việt 'Deployment_Plan.md' và 'Production_Implementation_Plan.docx' đầy đủ, chi tiết các bước triển khai và kế hoạch thực hiện sản xuất.",
         agent=deployment_agent,
@@ -62,12 +71,15 @@ def create_deployment_tasks(deployment_agent, project_manager_agent): # THÊM pr
     )
 
     # Task Quality Gate cho Deployment Phase
-    quality_gate_deployment_task = create_quality_gate_task(
+    quality_gate_deployment_tasks = create_quality_gate_tasks(
         project_manager_agent,
         "Phase 6: Deployment",
-        "deployment_plan_and_impl_plan", # Hoặc kết hợp các key khác nếu bạn muốn kiểm tra nhiều tài liệu
+        {
+            "deployment_plan_and_impl_plan": deployment_plan_task,
+            "handover_documents": handover_task,
+            "monitoring_guide": monitoring_task,
+        },
         "Deployment Plan, Production Implementation Plan, Handover Documents, Monitoring Guide"
     )
-    quality_gate_deployment_task.context = [deployment_plan_task, handover_task, monitoring_task]
 
-    return [deployment_plan_task, handover_task, monitoring_task, quality_gate_deployment_task] # THÊM quality_gate_deployment_task
\ No newline at end of file
+    return [deployment_plan_task, handover_task, monitoring_task] + quality_gate_deployment_tasks
\ No newline at end of file
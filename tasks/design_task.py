@@ -1,10 +1,12 @@
 # --- START OF FILE tasks/design_tasks.py (Phiên bản Hoàn chỉnh 100%) ---
 
 from crewai import Task
+from tasks.template_task import TemplateTask
 from textwrap import dedent
 from utils.file_writer import write_output
 from memory.shared_memory import shared_memory
-from tasks.quality_gate_tasks import create_quality_gate_task
+from utils.prompt_budget import fit_sections
+from tasks.quality_gate_tasks import create_quality_gate_tasks
 
 class DesignTasksFactory:
     """
@@ -14,10 +16,15 @@ class DesignTasksFactory:
 
     # === architecture_tasks.py ===
     def create_architecture_tasks(self, agent) -> list[Task]:
-        srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
-        architecture_document = shared_memory.get("phase_3", "architecture_document") or "Tài liệu kiến trúc không có sẵn."
-        task1 = Task(
-            description=dedent(f"""
+        def srs_document():
+            return shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
+        def architecture_document():
+            return shared_memory.get("phase_3", "architecture_document") or "Tài liệu kiến trúc không có sẵn."
+        def task1_description():
+            srs_document_ctx = fit_sections("DesignTasksFactory.create_architecture_tasks.task1", 667, [
+                ("srs_document", srs_document(), 20),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ (1/2): XÂY DỰNG TÀI LIỆU KIẾN TRÚC HỆ THỐNG
 
                 ## Mục tiêu:
@@ -35,9 +42,12 @@ class DesignTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (SRS):
                 ```markdown
-                {srs_document[:2000]}...
+                {srs_document_ctx}
                 ```
-            """),
+            """)
+
+        task1 = TemplateTask(
+            description=task1_description,
             expected_output="""Một tài liệu kiến trúc hệ thống hoàn chỉnh, được định dạng bằng Markdown.
                 Tài liệu phải có đầy đủ 4 phần đã yêu cầu, với các giải thích logic và một khối mã Mermaid.js cho sơ đồ kiến trúc.
             """,
@@ -46,8 +56,12 @@ class DesignTasksFactory:
                 write_output("3_design/System_Architecture.md", str(o)), 
                 shared_memory.set("phase_3", "architecture_document", str(o)))
         )
-        task2 = Task(
-            description=dedent(f"""
+        def task2_description():
+            srs_document_ctx, architecture_document_ctx = fit_sections("DesignTasksFactory.create_architecture_tasks.task2", 833, [
+                ("srs_document", srs_document(), 15),
+                ("architecture_document", architecture_document(), 10),
+            ])
+            return dedent(f"""
                 # NHIỆM VỤ (2/2): LẬP WEBSITE PLANNING CHECKLIST
 
                 ## Mục tiêu:
@@ -69,13 +83,16 @@ class DesignTasksFactory:
                 ## Tài liệu tham khảo đầu vào:
                 - **Tài liệu SRS (Trích đoạn)**:
                   ```markdown
-                  {srs_document[:1500]}...
+                  {srs_document_ctx}
                   ```
                 - **Tài liệu Kiến trúc (Trích đoạn)**:
                   ```markdown
-                  {architecture_document[:1000]}...
+                  {architecture_document_ctx}
                   ```
-            """),
+            """)
+
+        task2 = TemplateTask(
+            description=task2_description,
             expected_output="""Một file văn bản chứa một Bảng Markdown chi tiết.
                 Bảng này là checklist lập kế hoạch website, tuân thủ 5 cột đã yêu cầu.
                 Ví dụ mẫu:
@@ -94,9 +111,13 @@ class DesignTasksFactory:
 
     # === dfd_tasks.py ===
     def create_dfd_task(self, agent) -> Task:
-        srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def srs_document():
+            return shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
+        def description():
+            srs_document_ctx = fit_sections("DesignTasksFactory.create_dfd_task", 833, [
+                ("srs_document", srs_document(), 25),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: XÂY DỰNG SƠ ĐỒ LUỒNG DỮ LIỆU (DFD) VÀ MÔ TẢ CHI TIẾT
 
                 ## Mục tiêu:
@@ -130,9 +151,12 @@ class DesignTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (SRS):
                 ```markdown
-                {srs_document[:2500]}...
+                {srs_document_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một file văn bản duy nhất được định dạng bằng Markdown, chứa hai phần rõ ràng.
                 Phần 1 là một khối code Mermaid.js để vẽ sơ đồ DFD cấp 0.
                 Phần 2 là mô tả chi tiết về các Thực thể ngoài, Tiến trình, và Kho dữ liệu đã được xác định.
@@ -164,9 +188,13 @@ class DesignTasksFactory:
 
     # === db_tasks.py ===
     def create_db_task(self, agent) -> Task:
-        use_case_data = shared_memory.get("phase_2", "use_cases_and_user_stories") or "Dữ liệu Use Case không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def use_case_data():
+            return shared_memory.get("phase_2", "use_cases_and_user_stories") or "Dữ liệu Use Case không có sẵn."
+        def description():
+            use_case_data_ctx = fit_sections("DesignTasksFactory.create_db_task", 667, [
+                ("use_case_data", use_case_data(), 20),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: TẠO DATABASE DESIGN DOCUMENT
 
                 ## Mục tiêu:
@@ -188,9 +216,12 @@ class DesignTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (Use Cases & User Stories):
                 ```markdown
-                {use_case_data[:2000]}...
+                {use_case_data_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một tài liệu Markdown chi tiết mô tả thiết kế cơ sở dữ liệu.
                 Tài liệu phải chứa nhiều Bảng Markdown, mỗi bảng tương ứng với một bảng trong CSDL và có đầy đủ 4 cột như yêu cầu.
                 Ví dụ mẫu:
@@ -223,9 +254,13 @@ class DesignTasksFactory:
 
     # === api_tasks.py ===
     def create_api_task(self, agent) -> Task:
-        srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def srs_document():
+            return shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
+        def description():
+            srs_document_ctx = fit_sections("DesignTasksFactory.create_api_task", 1000, [
+                ("srs_document", srs_document(), 30),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: TẠO API DESIGN DOCUMENT (CHUẨN OPENAPI 3.0)
 
                 ## Mục tiêu:
@@ -247,9 +282,12 @@ class DesignTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (SRS):
                 ```markdown
-                {srs_document[:3000]}...
+                {srs_document_ctx}
             ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một chuỗi văn bản duy nhất là một file YAML hợp lệ, tuân thủ đầy đủ đặc tả OpenAPI 3.0.0.
                 Ví dụ mẫu:
                 ```yaml
@@ -315,9 +353,13 @@ class DesignTasksFactory:
 
     # === security_arch_tasks.py ===
     def create_security_arch_task(self, agent) -> Task:
-        security_requirements_doc = shared_memory.get("phase_2", "privacy_and_security_requirements") or "Yêu cầu Bảo mật không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def security_requirements_doc():
+            return shared_memory.get("phase_2", "privacy_and_security_requirements") or "Yêu cầu Bảo mật không có sẵn."
+        def description():
+            security_requirements_doc_ctx = fit_sections("DesignTasksFactory.create_security_arch_task", 1000, [
+                ("security_requirements_doc", security_requirements_doc(), 30),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: TẠO TÀI LIỆU KIẾN TRÚC BẢO MẬT (SECURITY ARCHITECTURE)
 
                 ## Mục tiêu:
@@ -347,9 +389,12 @@ class DesignTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (Yêu cầu Bảo mật & Quyền riêng tư):
                 ```markdown
-                {security_requirements_doc[:3000]}...
+                {security_requirements_doc_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một tài liệu Kiến trúc Bảo mật toàn diện, được định dạng bằng Markdown.
                 Tài liệu phải có đầy đủ 6 phần đã yêu cầu, trong đó mỗi phần đều mô tả các giải pháp kỹ thuật cụ thể chứ không chỉ liệt kê lại yêu cầu.
                 Ví dụ mẫu:
@@ -371,9 +416,13 @@ class DesignTasksFactory:
 
     # === hld_tasks.py ===
     def create_hld_task(self, agent) -> Task:
-        architecture_document = shared_memory.get("phase_3", "architecture_document") or "Tài liệu Kiến trúc không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def architecture_document():
+            return shared_memory.get("phase_3", "architecture_document") or "Tài liệu Kiến trúc không có sẵn."
+        def description():
+            architecture_document_ctx = fit_sections("DesignTasksFactory.create_hld_task", 1000, [
+                ("architecture_document", architecture_document(), 30),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: TẠO TÀI LIỆU THIẾT KẾ CẤP CAO (HIGH-LEVEL DESIGN)
 
                 ## Mục tiêu:
@@ -396,9 +445,12 @@ class DesignTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (System Architecture):
                 ```markdown
-                {architecture_document[:3000]}...
+                {architecture_document_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một tài liệu High-Level Design hoàn chỉnh, được định dạng chuyên nghiệp bằng Markdown.
                 Tài liệu phải có đầy đủ 5 phần đã yêu cầu, với các mô tả rõ ràng và một sơ đồ tương tác thành phần bằng Mermaid.js.
                 Ví dụ mẫu:
@@ -427,9 +479,13 @@ class DesignTasksFactory:
 
     # === lld_tasks.py ===
     def create_lld_task(self, agent) -> Task:
-        hld_document = shared_memory.get("phase_3", "high_level_design") or "Tài liệu HLD không có sẵn."
-        return Task(
-           description=dedent(f"""
+        def hld_document():
+            return shared_memory.get("phase_3", "high_level_design") or "Tài liệu HLD không có sẵn."
+        def description():
+            hld_document_ctx = fit_sections("DesignTasksFactory.create_lld_task", 1000, [
+                ("hld_document", hld_document(), 30),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: PHÁT TRIỂN TÀI LIỆU THIẾT KẾ CẤP THẤP (LOW-LEVEL DESIGN)
 
                 ## Mục tiêu:
@@ -454,9 +510,12 @@ class DesignTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (High-Level Design):
                 ```markdown
-                {hld_document[:3000]}...
+                {hld_document_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+           description=description,
             expected_output="""Một tài liệu Low-Level Design cực kỳ chi tiết, được định dạng bằng Markdown.
                 Tài liệu phải có một phần riêng cho mỗi module/service chính.
                 Mỗi phần phải chứa một sơ đồ lớp bằng Mermaid.js và đặc tả chi tiết cho từng lớp và phương thức bên trong.
@@ -508,9 +567,13 @@ class DesignTasksFactory:
 
     # === report_tasks.py ===
     def create_report_design_task(self, agent) -> Task:
-        use_case_data = shared_memory.get("phase_2", "use_cases_and_user_stories") or "Dữ liệu Use Case không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def use_case_data():
+            return shared_memory.get("phase_2", "use_cases_and_user_stories") or "Dữ liệu Use Case không có sẵn."
+        def description():
+            use_case_data_ctx = fit_sections("DesignTasksFactory.create_report_design_task", 667, [
+                ("use_case_data", use_case_data(), 20),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: THIẾT KẾ MẪU BÁO CÁO CHO NGƯỜI DÙNG
 
                 ## Mục tiêu:
@@ -533,9 +596,12 @@ class DesignTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (Use Cases & User Stories):
                 ```markdown
-                {use_case_data[:2000]}...
+                {use_case_data_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một tài liệu thiết kế mẫu báo cáo chi tiết, được định dạng bằng Markdown.
                 Tài liệu phải có đầy đủ 5 phần đã yêu cầu, với các mô tả rõ ràng và thực tế.
                 Ví dụ mẫu:
@@ -579,9 +645,13 @@ class DesignTasksFactory:
 
     # === sequence_tasks.py ===
     def create_sequence_task(self, agent) -> Task:
-        use_case_data = shared_memory.get("phase_2", "use_cases_and_user_stories") or "Dữ liệu Use Case không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def use_case_data():
+            return shared_memory.get("phase_2", "use_cases_and_user_stories") or "Dữ liệu Use Case không có sẵn."
+        def description():
+            use_case_data_ctx = fit_sections("DesignTasksFactory.create_sequence_task", 667, [
+                ("use_case_data", use_case_data(), 20),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: TẠO SƠ ĐỒ TRÌNH TỰ (SEQUENCE DIAGRAMS)
 
                 ## Mục tiêu:
@@ -600,9 +670,12 @@ class DesignTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (Use Cases & User Stories):
                 ```markdown
-                {use_case_data[:2000]}...
+                {use_case_data_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một tài liệu Markdown chứa nhiều sơ đồ trình tự, mỗi sơ đồ cho một use case quan trọng.
                 Mỗi sơ đồ được định dạng bằng code Mermaid.js.
                 Ví dụ mẫu:
@@ -680,12 +753,23 @@ def create_design_tasks(design_agent, project_manager_agent):
         api_task, security_arch_task, hld_task, lld_task, report_design_task, sequence_task
     ]
 
-    quality_gate_design_task = create_quality_gate_task(
-        agent=project_manager_agent,
-        phase_name="Phase 3: Design",
-        keys_to_check="architecture_document, database_design_document, api_design_document, high_level_design, low_level_design",
+    # Report design và sequence diagram chỉ được ghi ra file nên review đọc chúng qua context của task.
+    quality_gate_design_tasks = create_quality_gate_tasks(
+        project_manager_agent,
+        "Phase 3: Design",
+        {
+            "architecture_document": architecture_tasks_list[0],
+            "website_planning_checklist": architecture_tasks_list[1],
+            "dfd_document": dfd_task,
+            "database_design_document": db_task,
+            "api_design_document": api_task,
+            "security_architecture_document": security_arch_task,
+            "high_level_design": hld_task,
+            "low_level_design": lld_task,
+            "report_design_template": report_design_task,
+            "sequence_diagrams": sequence_task,
+        },
         document_names="Architecture, Database Design, API Design, HLD, LLD, and all related diagrams."
     )
-    quality_gate_design_task.context = core_tasks
 
-    return core_tasks + [quality_gate_design_task]
+    return core_tasks + quality_gate_design_tasks
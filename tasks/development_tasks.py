@@ -5,21 +5,29 @@ Tổng hợp tất cả các nhiệm vụ giai đoạn Development Phase 4 cho D
 """
 
 from crewai import Task
+from tasks.template_task import TemplateTask
 from utils.file_writer import write_output
 from memory.shared_memory import shared_memory
+from utils.prompt_budget import fit_sections
+from memory.bm25_index import retrieve_context
 
 # ============================ CODE REVIEW TASKS ============================
 
 def create_code_review_tasks(agent):
-    coding_guidelines = shared_memory.get("phase_4_development", "coding_guidelines") or "Coding Guidelines chưa có."
-    dev_standards = shared_memory.get("phase_4_development", "dev_standards") or "Development Standards chưa có."
-
-    checklist_task = Task(
-        description=f"""
+    review_query = "checklist review mã nguồn quy tắc đặt tên cấu trúc code xử lý lỗi bảo mật kiểm thử comment"
+    def coding_guidelines():
+        return retrieve_context(review_query, [("phase_4_development", "coding_guidelines")],
+                                budget_tokens=300, default="Coding Guidelines chưa có.")
+    def dev_standards():
+        return retrieve_context(review_query, [("phase_4_development", "dev_standards")],
+                                budget_tokens=300, default="Development Standards chưa có.")
+
+    checklist_task = TemplateTask(
+        description=lambda: f"""
             Tạo checklist kiểm tra mã nguồn chi tiết nhằm đảm bảo code tuân thủ chuẩn dự án.
             [10 mục checklist...]
-            - Coding Guidelines: {coding_guidelines[:600]}...
-            - Development Standards: {dev_standards[:600]}...
+            - Coding Guidelines: {coding_guidelines()}
+            - Development Standards: {dev_standards()}
         """,
         expected_output="Checklist kiểm tra mã nguồn lưu tại file: Code_Review_Checklist.md",
         agent=agent,
@@ -33,13 +41,20 @@ def create_code_review_tasks(agent):
 # ============================ DEV DOCS TASKS ============================
 
 def create_dev_docs_tasks(agent):
-    lld = shared_memory.get("phase_3_design", "low_level_design") or "Tài liệu LLD chưa sẵn sàng."
-
-    source_doc_task = Task(
-        description=f"""
+    def lld():
+        return shared_memory.get("phase_3_design", "low_level_design") or "Tài liệu LLD chưa sẵn sàng."
+
+    def source_doc_task_description():
+        lld_ctx = fit_sections("create_dev_docs_tasks.source_doc_task", 267, [
+            ("lld", lld(), 8),
+        ])[0]
+        return f"""
             Tạo file Markdown template cho tài liệu mã nguồn.
-            - LLD: {lld[:800]}...
-        """,
+            - LLD: {lld_ctx}
+        """
+
+    source_doc_task = TemplateTask(
+        description=source_doc_task_description,
         expected_output="Source_Code_Documentation_Template.md",
         agent=agent,
         callback=lambda output: (
@@ -58,11 +73,17 @@ def create_dev_docs_tasks(agent):
         )
     )
 
-    middleware_task = Task(
-        description=f"""
+    def middleware_task_description():
+        lld_ctx = fit_sections("create_dev_docs_tasks.middleware_task", 333, [
+            ("lld", lld(), 10),
+        ])[0]
+        return f"""
             Viết tài liệu middleware chi tiết.
-            - LLD: {lld[:1000]}...
-        """,
+            - LLD: {lld_ctx}
+        """
+
+    middleware_task = TemplateTask(
+        description=middleware_task_description,
         expected_output="Middleware_Documentation.md",
         agent=agent,
         callback=lambda output: (
@@ -76,15 +97,24 @@ def create_dev_docs_tasks(agent):
 # ============================ DEV STANDARDS TASKS ============================
 
 def create_dev_standards_tasks(agent):
-    config_plan = shared_memory.get("phase_1_planning", "config_plan") or "Không có Configuration Management Plan."
-    project_plan = shared_memory.get("phase_1_planning", "project_plan") or "Không có Project Plan."
-
-    standards_task = Task(
-        description=f"""
+    def config_plan():
+        return shared_memory.get("phase_1_planning", "config_plan") or "Không có Configuration Management Plan."
+    def project_plan():
+        return shared_memory.get("phase_1_planning", "project_plan") or "Không có Project Plan."
+
+    def standards_task_description():
+        config_plan_ctx, project_plan_ctx = fit_sections("create_dev_standards_tasks.standards_task", 333, [
+            ("config_plan", config_plan(), 5),
+            ("project_plan", project_plan(), 5),
+        ])
+        return f"""
             Tạo Development Standards và Coding Guidelines.
-            - Config Plan: {config_plan[:500]}...
-            - Project Plan: {project_plan[:500]}...
-        """,
+            - Config Plan: {config_plan_ctx}
+            - Project Plan: {project_plan_ctx}
+        """
+
+    standards_task = TemplateTask(
+        description=standards_task_description,
         expected_output="Development_Standards_Document.md và Coding_Guidelines.md",
         agent=agent,
         callback=lambda output: (
@@ -110,11 +140,16 @@ def create_dev_standards_tasks(agent):
 # ============================ INTEGRATION TASKS ============================
 
 def create_integration_tasks(agent):
-    hld = shared_memory.get("phase_3_design", "hld") or "Không có High-Level Design."
-    api_doc = shared_memory.get("phase_4_development", "api_design") or "Không có API Design."
-
-    integration_plan_task = Task(
-        description=f"Tạo tài liệu tích hợp hệ thống.\n- HLD: {hld[:500]}...\n- API: {api_doc[:500]}...",
+    integration_query = "tích hợp hệ thống thành phần module giao tiếp interface api endpoint luồng dữ liệu middleware"
+    def hld():
+        return retrieve_context(integration_query, [("phase_3_design", "hld")], budget_tokens=250,
+                                default="Không có High-Level Design.")
+    def api_doc():
+        return retrieve_context(integration_query, [("phase_4_development", "api_design")], budget_tokens=250,
+                                default="Không có API Design.")
+
+    integration_plan_task = TemplateTask(
+        description=lambda: f"Tạo tài liệu tích hợp hệ thống.\n- HLD: {hld()}\n- API: {api_doc()}",
         expected_output="Integration_Plan.md",
         agent=agent,
         callback=lambda output: (
@@ -138,11 +173,19 @@ def create_integration_tasks(agent):
 # ============================ SOURCE CONTROL TASKS ============================
 
 def create_source_control_tasks(agent):
-    dev_standards = shared_memory.get("phase_4_development", "dev_standards") or "Không có Development Standards."
-    coding_guidelines = shared_memory.get("phase_4_development", "coding_guidelines") or "Không có Coding Guidelines."
-
-    version_control_task = Task(
-        description=f"Tạo Version Control Plan.\n- Standards: {dev_standards[:500]}...",
+    def dev_standards():
+        return shared_memory.get("phase_4_development", "dev_standards") or "Không có Development Standards."
+    def coding_guidelines():
+        return shared_memory.get("phase_4_development", "coding_guidelines") or "Không có Coding Guidelines."
+
+    def version_control_task_description():
+        dev_standards_ctx = fit_sections("create_source_control_tasks.version_control_task", 167, [
+            ("dev_standards", dev_standards(), 5),
+        ])[0]
+        return f"Tạo Version Control Plan.\n- Standards: {dev_standards_ctx}"
+
+    version_control_task = TemplateTask(
+        description=version_control_task_description,
         expected_output="Version_Control_Plan.md",
         agent=agent,
         callback=lambda output: (
@@ -151,8 +194,14 @@ def create_source_control_tasks(agent):
         )
     )
 
-    repo_checklist_task = Task(
-        description=f"Tạo Source Code Repository Checklist.\n- Guidelines: {coding_guidelines[:500]}...",
+    def repo_checklist_task_description():
+        coding_guidelines_ctx = fit_sections("create_source_control_tasks.repo_checklist_task", 167, [
+            ("coding_guidelines", coding_guidelines(), 5),
+        ])[0]
+        return f"Tạo Source Code Repository Checklist.\n- Guidelines: {coding_guidelines_ctx}"
+
+    repo_checklist_task = TemplateTask(
+        description=repo_checklist_task_description,
         expected_output="Source_Code_Repository_Checklist.md",
         agent=agent,
         callback=lambda output: (
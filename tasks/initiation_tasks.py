@@ -3,6 +3,7 @@
 
 from crewai import Task
 from crewai.tasks.task_output import TaskOutput
+from tasks.template_task import TemplateTask
 from utils.file_writer import write_output
 from memory.shared_memory import shared_memory
 
@@ -20,10 +21,11 @@ def create_initiation_tasks(initiation_agent):
     """
     Tạo các nhiệm vụ khởi tạo dự án cốt lõi: Project Charter, Business Case, và Feasibility Report.
     """
-    system_request = shared_memory.get("phase_0", "system_request") or "Thông tin yêu cầu hệ thống bị thiếu."
+    def system_request():
+        return shared_memory.get("phase_0", "system_request") or "Thông tin yêu cầu hệ thống bị thiếu."
 
-    Project_Charter = Task(
-        description=f"""Dựa trên Yêu Cầu Hệ Thống ({system_request}), 
+    Project_Charter = TemplateTask(
+        description=lambda: f"""Dựa trên Yêu Cầu Hệ Thống ({system_request()}), 
         hãy soạn thảo một Hiến Chương Dự Án (Project Charter) chính thức.
         Tài liệu này là văn bản phê duyệt sự tồn tại của dự án và cung cấp cho Quản lý Dự án quyền hạn để sử dụng các nguồn lực của tổ chức cho các hoạt động của dự án.
         
@@ -44,8 +46,8 @@ def create_initiation_tasks(initiation_agent):
         callback=lambda output: _save_task_output(output, "phase_0", "project_charter", "0_initiation", "project_charter.md")
     )
 
-    Business_Case = Task(
-        description=f"""Từ Yêu Cầu Hệ Thống ({system_request}),
+    Business_Case = TemplateTask(
+        description=lambda: f"""Từ Yêu Cầu Hệ Thống ({system_request()}),
         hãy phát triển một Luận Chứng Kinh Doanh (Business Case) chi tiết để biện minh cho việc đầu tư vào dự án.
         Tài liệu này phải phân tích các lợi ích về tài chính, hoạt động và chiến lược, so sánh chúng với chi phí dự kiến để thuyết phục ban lãnh đạo phê duyệt dự án.
 
@@ -63,8 +65,8 @@ def create_initiation_tasks(initiation_agent):
         callback=lambda output: _save_task_output(output, "phase_0", "business_case", "0_initiation", "business_case.md")
     )
 
-    Feasibility_Report = Task(
-        description=f"""Dựa trên Yêu Cầu Hệ Thống ({system_request}), hãy tiến hành một nghiên cứu và soạn thảo Báo cáo Khả thi (Feasibility Report) toàn diện.
+    Feasibility_Report = TemplateTask(
+        description=lambda: f"""Dựa trên Yêu Cầu Hệ Thống ({system_request()}), hãy tiến hành một nghiên cứu và soạn thảo Báo cáo Khả thi (Feasibility Report) toàn diện.
         Báo cáo này cần đánh giá tính thực tiễn và khả thi của dự án được đề xuất trên nhiều phương diện khác nhau (Kỹ thuật, Kinh tế, Vận hành, Pháp lý, Thời gian) để xác định liệu dự án có nên được tiếp tục hay không.
 
         Báo cáo Khả thi cần phân tích và trình bày các khía cạnh sau:
@@ -316,7 +318,6 @@ def create_resourcing_tasks(initiation_agent):
     system_request = shared_memory.get("phase_0", "system_request") or "Thông tin yêu cầu hệ thống bị thiếu."
 
     Project_Team_Definition = Task(
-        Project_Team_Definition = Task(
     description=f"""Dựa trên phạm vi và các yêu cầu ban đầu của dự án,
     hãy xây dựng một tài liệu "Định nghĩa Đội ngũ Dự án" (Project Team Definition) chi tiết.
     Tài liệu này xác định rõ ràng cấu trúc nhóm, vai trò, trách nhiệm của từng thành viên,
@@ -520,9 +521,11 @@ def create_stakeholder_tasks(initiation_agent):
     """
     Tạo các nhiệm vụ liên quan đến quản lý các bên liên quan.
     """
-    system_request = shared_memory.get("phase_0", "system_request") or "Thông tin yêu cầu hệ thống bị thiếu."
+    def system_request():
+        return shared_memory.get("phase_0", "system_request") or "Thông tin yêu cầu hệ thống bị thiếu."
 
-    description=f"""Dựa trên Yêu Cầu Hệ Thống ({system_request}) và mục tiêu chung của dự án, 
+    Stakeholder_List = TemplateTask(
+        description=lambda: f"""Dựa trên Yêu Cầu Hệ Thống ({system_request()}) và mục tiêu chung của dự án, 
     hãy xác định và lập một Danh sách các Bên liên quan (Stakeholder Register) chi tiết.
     Tài liệu này là cơ sở quan trọng để xây dựng kế hoạch quản lý và giao tiếp hiệu quả 
     với các bên liên quan trong suốt vòng đời dự án.
@@ -541,8 +544,8 @@ def create_stakeholder_tasks(initiation_agent):
         callback=lambda output: _save_task_output(output, "phase_0", "stakeholder_list", "0_stakeholder", "stakeholder_list.md")
     )
    
-    Stakeholder_Analysis = Task(
-        description=f"""Dựa trên Yêu Cầu Hệ Thống ({system_request}) và mục tiêu chung của dự án,
+    Stakeholder_Analysis = TemplateTask(
+        description=lambda: f"""Dựa trên Yêu Cầu Hệ Thống ({system_request()}) và mục tiêu chung của dự án,
     hãy thực hiện một Phân tích các Bên liên quan (Stakeholder Analysis) toàn diện.
     Tài liệu này sẽ là kim chỉ nam chiến lược cho việc quản lý giao tiếp và sự tham gia của các bên liên quan.
 
@@ -1,24 +1,34 @@
 # tasks/maintenance_tasks.py (MODIFIED)
 
 from crewai import Task
+from tasks.template_task import TemplateTask
 from utils.file_writer import write_output
 from memory.shared_memory import shared_memory
-from tasks.quality_gate_tasks import create_quality_gate_task # Import task mới
+from memory.bm25_index import retrieve_context
+from tasks.quality_gate_tasks import create_quality_gate_tasks # Import task mới
 
 def create_maintenance_tasks(maintenance_agent, project_manager_agent): # THÊM project_manager_agent
     """
     Tạo các task liên quan đến bảo trì hệ thống, sử dụng agent đã được cung cấp.
     """
-    sla_document = shared_memory.get("phase_2_requirements", "service_level_agreement_template") # Giả định SLA được lưu từ phase 2
-    deployment_plan_for_maintenance = shared_memory.get("phase_6_deployment", "deployment_plan_and_impl_plan") # Lấy từ phase 6
+    # Chỉ các đoạn liên quan tới bảo trì trong SLA và kế hoạch triển khai, không phải toàn bộ tài liệu
+    maintenance_query = ("bảo trì hỗ trợ vận hành SLA bảo hành thời gian phản hồi khắc phục sự cố bản vá "
+                         "nâng cấp sao lưu giám sát môi trường sản xuất rollback")
+    def sla_document():
+        return retrieve_context(maintenance_query, [("phase_2_requirements", "service_level_agreement_template")],
+                                budget_tokens=800, default=None) # Giả định SLA được lưu từ phase 2
 
-    maintenance_plan_task = Task(
-        description=(
+    def deployment_plan_for_maintenance():
+        return retrieve_context(maintenance_query, [("phase_6_deployment", "deployment_plan_and_impl_plan")],
+                                budget_tokens=800, default=None) # Lấy từ phase 6
+
+    maintenance_plan_task = TemplateTask(
+        description=lambda: (
             f"Dựa trên tài liệu SLA và kế hoạch triển khai, phát triển một kế hoạch bảo trì và hỗ trợ toàn diện. "
             f"Kế hoạch này phải bao gồm lịch trình bảo trì định kỳ, chính sách SLA và bảo hành, "
             f"và hướng dẫn quản lý bản vá.\n"
-            f"--- SLA Document: {sla_document if sla_document else 'Không có'}\n"
-            f"--- Deployment Plan (từ Phase 6): {deployment_plan_for_maintenance if deployment_plan_for_maintenance else 'Không có'}"
+            f"--- SLA Document: {sla_document() or 'Không có'}\n"
+            f"--- Deployment Plan (từ Phase 6): {deployment_plan_for_maintenance() or 'Không có'}"
         ),
         expected_output="Tài liệu tiếng Việt 'Maintenance_and_Support_Plan.docx', 'Maintenance_Checklist.md', 'SLA_and_Warranty_Policies.docx', 'Patch_Management_Guide.md' đầy đủ.",
         agent=maintenance_agent,
@@ -72,12 +82,16 @@ def create_maintenance_tasks(maintenance_agent, project_manager_agent): # THÊM
     )
 
     # Task Quality Gate cho Maintenance Phase
-    quality_gate_maintenance_task = create_quality_gate_task(
+    quality_gate_maintenance_tasks = create_quality_gate_tasks(
         project_manager_agent,
         "Phase 7: Maintenance",
-        "maintenance_plan", # Hoặc kết hợp các key khác
+        {
+            "maintenance_plan": maintenance_plan_task,
+            "lessons_learned": feedback_review_task,
+            "transition_plan": transition_task,
+            "knowledge_transfer": support_knowledge_task,
+        },
         "Maintenance and Support Plan, Lessons Learned, Transition Plans, Knowledge Transfer Reports"
     )
-    quality_gate_maintenance_task.context = [maintenance_plan_task, feedback_review_task, transition_task, support_knowledge_task]
 
-    return [maintenance_plan_task, feedback_review_task, transition_task, support_knowledge_task, quality_gate_maintenance_task] # THÊM quality_gate_maintenance_task
\ No newline at end of file
+    return [maintenance_plan_task, feedback_review_task, transition_task, support_knowledge_task] + quality_gate_maintenance_tasks
\ No newline at end of file
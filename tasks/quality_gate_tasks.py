@@ -1,35 +1,126 @@
 # tasks/quality_gate_tasks.py
 
+import os
+import re
+import json
+import uuid
+import logging
+from typing import Callable, Optional
+
 from crewai import Task
+from pydantic import Field
+from tasks.template_task import TemplateTask
 from utils.file_writer import write_output
 from memory.shared_memory import shared_memory
+from memory.artifact_registry import artifact_registry
+from memory.bm25_index import retrieve_context
+from memory.verdict_cache import verdict_cache, review_key
+from utils.doc_validators import document_validator
+from utils.prompt_budget import fit_sections, count_tokens
+from utils.task_scheduler import pop_task_usage
+
+# Checklist riêng cho từng tài liệu khi review theo chế độ map-reduce; tài liệu khác dùng DEFAULT_CHECKLIST.
+DEFAULT_CHECKLIST = [
+    "Tài liệu đầy đủ các mục chính theo yêu cầu của task, không có mục bỏ trống hoặc placeholder.",
+    "Nội dung rõ ràng, nhất quán với mục tiêu và phạm vi dự án.",
+    "Không có sai sót hoặc thiếu sót lớn.",
+]
+DOCUMENT_CHECKLISTS = {
+    "scope_checklist": ["Có bảng phạm vi (trong/ngoài phạm vi) rõ ràng.", "Mỗi hạng mục có trạng thái và ghi chú."],
+    "brd_document": ["Có mục tiêu kinh doanh, stakeholder và yêu cầu nghiệp vụ.", "Mỗi yêu cầu có mã định danh và mức ưu tiên."],
+    "srs_document": ["Yêu cầu chức năng và phi chức năng được đánh mã (FR-xx, NFR-xx).",
+                     "Mỗi yêu cầu kiểm chứng được (có tiêu chí chấp nhận).", "Nhất quán với BRD."],
+    "rtm_document": ["Mỗi yêu cầu trong SRS đều có dòng truy vết.", "Có cột liên kết tới thiết kế và test case."],
+    "nfr_document": ["Các yêu cầu hiệu năng, bảo mật, khả dụng có chỉ số đo được."],
+    "architecture_document": ["Mô tả các thành phần, giao tiếp giữa chúng và lý do chọn kiến trúc."],
+    "database_design_document": ["Có lược đồ bảng, khóa chính/khóa ngoại và quan hệ."],
+    "api_design_document": ["Mỗi endpoint có method, đường dẫn, request/response và mã lỗi.", "Đặc tả OpenAPI hợp lệ."],
+    "high_level_design": ["Bao quát các module chính và luồng dữ liệu giữa chúng."],
+    "low_level_design": ["Chi tiết đến mức lớp/hàm cho các module trong HLD."],
+    "test_plan": ["Có phạm vi, chiến lược, môi trường, lịch trình và tiêu chí vào/ra."],
+    "deployment_plan_and_impl_plan": ["Có các bước triển khai, kế hoạch rollback và người chịu trách nhiệm."],
+    "monitoring_guide": ["Có chỉ số giám sát, ngưỡng cảnh báo và kênh thông báo."],
+    "maintenance_plan": ["Có quy trình tiếp nhận yêu cầu, SLA hỗ trợ và lịch bảo trì."],
+}
+
+# Review của từng tài liệu kết thúc bằng một dòng kết luận để cổng tổng hợp pass/fail tự động.
+VERDICT_PASS = "KẾT LUẬN: ĐẠT"
+VERDICT_FAIL = "KẾT LUẬN: KHÔNG ĐẠT"
+_VERDICT = re.compile(r"K[ẾE]T\s+LU[ẬA]N\s*\**\s*:\s*\**\s*(KH[ÔO]NG\s+[ĐD][ẠA]T|[ĐD][ẠA]T)", re.IGNORECASE)
 
-def create_quality_gate_task(project_manager_agent, phase_name: str, previous_tasks_output_key: str, description_suffix: str = ""):
+
+class GateTask(TemplateTask):
+    """
+    Task của quality gate (mô tả có thể là template, xem `TemplateTask`) với hai hook mà scheduler gọi
+    (utils/task_scheduler.py):
+    - `precheck()`: output thay cho câu trả lời của LLM, hoặc None để gọi LLM.
+    - `rework()`: sau khi task hoàn thành, trả về các task cần thêm vào đồ thị (có thể rỗng).
+    """
+    precheck: Optional[Callable] = Field(default=None, exclude=True)
+    rework: Optional[Callable] = Field(default=None, exclude=True)
+
+
+def gate_phase(phase_name: str) -> str:
+    """Phase chuẩn trong shared_memory của một cổng, ví dụ "Phase 6: Deployment" -> "phase_6_deployment"."""
+    return artifact_registry.resolve_phase(phase_name.replace(" ", "_").lower())
+
+
+def _report_path(phase_name: str) -> str:
+    return (f"output/{phase_name.split(':')[0].strip().replace('Phase ', '').replace(' ', '_').lower()}/"
+            f"validation_report_{phase_name.replace(' ', '_').lower().replace('phase_', '')}.md")
+
+
+def _split_keys(keys_to_check) -> list[str]:
+    if isinstance(keys_to_check, str):
+        return [key.strip() for key in keys_to_check.split(",") if key.strip()]
+    return list(keys_to_check)
+
+
+def parse_verdict(review: str) -> str:
+    """Kết luận của một bản review: "pass", "fail", hoặc "unknown" nếu không có dòng KẾT LUẬN."""
+    matches = _VERDICT.findall(str(review or ""))
+    if not matches:
+        return "unknown"
+    return "fail" if matches[-1].upper().startswith("KH") else "pass"
+
+
+def load_gate_verdict(phase: str) -> dict | None:
+    """Kết luận có cấu trúc mà cổng map-reduce của `phase` đã lưu (key `gate_verdict`), hoặc None."""
+    stored = shared_memory.get(phase, "gate_verdict")
+    return json.loads(str(stored)) if stored else None
+
+
+def create_quality_gate_task(project_manager_agent, phase_name: str, keys_to_check, document_names: str = ""):
     """
     Tạo một task cổng chất lượng (quality gate) cho một giai đoạn cụ thể.
-    Task này sẽ yêu cầu Project Manager agent đánh giá đầu ra của giai đoạn trước đó.
+    Task này sẽ yêu cầu Project Manager agent đánh giá đầu ra của giai đoạn trong một prompt duy nhất.
 
     Args:
         project_manager_agent: Instance của Project Manager Agent.
         phase_name (str): Tên của giai đoạn hiện tại (ví dụ: "Phase 0: Initiation").
-        previous_tasks_output_key (str): Key trong shared_memory chứa tổng hợp output của các tasks trước.
-        description_suffix (str): Một chuỗi mô tả thêm cho task (ví dụ: các tài liệu cần kiểm tra).
+        keys_to_check: Các key trong shared_memory của phase cần kiểm tra (list hoặc chuỗi cách nhau bởi dấu phẩy).
+        document_names (str): Tên các tài liệu cần đặc biệt chú ý, đưa vào mô tả task.
     """
-    # Lấy output từ các task trước của phase hiện tại
-    outputs_to_validate = shared_memory.get(phase_name.replace(" ", "_").lower(), previous_tasks_output_key)
-    if not outputs_to_validate:
-        outputs_to_validate = "Không có tài liệu nào để kiểm tra từ các task trước trong giai đoạn này."
+    phase = gate_phase(phase_name)
+    # Lấy output từ các task trước của phase hiện tại: các đoạn liên quan nhất tới tiêu chí kiểm tra
+    gate_query = (f"{phase_name} {document_names} phạm vi mục tiêu yêu cầu tiêu chuẩn chất lượng "
+                  f"rủi ro phê duyệt đầy đủ nhất quán thiếu sót")
 
-    return Task(
-        description=(
+    def outputs_to_validate():
+        outputs = retrieve_context(gate_query, [(phase, key) for key in _split_keys(keys_to_check)],
+                                   budget_tokens=int(os.getenv("MAS_GATE_CONTEXT_TOKENS", 2000)), default=None)
+        return outputs or "Không có tài liệu nào để kiểm tra từ các task trước trong giai đoạn này."
+
+    return TemplateTask(
+        description=lambda: (
             f"Với vai trò Project Manager, hãy xem xét kỹ lưỡng tất cả các đầu ra chính "
             f"của {phase_name}. Đảm bảo rằng chúng tuân thủ các tiêu chuẩn chất lượng, "
             f"phạm vi dự án, và các yêu cầu đã định. Cụ thể, kiểm tra:\n"
             f"- Tính đầy đủ và rõ ràng của tài liệu.\n"
             f"- Tính nhất quán với mục tiêu và yêu cầu dự án.\n"
             f"- Đảm bảo không có sai sót hoặc thiếu sót lớn.\n\n"
-            f"Dựa trên các tài liệu sau:\n---\n{outputs_to_validate}\n---\n\n"
-            f"Nếu có, hãy đặc biệt chú ý đến: {description_suffix}\n\n"
+            f"Dựa trên các tài liệu sau:\n---\n{outputs_to_validate()}\n---\n\n"
+            f"Nếu có, hãy đặc biệt chú ý đến: {document_names}\n\n"
             f"Viết một báo cáo phê duyệt (validation report) chi tiết."
         ),
         expected_output=f"Báo cáo phê duyệt 'validation_report_{phase_name.replace(' ', '_').lower()}.md' bằng tiếng Việt, "
@@ -37,7 +128,265 @@ def create_quality_gate_task(project_manager_agent, phase_name: str, previous_ta
         agent=project_manager_agent,
         callback=lambda output: (
             print(f"--- Hoàn thành Quality Gate Task cho {phase_name} ---"),
-            write_output(f"output/{phase_name.split(':')[0].strip().replace('Phase ', '').replace(' ', '_').lower()}/validation_report_{phase_name.replace(' ', '_').lower().replace('phase_', '')}.md", str(output)),
-            shared_memory.set(phase_name.replace(" ", "_").lower(), f"validation_report", str(output))
+            write_output(_report_path(phase_name), output.raw_output),
+            shared_memory.set(phase, "validation_report", output.raw_output)
         )
-    )
\ No newline at end of file
+    )
+
+
+def static_review(key: str, text) -> str | None:
+    """
+    Bản review từ kiểm tra tĩnh (utils/doc_validators.py) khi kết luận đã rõ ("pass"/"fail"),
+    hoặc None nếu tài liệu cần LLM review. Tắt bằng MAS_GATE_PRECHECK=0.
+    """
+    if os.getenv("MAS_GATE_PRECHECK", "1") != "1":
+        return None
+    result = document_validator.validate(key, text)
+    if result["status"] == "borderline":
+        return None
+    logging.info(f"Quality gate: kiểm tra tĩnh '{key}' -> {result['status']}, bỏ qua LLM review.")
+    lines = [f"# Review tĩnh: {key}", "", "| Luật | Kết quả | Chi tiết |", "|---|---|---|"]
+    lines += [f"| {c['name']}{' (bắt buộc)' if c['hard'] else ''} | {'Đạt' if c['passed'] else 'Không đạt'} | {c['message']} |"
+              for c in result["checks"]]
+    lines += ["", VERDICT_PASS if result["status"] == "pass" else VERDICT_FAIL]
+    return "\n".join(lines)
+
+
+def create_document_review_task(project_manager_agent, phase_name: str, key: str, producer_task=None) -> Task:
+    """
+    Bước map của cổng map-reduce: review một tài liệu theo checklist riêng của nó.
+
+    Nếu có `producer_task`, tài liệu được CrewAI đưa vào prompt qua `context` (chỉ tài liệu này);
+    nếu không, nội dung được lấy từ shared_memory theo ngân sách MAS_GATE_CONTEXT_TOKENS.
+    Bản review được lưu vào key `gate_review_<key>` của phase.
+
+    Ngay trước khi gọi LLM, scheduler chạy `precheck`:
+    1. Cache kết luận (memory/verdict_cache.py, tắt bằng MAS_GATE_CACHE=0): nếu tài liệu, các tài liệu
+       nó tham chiếu (output các task trong context của producer và `references` trong gate_rules.yaml),
+       checklist và luật tĩnh (cả luật mặc định và phiên bản validator) đều không đổi so với lần review trước,
+       bản review cũ được dùng lại.
+    2. Kiểm tra tĩnh (`static_review`): tài liệu rõ ràng đạt hoặc sai định dạng được kết luận ngay.
+    Chỉ tài liệu còn lại mới tốn một lời gọi LLM.
+    """
+    phase = gate_phase(phase_name)
+    checklist = DOCUMENT_CHECKLISTS.get(key, []) + DEFAULT_CHECKLIST
+
+    def document_section():
+        if producer_task is not None:
+            return "Tài liệu cần review nằm trong phần ngữ cảnh (context) của task này."
+        document = retrieve_context(f"{key} " + " ".join(checklist), [(phase, key)],
+                                    budget_tokens=int(os.getenv("MAS_GATE_CONTEXT_TOKENS", 2000)),
+                                    default="Không có nội dung (tài liệu chưa được tạo).")
+        return f"Nội dung tài liệu:\n---\n{document}\n---"
+    checklist_text = "\n".join(f"- {item}" for item in checklist)
+
+    rules = document_validator.documents.get(key, {})
+    use_cache = os.getenv("MAS_GATE_CACHE", "1") == "1"
+
+    def current_document():
+        document = shared_memory.get(phase, key)
+        if document is None and producer_task is not None and producer_task.output is not None:
+            document = producer_task.output.raw_output
+        return document
+
+    def cache_key(document) -> str:
+        upstream = [t.output.raw_output if t.output is not None else "" for t in (producer_task.context or [])] \
+            if producer_task is not None else []
+        reference = shared_memory.get(*rules["references"].split("/", 1)) if rules.get("references") else None
+        return review_key(phase, key, checklist_text, document_validator.rules_digest(key),
+                          document, reference, *upstream)
+
+    def precheck():
+        document = current_document()
+        if document is None:
+            return None
+        if use_cache:
+            cached = verdict_cache.get(cache_key(document))
+            if cached is not None:
+                logging.info(f"Quality gate: '{key}' không đổi từ lần review trước ({cached['status']}), dùng lại kết luận.")
+                return cached["review"]
+        return static_review(key, document)
+
+    def store_review(output):
+        review = output.raw_output
+        shared_memory.set(phase, f"gate_review_{key}", review)
+        status = parse_verdict(review)
+        document = current_document()
+        # Bản review không có dòng KẾT LUẬN không được cache để lần chạy sau review lại.
+        if use_cache and document is not None and status != "unknown":
+            verdict_cache.put(cache_key(document), f"{phase}/{key}", status, review)
+
+    return GateTask(
+        description=lambda: (
+            f"Với vai trò Project Manager, hãy review tài liệu '{key}' của {phase_name} theo checklist sau:\n"
+            f"{checklist_text}\n\n"
+            f"{document_section()}\n\n"
+            f"Với mỗi mục của checklist, ghi Đạt/Không đạt kèm nhận xét ngắn và đề xuất sửa nếu không đạt. "
+            f"Dòng cuối cùng phải là đúng '{VERDICT_PASS}' hoặc '{VERDICT_FAIL}'."
+        ),
+        expected_output=f"Bản review ngắn bằng tiếng Việt cho '{key}' theo từng mục checklist, "
+                        f"kết thúc bằng '{VERDICT_PASS}' hoặc '{VERDICT_FAIL}'.",
+        agent=project_manager_agent,
+        context=[producer_task] if producer_task is not None else [],
+        callback=lambda output: (
+            print(f"--- Hoàn thành review '{key}' cho {phase_name} ---"),
+            store_review(output)
+        ),
+        precheck=precheck
+    )
+
+
+def _record_gate_verdict(phase: str, keys: list[str]) -> dict:
+    documents = {key: parse_verdict(shared_memory.get(phase, f"gate_review_{key}")) for key in keys}
+    statuses = set(documents.values())
+    status = "fail" if "fail" in statuses else "unknown" if "unknown" in statuses else "pass"
+    verdict = {"phase": phase, "status": status, "passed": status == "pass", "documents": documents}
+    shared_memory.set(phase, "gate_verdict", json.dumps(verdict, ensure_ascii=False))
+    return verdict
+
+
+def _create_reduce_task(project_manager_agent, phase_name: str, keys: list[str], reviews: dict,
+                        document_names: str, iteration: int = 0, rework=None) -> Task:
+    """Bước reduce: gộp các bản review (`reviews`: key -> task review) thành validation report và `gate_verdict` của mọi key."""
+    phase = gate_phase(phase_name)
+    return GateTask(
+        description=(
+            f"Với vai trò Project Manager, hãy tổng hợp kết quả review từng tài liệu của {phase_name} "
+            f"thành một báo cáo phê duyệt (validation report)"
+            + (f" sau vòng sửa lỗi thứ {iteration}; các tài liệu khác giữ nguyên kết luận trước.\n\n" if iteration else ".\n\n")
+            + f"Các bản review ({', '.join(reviews)}) nằm trong phần ngữ cảnh (context) của task này, "
+            f"mỗi bản kết thúc bằng '{VERDICT_PASS}' hoặc '{VERDICT_FAIL}'.\n\n"
+            f"Nếu có, hãy đặc biệt chú ý đến: {document_names}\n\n"
+            f"Nêu rõ các tài liệu không đạt, điểm cần cải thiện, và kết luận phê duyệt chung của phase. "
+            f"Phase chỉ được phê duyệt khi mọi tài liệu đều đạt."
+        ),
+        expected_output=f"Báo cáo phê duyệt 'validation_report_{phase_name.replace(' ', '_').lower()}.md' bằng tiếng Việt, "
+                        f"gồm bảng kết luận từng tài liệu, các điểm cần cải thiện và kết luận phê duyệt chung.",
+        agent=project_manager_agent,
+        context=list(reviews.values()),
+        callback=lambda output: (
+            print(f"--- Hoàn thành Quality Gate Task cho {phase_name} ---"),
+            write_output(_report_path(phase_name), output.raw_output),
+            shared_memory.set(phase, "validation_report", output.raw_output),
+            _record_gate_verdict(phase, keys)
+        ),
+        rework=rework
+    )
+
+
+def _estimate_rework_tokens(task, previous) -> int:
+    """
+    Ước lượng token của một lần sửa trước khi chạy: prompt sinh lại (mô tả + context), tài liệu mới và
+    prompt review nó. Chỉ dùng để quyết định có chạy lần sửa hay không; ngân sách bị trừ bằng token đo thực tế.
+    """
+    context = sum(count_tokens(t.output.raw_output) for t in (task.context or []) if t.output is not None)
+    return count_tokens(task.description) + context + 2 * count_tokens(previous or "")
+
+
+def _plan_rework(project_manager_agent, phase_name: str, documents: dict, document_names: str,
+                 iteration: int, ledger: dict):
+    """
+    Hook `rework` của task reduce ở vòng `iteration`: đọc `gate_verdict` vừa ghi và đưa lại vào đồ thị
+    chỉ các task tạo ra tài liệu bị kết luận "fail", kèm phản hồi của reviewer, cùng review và reduce mới.
+
+    Giới hạn bởi số vòng MAS_REWORK_MAX_ITERATIONS (mặc định 2, 0 để tắt) và ngân sách token
+    MAS_REWORK_TOKEN_BUDGET cho cả phase. `ledger` dùng chung giữa các vòng: "spent" là số token provider
+    thực sự tính (prompt + completion, không kể response từ cache) của các task sửa và review ở các vòng trước,
+    đo qua gateway khi vòng sau được lập; một tài liệu chỉ được sửa tiếp nếu "spent" cộng ước lượng của
+    lần sửa đó còn trong ngân sách.
+    """
+    def rework():
+        # Các task của vòng trước đã chạy xong (task reduce gọi hook này sau chúng): trừ token đo được.
+        for task in ledger["pending"]:
+            ledger["spent"] += (pop_task_usage(task) or {}).get("billed_tokens", 0)
+        ledger["pending"] = []
+        phase = gate_phase(phase_name)
+        verdict = load_gate_verdict(phase) or {}
+        rejected = [key for key, status in verdict.get("documents", {}).items()
+                    if status == "fail" and documents.get(key) is not None]
+        if not rejected:
+            return []
+        if iteration >= int(os.getenv("MAS_REWORK_MAX_ITERATIONS", 2)):
+            logging.warning(f"Quality gate {phase}: {rejected} vẫn không đạt sau {iteration} vòng sửa, cần người xem lại.")
+            return []
+
+        budget = int(os.getenv("MAS_REWORK_TOKEN_BUDGET", 100_000))
+        planned = 0
+        regenerated = {}
+        for key in rejected:
+            producer = documents[key]
+            previous = shared_memory.get(phase, key)
+            if previous is None and producer.output is not None:
+                previous = producer.output.raw_output
+            feedback = fit_sections(f"rework.{phase}.{key}", int(os.getenv("MAS_REWORK_FEEDBACK_TOKENS", 600)),
+                                    [("feedback", shared_memory.get(phase, f"gate_review_{key}"), 1)])[0]
+            # Task mới với id và danh sách context riêng, không dùng chung trạng thái với task gốc.
+            update = {
+                "id": uuid.uuid4(),
+                "context": list(producer.context) if producer.context is not None else None,
+                "output": None,
+                "description": (f"{producer.description}\n\n"
+                                f"## Phản hồi từ quality gate (vòng sửa {iteration + 1}):\n{feedback}\n\n"
+                                f"Hãy sửa tài liệu theo phản hồi trên và trả về toàn bộ tài liệu đã sửa."),
+            }
+            if isinstance(producer, TemplateTask):
+                update["template"] = None  # Mô tả kèm phản hồi không được render đè từ template.
+            task = producer.model_copy(update=update)
+            cost = _estimate_rework_tokens(task, previous)
+            if ledger["spent"] + planned + cost > budget:
+                logging.warning(f"Quality gate {phase}: bỏ qua sửa '{key}' (~{cost} token) do vượt ngân sách "
+                                f"MAS_REWORK_TOKEN_BUDGET ({ledger['spent']}/{budget} đã dùng).")
+                continue
+            planned += cost
+            regenerated[key] = task
+        if not regenerated:
+            return []
+
+        logging.info(f"Quality gate {phase}: sửa lại {list(regenerated)} (vòng {iteration + 1}).")
+        reviews = {key: create_document_review_task(project_manager_agent, phase_name, key, task)
+                   for key, task in regenerated.items()}
+        next_rework = _plan_rework(project_manager_agent, phase_name, {**documents, **regenerated}, document_names,
+                                   iteration + 1, ledger)
+        reduce_task = _create_reduce_task(project_manager_agent, phase_name, list(documents), reviews,
+                                          document_names, iteration + 1, next_rework)
+        ledger["pending"] = list(regenerated.values()) + list(reviews.values())
+        return ledger["pending"] + [reduce_task]
+    return rework
+
+
+def create_quality_gate_tasks(project_manager_agent, phase_name: str, documents: dict, document_names: str = "",
+                              mode: str = None) -> list[Task]:
+    """
+    Tạo cổng chất lượng của một phase.
+
+    Chế độ (MAS_GATE_MODE):
+    - "mapreduce" (mặc định): mỗi tài liệu được review bởi một task riêng (chạy song song trên scheduler,
+      ngay khi task tạo ra tài liệu đó xong), rồi task reduce gộp các review thành validation report
+      và kết luận có cấu trúc (key `gate_verdict`, xem `load_gate_verdict`). Không prompt nào chứa
+      toàn bộ phase, và thời gian của cổng xấp xỉ thời gian review tài liệu chậm nhất.
+      Tài liệu bị kết luận không đạt được sinh lại kèm phản hồi của reviewer (xem `_plan_rework`).
+    - "single": một task duy nhất như `create_quality_gate_task`.
+
+    Args:
+        project_manager_agent: Instance của Project Manager Agent.
+        phase_name (str): Tên của giai đoạn, ví dụ "Phase 2: Requirements".
+        documents (dict): key tài liệu -> task tạo ra tài liệu đó (None nếu chỉ đọc từ shared_memory).
+        document_names (str): Tên các tài liệu cần đặc biệt chú ý.
+
+    Returns:
+        list[Task]: Các task của cổng; task cuối cùng ghi validation_report.
+    """
+    mode = mode or os.getenv("MAS_GATE_MODE", "mapreduce")
+    if mode == "single":
+        gate_task = create_quality_gate_task(project_manager_agent, phase_name, list(documents), document_names)
+        gate_task.context = [task for task in documents.values() if task is not None]
+        return [gate_task]
+    if mode != "mapreduce":
+        raise ValueError(f"MAS_GATE_MODE không hợp lệ: {mode}")
+
+    reviews = {key: create_document_review_task(project_manager_agent, phase_name, key, task)
+               for key, task in documents.items()}
+    rework = _plan_rework(project_manager_agent, phase_name, documents, document_names, 0,
+                          {"spent": 0, "pending": []})
+    return list(reviews.values()) + [_create_reduce_task(project_manager_agent, phase_name, list(documents), reviews,
+                                                         document_names, rework=rework)]
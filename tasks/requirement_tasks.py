@@ -1,8 +1,10 @@
 from crewai import Task
+from tasks.template_task import TemplateTask
 from textwrap import dedent
 from utils.file_writer import write_output
 from memory.shared_memory import shared_memory
-from tasks.quality_gate_tasks import create_quality_gate_task
+from utils.prompt_budget import fit_sections
+from tasks.quality_gate_tasks import create_quality_gate_tasks
 
 class RequirementTasksFactory:
     """
@@ -11,10 +13,14 @@ class RequirementTasksFactory:
     """
 
     def create_scope_task(self, agent) -> Task:
-        wbs_data = shared_memory.get("phase_2", "wbs_data_as_text") or "Dữ liệu WBS không có sẵn."
-        project_plan_data = shared_memory.get("phase_2", "project_plan_data_as_xml") or "Dữ liệu Kế hoạch Dự án không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def description():
+            wbs_data = shared_memory.get("phase_2", "wbs_data_as_text") or "Dữ liệu WBS không có sẵn."
+            project_plan_data = shared_memory.get("phase_2", "project_plan_data_as_xml") or "Dữ liệu Kế hoạch Dự án không có sẵn."
+            wbs_data_ctx, project_plan_data_ctx = fit_sections("RequirementTasksFactory.create_scope_task", 667, [
+                ("wbs_data", wbs_data, 10),
+                ("project_plan_data", project_plan_data, 10),
+            ])
+            return dedent(f"""
                 # NHIỆM VỤ: TẠO BẢNG SCOPE REQUIREMENTS CHECKLIST
 
                 ## Mục tiêu:
@@ -36,9 +42,12 @@ class RequirementTasksFactory:
                 - `Trạng thái (Status)`: Đặt giá trị mặc định là **"Cần làm rõ"**.
 
                 ## Tài liệu tham khảo:
-                - Dữ liệu WBS:\n{wbs_data[:1000]}...
-                - Dữ liệu Kế hoạch Dự án:\n{project_plan_data[:1000]}...
-            """),
+                - Dữ liệu WBS:\n{wbs_data_ctx}
+                - Dữ liệu Kế hoạch Dự án:\n{project_plan_data_ctx}
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một file văn bản chứa duy nhất một Bảng Markdown (Markdown Table).
             Bảng này liệt kê tất cả các hạng mục trong phạm vi dự án, tuân thủ chính xác 5 cột đã yêu cầu: ID, Hạng mục Phạm vi (Scope Item), Mô tả (Description), Nguồn (Source), và Trạng thái (Status).
             Ví dụ mẫu:
@@ -55,11 +64,16 @@ class RequirementTasksFactory:
         )
 
     def create_brd_task(self, agent) -> Task:
-        scope_checklist = shared_memory.get("phase_2", "scope_checklist") or "Checklist Yêu cầu Phạm vi không có sẵn."
-        vision_document = shared_memory.get("phase_1", "vision_document") or "Tài liệu Tầm nhìn không có sẵn."
-        project_charter = shared_memory.get("phase_1", "project_charter") or "Hiến chương Dự án không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def description():
+            scope_checklist = shared_memory.get("phase_2", "scope_checklist") or "Checklist Yêu cầu Phạm vi không có sẵn."
+            vision_document = shared_memory.get("phase_1", "vision_document") or "Tài liệu Tầm nhìn không có sẵn."
+            project_charter = shared_memory.get("phase_1", "project_charter") or "Hiến chương Dự án không có sẵn."
+            scope_checklist_ctx, vision_document_ctx, project_charter_ctx = fit_sections("RequirementTasksFactory.create_brd_task", 833, [
+                ("scope_checklist", scope_checklist, 15),
+                ("vision_document", vision_document, 5),
+                ("project_charter", project_charter, 5),
+            ])
+            return dedent(f"""
                 # NHIỆM VỤ: TẠO BUSINESS REQUIREMENTS DOCUMENT (BRD)
 
                 ## Mục tiêu:
@@ -82,17 +96,20 @@ class RequirementTasksFactory:
                 ## Tài liệu tham khảo đầu vào:
                 - **Checklist Yêu cầu Phạm vi**:
                 ```markdown
-                {scope_checklist[:1500]}...
+                {scope_checklist_ctx}
                 ```
                 - **Tài liệu Tầm nhìn (để lấy ngữ cảnh)**:
                 ```
-                {vision_document[:500]}...
+                {vision_document_ctx}
                 ```
                 - **Hiến chương Dự án (để lấy mục tiêu và các bên liên quan)**:
                 ```
-                {project_charter[:500]}...
+                {project_charter_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một tài liệu Business Requirements Document (BRD) hoàn chỉnh và chuyên nghiệp, được định dạng bằng Markdown.
             Tài liệu phải có đầy đủ 7 phần đã được yêu cầu, với nội dung chi tiết, logic và nhất quán.
             Phần Yêu cầu Chức năng phải được liên kết rõ ràng với các hạng mục trong Checklist Yêu cầu Phạm vi đầu vào.
@@ -104,9 +121,12 @@ class RequirementTasksFactory:
         )
 
     def create_presentation_task(self, agent) -> Task:
-        brd_document = shared_memory.get("phase_2", "brd_document") or "Tài liệu Yêu cầu Nghiệp vụ (BRD) không có sẵn."
-        return Task(
-             description=dedent(f"""
+        def description():
+            brd_document = shared_memory.get("phase_2", "brd_document") or "Tài liệu Yêu cầu Nghiệp vụ (BRD) không có sẵn."
+            brd_document_ctx = fit_sections("RequirementTasksFactory.create_presentation_task", 667, [
+                ("brd_document", brd_document, 20),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: TẠO DÀN Ý BÀI THUYẾT TRÌNH POWERPOINT TỪ BRD
 
                 ## Mục tiêu:
@@ -136,9 +156,12 @@ class RequirementTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (BRD):
                 ```markdown
-                {brd_document[:2000]}...
+                {brd_document_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+             description=description,
             expected_output="""Một file văn bản duy nhất chứa dàn ý chi tiết cho bài thuyết trình, được định dạng bằng Markdown.
             Mỗi slide được phân cách bởi '---'. Mỗi slide phải có Tiêu đề (dùng '#'), Nội dung (dùng '-'), và Ghi chú cho người thuyết trình (dùng '**Speaker Notes:**').
             Ví dụ mẫu:
@@ -160,9 +183,12 @@ class RequirementTasksFactory:
         )
 
     def create_srs_task(self, agent) -> Task:
-        brd_document = shared_memory.get("phase_2", "brd_document") or "Tài liệu Yêu cầu Nghiệp vụ (BRD) không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def description():
+            brd_document = shared_memory.get("phase_2", "brd_document") or "Tài liệu Yêu cầu Nghiệp vụ (BRD) không có sẵn."
+            brd_document_ctx = fit_sections("RequirementTasksFactory.create_srs_task", 1000, [
+                ("brd_document", brd_document, 30),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: TẠO TÀI LIỆU ĐẶC TẢ YÊU CẦU HỆ THỐNG (SRS)
 
                 ## Mục tiêu:
@@ -193,9 +219,12 @@ class RequirementTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (BRD):
                 ```markdown
-                {brd_document[:3000]}...
+                {brd_document_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một tài liệu System Requirements Specification (SRS) hoàn chỉnh, được định dạng chuyên nghiệp bằng Markdown.
             Tài liệu phải tuân thủ nghiêm ngặt cấu trúc 3 phần chính đã nêu. Phần 'Yêu cầu Cụ thể' phải chứa danh sách các yêu cầu chức năng và phi chức năng được đánh mã định danh duy nhất, rõ ràng và có thể kiểm chứng.
             """,
@@ -207,10 +236,14 @@ class RequirementTasksFactory:
 
 #sửa lại yêu cầu 
     def create_usecase_tasks(self, agent) -> list[Task]:
-        srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
-        conops_document = shared_memory.get("phase_1", "conops_document") or "Tài liệu CONOPS không có sẵn."
-        task1 = Task(
-            description=dedent(f"""
+        def task1_description():
+            srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
+            conops_document = shared_memory.get("phase_1", "conops_document") or "Tài liệu CONOPS không có sẵn."
+            srs_document_ctx, conops_document_ctx = fit_sections("RequirementTasksFactory.create_usecase_tasks.task1", 833, [
+                ("srs_document", srs_document, 15),
+                ("conops_document", conops_document, 10),
+            ])
+            return dedent(f"""
                 # NHIỆM VỤ (BƯỚC 1/2): TRÍCH XUẤT ACTORS VÀ USE CASES
 
                 ## Mục tiêu:
@@ -228,13 +261,16 @@ class RequirementTasksFactory:
                 ## Tài liệu tham khảo đầu vào:
                 - **Tài liệu SRS (Trích đoạn)**:
                   ```markdown
-                  {srs_document[:1500]}...
+                  {srs_document_ctx}
                   ```
                 - **Tài liệu CONOPS (Trích đoạn)**:
                   ```markdown
-                  {conops_document[:1000]}...
+                  {conops_document_ctx}
                   ```.
-            """),
+            """)
+
+        task1 = TemplateTask(
+            description=task1_description,
             expected_output="""Một Bảng Markdown đơn giản liệt kê tất cả các cặp Actor và Use Case đã xác định.
                     Ví dụ:
                     | Actor             | Use Case Description          |
@@ -284,10 +320,13 @@ class RequirementTasksFactory:
         return [task1, task2]
     
     def create_rtm_tasks(self, agent) -> Task:
-        srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
+        def description():
+            srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
 
-        return Task(
-            description=dedent(f"""
+            srs_document_ctx = fit_sections("RequirementTasksFactory.create_rtm_tasks", 1000, [
+                ("srs_document", srs_document, 30),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: TẠO MA TRẬN TRUY VẾT YÊU CẦU (RTM)
 
                 ## Mục tiêu:
@@ -311,9 +350,12 @@ class RequirementTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (SRS):
                 ```markdown
-                {srs_document[:3000]}...
+                {srs_document_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một file văn bản duy nhất tuân thủ định dạng CSV.
             Dòng đầu tiên là header với 6 cột đã chỉ định. Mỗi dòng tiếp theo tương ứng với một yêu cầu từ SRS.
             Ví dụ mẫu:
@@ -330,9 +372,12 @@ class RequirementTasksFactory:
         )
 
     def create_impact_analysis_task(self, agent, change_request) -> Task:
-            rtm_document = shared_memory.get("phase_2", "rtm_document") or "Ma trận RTM không có sẵn."
-            return Task(
-                description=dedent(f"""
+            def description():
+                rtm_document = shared_memory.get("phase_2", "rtm_document") or "Ma trận RTM không có sẵn."
+                rtm_document_ctx = fit_sections("RequirementTasksFactory.create_impact_analysis_task", 667, [
+                    ("rtm_document", rtm_document, 20),
+                ])[0]
+                return dedent(f"""
                     # NHIỆM VỤ: LẬP BÁO CÁO ĐÁNH GIÁ TÁC ĐỘNG THAY ĐỔI YÊU CẦU
 
                     ## Mục tiêu:
@@ -362,9 +407,12 @@ class RequirementTasksFactory:
 
                     ## Tài liệu tham khảo đầu vào (RTM dạng CSV):
                     ```csv
-                    {rtm_document[:2000]}...
+                    {rtm_document_ctx}
                     ```
-                """),
+                """)
+
+            return TemplateTask(
+                description=description,
                 expected_output="""Một báo cáo Đánh giá Tác động Thay đổi hoàn chỉnh, được định dạng chuyên nghiệp bằng Markdown.
                 Báo cáo phải có đầy đủ 5 phần đã yêu cầu, với các phân tích logic và có căn cứ dựa trên RTM được cung cấp.
                 """,
@@ -375,9 +423,12 @@ class RequirementTasksFactory:
             )
 
     def create_sla_task(self, agent) -> Task:
-        srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def description():
+            srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
+            srs_document_ctx = fit_sections("RequirementTasksFactory.create_sla_task", 1000, [
+                ("srs_document", srs_document, 30),
+            ])[0]
+            return dedent(f"""
             # NHIỆM VỤ: TẠO MẪU THỎA THUẬN MỨC ĐỘ DỊCH VỤ (SLA)
 
             ## Mục tiêu:
@@ -406,9 +457,12 @@ class RequirementTasksFactory:
 
             ## Tài liệu tham khảo đầu vào (SRS):
             ```markdown
-            {srs_document[:3000]}...
+            {srs_document_ctx}
             ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một bản mẫu Thỏa thuận Mức độ Dịch vụ (SLA) hoàn chỉnh, được định dạng chuyên nghiệp bằng Markdown.
             Tài liệu phải có đầy đủ 6 phần đã yêu cầu. Phần Cam kết (SLOs) phải chứa các con số và chỉ số cụ thể, có thể đo lường được, được suy luận từ các yêu cầu phi chức năng trong SRS.
             """,
@@ -420,9 +474,12 @@ class RequirementTasksFactory:
         )
 
     def create_nfr_task(self, agent) -> Task:
-        srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def description():
+            srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
+            srs_document_ctx = fit_sections("RequirementTasksFactory.create_nfr_task", 1000, [
+                ("srs_document", srs_document, 30),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: TRÍCH XUẤT VÀ TỔNG HỢP YÊU CẦU PHI CHỨC NĂNG (NFRs)
 
                 ## Mục tiêu:
@@ -445,9 +502,12 @@ class RequirementTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (SRS):
                 ```markdown
-                {srs_document[:3000]}...
+                {srs_document_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
            expected_output="""Một file văn bản Markdown chứa danh sách các Yêu cầu Phi Chức năng được phân loại chi tiết.
                 Ví dụ mẫu:
                 # Danh sách Yêu cầu Phi Chức năng (NFRs)
@@ -471,9 +531,12 @@ class RequirementTasksFactory:
         )
 
     def create_security_task(self, agent) -> Task:
-        nfr_document = shared_memory.get("phase_2", "nfr_document") or "Tài liệu NFRs không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def description():
+            nfr_document = shared_memory.get("phase_2", "nfr_document") or "Tài liệu NFRs không có sẵn."
+            nfr_document_ctx = fit_sections("RequirementTasksFactory.create_security_task", 667, [
+                ("nfr_document", nfr_document, 20),
+            ])[0]
+            return dedent(f"""
                 # NHIỆM VỤ: VIẾT CHI TIẾT CÁC YÊU CẦU VỀ BẢO MẬT VÀ QUYỀN RIÊNG TƯ
 
                 ## Mục tiêu:
@@ -510,9 +573,12 @@ class RequirementTasksFactory:
 
                 ## Tài liệu tham khảo đầu vào (NFRs):
                 ```markdown
-                {nfr_document[:2000]}...
+                {nfr_document_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một tài liệu chi tiết về các Yêu cầu Bảo mật và Quyền riêng tư, được định dạng bằng Markdown.
                 Tài liệu phải được phân loại theo 5 mục đã nêu, và mỗi yêu cầu riêng lẻ phải có mã định danh duy nhất và mô tả rõ ràng.
                 Ví dụ mẫu:
@@ -533,10 +599,14 @@ class RequirementTasksFactory:
         )
 
     def create_checklist_task(self, agent) -> Task:
-        srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
-        rtm_document = shared_memory.get("phase_2", "rtm_document") or "Ma trận RTM không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def description():
+            srs_document = shared_memory.get("phase_2", "srs_document") or "Tài liệu SRS không có sẵn."
+            rtm_document = shared_memory.get("phase_2", "rtm_document") or "Ma trận RTM không có sẵn."
+            srs_document_ctx, rtm_document_ctx = fit_sections("RequirementTasksFactory.create_checklist_task", 833, [
+                ("srs_document", srs_document, 15),
+                ("rtm_document", rtm_document, 10),
+            ])
+            return dedent(f"""
                 # NHIỆM VỤ: TẠO BẢNG CHECKLIST KIỂM TRA YÊU CẦU
 
                 ## Mục tiêu:
@@ -565,13 +635,16 @@ class RequirementTasksFactory:
                 ## Tài liệu tham khảo đầu vào:
                 - **Tài liệu SRS (Trích đoạn)**:
                 ```markdown
-                {srs_document[:1500]}...
+                {srs_document_ctx}
                 ```
                 - **Tài liệu RTM (Trích đoạn)**:
                 ```csv
-                {rtm_document[:1000]}...
+                {rtm_document_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một file văn bản chứa Bảng Markdown (Markdown Table) chi tiết.
                 Bảng này là một checklist các câu hỏi để đánh giá chất lượng của các yêu cầu, tuân thủ chính xác 5 cột đã yêu cầu.
                 Ví dụ mẫu:
@@ -590,10 +663,14 @@ class RequirementTasksFactory:
         )
 
     def create_training_task(self, agent) -> Task:
-        conops_document = shared_memory.get("phase_1", "conops_document") or "Tài liệu CONOPS không có sẵn."
-        use_case_data = shared_memory.get("phase_2", "use_cases_and_user_stories") or "Dữ liệu Use Case không có sẵn."
-        return Task(
-            description=dedent(f"""
+        def description():
+            conops_document = shared_memory.get("phase_1", "conops_document") or "Tài liệu CONOPS không có sẵn."
+            use_case_data = shared_memory.get("phase_2", "use_cases_and_user_stories") or "Dữ liệu Use Case không có sẵn."
+            conops_document_ctx, use_case_data_ctx = fit_sections("RequirementTasksFactory.create_training_task", 1000, [
+                ("conops_document", conops_document, 10),
+                ("use_case_data", use_case_data, 20),
+            ])
+            return dedent(f"""
                 # NHIỆM VỤ: XÂY DỰNG KẾ HOẠCH ĐÀO TẠO (TRAINING PLAN)
 
                 ## Mục tiêu:
@@ -621,13 +698,16 @@ class RequirementTasksFactory:
                 ## Tài liệu tham khảo đầu vào:
                 - **Tài liệu CONOPS (Trích đoạn)**:
                 ```markdown
-                {conops_document[:1000]}...
+                {conops_document_ctx}
                 ```
                 - **Dữ liệu Use Case & User Story (Trích đoạn)**:
                 ```markdown
-                {use_case_data[:2000]}...
+                {use_case_data_ctx}
                 ```
-            """),
+            """)
+
+        return TemplateTask(
+            description=description,
             expected_output="""Một bản Kế hoạch Đào tạo hoàn chỉnh, được định dạng chuyên nghiệp bằng Markdown.
                 Tài liệu phải có đầy đủ 5 phần đã yêu cầu, với nội dung thực tế và có thể áp dụng được.
                 Ví dụ mẫu:
@@ -697,13 +777,26 @@ class RequirementTasksFactory:
             nfr_task, security_task, checklist_task, training_task
         ]
 
-        # Tạo task Quality Gate và giao cho Project Manager
-        quality_gate_req_task = create_quality_gate_task(
-            agent=project_manager_agent,
-            phase_name="Phase 2: Requirements",
-            keys_to_check="scope_checklist, brd_document, srs_document, rtm_document, nfr_document",
+        # Tạo các task Quality Gate và giao cho Project Manager: mỗi tài liệu được review riêng
+        # (bước trích xuất use case là bản nháp của use_cases_and_user_stories nên không review).
+        quality_gate_req_tasks = create_quality_gate_tasks(
+            project_manager_agent,
+            "Phase 2: Requirements",
+            {
+                "scope_checklist": scope_task,
+                "brd_document": brd_task,
+                "brd_presentation_outline": presentation_task,
+                "srs_document": srs_task,
+                "use_cases_and_user_stories": usecase_tasks_list[1],
+                "rtm_document": rtm_task,
+                "change_impact_report": impact_task,
+                "sla_template": sla_task,
+                "nfr_document": nfr_task,
+                "privacy_and_security_requirements": security_task,
+                "requirements_inspection_checklist": checklist_task,
+                "training_plan": training_task,
+            },
             document_names="Scope Checklist, BRD, SRS, RTM, NFRs, and all related documents."
         )
-        quality_gate_req_task.context = core_tasks
 
-        return core_tasks + [quality_gate_req_task]
\ No newline at end of file
+        return core_tasks + quality_gate_req_tasks
\ No newline at end of file
@@ -0,0 +1,25 @@
+# tasks/template_task.py
+
+from typing import Callable, Optional
+
+from crewai import Task
+from pydantic import Field, model_validator
+
+
+class TemplateTask(Task):
+    """
+    Task có mô tả là một template: `description` được truyền vào dưới dạng hàm không tham số
+    (thường là `lambda: f"..."`) đọc shared_memory và trả về chuỗi mô tả.
+
+    Template được render một lần khi tạo task, rồi scheduler render lại ngay trước khi task chạy
+    (`TaskGroup.materialize`). Vì chỉ template của chính task được gọi, các key shared_memory nó đọc
+    là đầu vào thật của task đó, không phải của cả phase, và không cần dựng lại cả factory.
+    """
+    template: Optional[Callable] = Field(default=None, exclude=True)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _render_template(cls, data):
+        if isinstance(data, dict) and callable(data.get("description")):
+            data = {**data, "template": data["description"], "description": data["description"]()}
+        return data
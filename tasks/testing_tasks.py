@@ -41,8 +41,11 @@ Outputs:
 """
 
 from crewai import Task
+from tasks.template_task import TemplateTask
 from utils.file_writer import write_output
 from memory.shared_memory import shared_memory
+from utils.prompt_budget import fit_sections
+from memory.bm25_index import retrieve_context
 
 
 # ========================================
@@ -54,21 +57,29 @@ def create_test_plan_tasks(testing_agent):
     print("🧪 Khởi tạo các nhiệm vụ lập kế hoạch kiểm thử...")
     print("📥 Lấy dữ liệu từ shared_memory...")
 
-    frd = shared_memory.get("phase_3_design", "functional_requirements") or "Chưa có Functional Requirements Document."
-    use_cases = shared_memory.get("phase_3_design", "use_case_diagrams") or "Chưa có Use Case Diagram."
-    project_plan = shared_memory.get("phase_1_planning", "project_plan") or "Chưa có Project Plan."
+    def frd():
+        return shared_memory.get("phase_3_design", "functional_requirements") or "Chưa có Functional Requirements Document."
+    def use_cases():
+        return shared_memory.get("phase_3_design", "use_case_diagrams") or "Chưa có Use Case Diagram."
+    def project_plan():
+        return shared_memory.get("phase_1_planning", "project_plan") or "Chưa có Project Plan."
 
     print("✅ Đã tải xong dữ liệu đầu vào.")
 
-    # Task 1: Master Test Plan
-    master_test_plan = Task(
-        description=f"""
+    def master_test_plan_description():
+        # Task 1: Master Test Plan
+        frd_ctx, use_cases_ctx, project_plan_ctx = fit_sections("create_test_plan_tasks.master_test_plan", 300, [
+            ("frd", frd(), 3),
+            ("use_cases", use_cases(), 3),
+            ("project_plan", project_plan(), 3),
+        ])
+        return f"""
             Tạo tài liệu chính Test_Plan.docx định hướng toàn bộ hoạt động kiểm thử.
 
             ### Inputs:
-            - Functional Requirements: {frd[:300]}...
-            - Use Case Diagrams: {use_cases[:300]}...
-            - Project Plan: {project_plan[:300]}...
+            - Functional Requirements: {frd_ctx}
+            - Use Case Diagrams: {use_cases_ctx}
+            - Project Plan: {project_plan_ctx}
 
             ### Nội dung bắt buộc:
             1. Mục tiêu & phạm vi kiểm thử
@@ -84,7 +95,10 @@ def create_test_plan_tasks(testing_agent):
 
             ### Output:
             Test_Plan.docx
-        """,
+        """
+
+    master_test_plan = TemplateTask(
+        description=master_test_plan_description,
         expected_output="Test_Plan.docx – Tài liệu kế hoạch kiểm thử tổng thể toàn dự án.",
         agent=testing_agent,
         callback=lambda output: (
@@ -93,14 +107,18 @@ def create_test_plan_tasks(testing_agent):
         )
     )
 
-    # Task 2: Regression Testing Plan
-    regression_test_plan = Task(
-        description=f"""
+    def regression_test_plan_description():
+        # Task 2: Regression Testing Plan
+        frd_ctx, project_plan_ctx = fit_sections("create_test_plan_tasks.regression_test_plan", 200, [
+            ("frd", frd(), 3),
+            ("project_plan", project_plan(), 3),
+        ])
+        return f"""
             Tạo tài liệu Regression_Testing_Plan.md mô tả chiến lược kiểm thử hồi quy.
 
             ### Inputs:
-            - Functional Requirements: {frd[:300]}...
-            - Project Plan: {project_plan[:300]}...
+            - Functional Requirements: {frd_ctx}
+            - Project Plan: {project_plan_ctx}
 
             ### Nội dung cần có:
             1. Trigger points (khi nào chạy regression)
@@ -113,7 +131,10 @@ def create_test_plan_tasks(testing_agent):
 
             ### Output:
             Regression_Testing_Plan.md
-        """,
+        """
+
+    regression_test_plan = TemplateTask(
+        description=regression_test_plan_description,
         expected_output="Regression_Testing_Plan.md – Tài liệu chiến lược kiểm thử hồi quy.",
         agent=testing_agent,
         callback=lambda output: (
@@ -122,15 +143,20 @@ def create_test_plan_tasks(testing_agent):
         )
     )
 
-    # Task 3: User Acceptance Testing (UAT) Plan
-    uat_test_plan = Task(
-        description=f"""
+    def uat_test_plan_description():
+        # Task 3: User Acceptance Testing (UAT) Plan
+        frd_ctx, use_cases_ctx, project_plan_ctx = fit_sections("create_test_plan_tasks.uat_test_plan", 300, [
+            ("frd", frd(), 3),
+            ("use_cases", use_cases(), 3),
+            ("project_plan", project_plan(), 3),
+        ])
+        return f"""
             Lập kế hoạch kiểm thử UAT để người dùng xác nhận hệ thống đúng như yêu cầu nghiệp vụ.
 
             ### Inputs:
-            - Functional Requirements: {frd[:300]}...
-            - Use Case Diagrams: {use_cases[:300]}...
-            - Project Plan: {project_plan[:300]}...
+            - Functional Requirements: {frd_ctx}
+            - Use Case Diagrams: {use_cases_ctx}
+            - Project Plan: {project_plan_ctx}
 
             ### Nội dung yêu cầu:
             1. Mục tiêu và phạm vi UAT
@@ -143,7 +169,10 @@ def create_test_plan_tasks(testing_agent):
 
             ### Output:
             User_Acceptance_Test_Plan.docx
-        """,
+        """
+
+    uat_test_plan = TemplateTask(
+        description=uat_test_plan_description,
         expected_output="User_Acceptance_Test_Plan.docx – Tài liệu kế hoạch kiểm thử UAT từ người dùng.",
         agent=testing_agent,
         callback=lambda output: (
@@ -165,15 +194,23 @@ def create_test_case_tasks(testing_agent):
     print("🧪 Bắt đầu khởi tạo Test Case & Bug Tracking Tasks...")
     print("📥 Đang truy xuất dữ liệu đầu vào từ shared_memory...")
 
-    test_plan = shared_memory.get("phase_5_testing", "test_plan") or "Test Plan chưa có."
-    frd = shared_memory.get("phase_2_requirement", "frd") or "F.R.D chưa sẵn sàng."
-    use_cases = shared_memory.get("phase_2_requirement", "use_case_diagrams") or "Use Case Diagram chưa có."
+    def test_plan():
+        return shared_memory.get("phase_5_testing", "test_plan") or "Test Plan chưa có."
+    def frd():
+        return shared_memory.get("phase_2_requirement", "frd") or "F.R.D chưa sẵn sàng."
+    def use_cases():
+        return shared_memory.get("phase_2_requirement", "use_case_diagrams") or "Use Case Diagram chưa có."
 
     print("✅ Dữ liệu đã sẵn sàng.")
 
-    # Task 1: Test Case Specification
-    test_case_task = Task(
-        description=f"""
+    def test_case_task_description():
+        # Task 1: Test Case Specification
+        test_plan_ctx, frd_ctx, use_cases_ctx = fit_sections("create_test_case_tasks.test_case_task", 400, [
+            ("test_plan", test_plan(), 4),
+            ("frd", frd(), 4),
+            ("use_cases", use_cases(), 4),
+        ])
+        return f"""
             Viết tài liệu Test Case Specification chi tiết dựa trên Test Plan, F.R.D và Use Case Diagrams.
 
             ### Yêu cầu nội dung:
@@ -189,13 +226,16 @@ def create_test_case_tasks(testing_agent):
             - Trạng thái thực thi
 
             ### Inputs:
-            - Test Plan: {test_plan[:400]}...
-            - F.R.D: {frd[:400]}...
-            - Use Case Diagrams: {use_cases[:400]}...
+            - Test Plan: {test_plan_ctx}
+            - F.R.D: {frd_ctx}
+            - Use Case Diagrams: {use_cases_ctx}
 
             ### Output:
             - File: Test_Case_Specification.xlsx
-        """,
+        """
+
+    test_case_task = TemplateTask(
+        description=test_case_task_description,
         expected_output="Test_Case_Specification.xlsx – Danh sách test case có traceability rõ ràng.",
         agent=testing_agent,
         callback=lambda output: (
@@ -275,14 +315,20 @@ def create_security_perf_test_tasks(testing_agent):
     print("🚀 Bắt đầu khởi tạo Security & Performance Testing Tasks...")
     print("🔍 Truy xuất dữ liệu từ shared_memory...")
 
-    security_doc = shared_memory.get("phase_5_testing", "security_architecture") or "Chưa có tài liệu Security Architecture."
-    nfr_doc = shared_memory.get("phase_3_design", "non_functional_requirements") or "Chưa có NFR."
+    def security_doc():
+        return shared_memory.get("phase_5_testing", "security_architecture") or "Chưa có tài liệu Security Architecture."
+    def nfr_doc():
+        return shared_memory.get("phase_3_design", "non_functional_requirements") or "Chưa có NFR."
 
     print("✅ Dữ liệu đầu vào đã được tải thành công.")
 
-    # Task 1: Penetration Testing Report
-    penetration_task = Task(
-        description=f"""
+    def penetration_task_description():
+        # Task 1: Penetration Testing Report
+        security_doc_ctx, nfr_doc_ctx = fit_sections("create_security_perf_test_tasks.penetration_task", 433, [
+            ("security_doc", security_doc(), 8),
+            ("nfr_doc", nfr_doc(), 5),
+        ])
+        return f"""
             Thực hiện kiểm thử thâm nhập hệ thống theo tiêu chuẩn OWASP, dựa trên tài liệu kiến trúc bảo mật và yêu cầu phi chức năng.
 
             ### Nội dung bắt buộc:
@@ -296,12 +342,15 @@ def create_security_perf_test_tasks(testing_agent):
             8. Tổng kết độ an toàn tổng thể
 
             ### Input:
-            - Security Architecture Document: {security_doc[:800]}...
-            - NFR: {nfr_doc[:500]}...
+            - Security Architecture Document: {security_doc_ctx}
+            - NFR: {nfr_doc_ctx}
 
             ### Output:
             - File: Penetration_Testing_Report.md
-        """,
+        """
+
+    penetration_task = TemplateTask(
+        description=penetration_task_description,
         expected_output="Penetration_Testing_Report.md – Báo cáo đầy đủ về kết quả kiểm thử bảo mật hệ thống.",
         agent=testing_agent,
         callback=lambda output: (
@@ -311,9 +360,12 @@ def create_security_perf_test_tasks(testing_agent):
         )
     )
 
-    # Task 2: Performance Testing Report
-    performance_task = Task(
-        description=f"""
+    def performance_task_description():
+        # Task 2: Performance Testing Report
+        nfr_doc_ctx = fit_sections("create_security_perf_test_tasks.performance_task", 267, [
+            ("nfr_doc", nfr_doc(), 8),
+        ])[0]
+        return f"""
             Thực hiện kiểm thử hiệu năng hệ thống dựa trên các mục tiêu phi chức năng: tốc độ phản hồi, khả năng chịu tải và tính ổn định.
 
             ### Nội dung bắt buộc:
@@ -331,11 +383,14 @@ def create_security_perf_test_tasks(testing_agent):
             8. Đánh giá khả năng mở rộng
 
             ### Input:
-            - NFR: {nfr_doc[:800]}...
+            - NFR: {nfr_doc_ctx}
 
             ### Output:
             - File: Performance_Testing_Report.md
-        """,
+        """
+
+    performance_task = TemplateTask(
+        description=performance_task_description,
         expected_output="Performance_Testing_Report.md – Báo cáo hiệu năng chi tiết theo NFR.",
         agent=testing_agent,
         callback=lambda output: (
@@ -358,14 +413,20 @@ def create_qa_checklist_tasks(testing_agent):
     print("🚀 Bắt đầu khởi tạo QA Checklist Tasks...")
     print("🔍 Lấy dữ liệu từ bộ nhớ chia sẻ...")
 
-    doc_data = shared_memory.get("phase_5_testing", "source_code_documentation") or "Source Code Documentation chưa có."
-    code_review = shared_memory.get("phase_5_testing", "code_review_checklist") or "Code Review Checklist chưa có."
+    def doc_data():
+        return shared_memory.get("phase_5_testing", "source_code_documentation") or "Source Code Documentation chưa có."
+    def code_review():
+        return shared_memory.get("phase_5_testing", "code_review_checklist") or "Code Review Checklist chưa có."
 
     print("✅ Dữ liệu đã sẵn sàng!")
 
-    # Task 1: Documentation QA Checklist
-    doc_checklist_task = Task(
-        description=f"""
+    def doc_checklist_task_description():
+        # Task 1: Documentation QA Checklist
+        doc_data_ctx, code_review_ctx = fit_sections("create_qa_checklist_tasks.doc_checklist_task", 400, [
+            ("doc_data", doc_data(), 8),
+            ("code_review", code_review(), 4),
+        ])
+        return f"""
             Tạo checklist QA đánh giá chất lượng tài liệu mã nguồn để đảm bảo tính đầy đủ, dễ bảo trì, và hỗ trợ tốt việc onboarding.
 
             ### Nội dung checklist:
@@ -381,12 +442,15 @@ def create_qa_checklist_tasks(testing_agent):
             10. Được kiểm soát version (Git/docs tool)
 
             ### Inputs:
-            - Source Code Documentation: {doc_data[:800]}...
-            - Code Review Checklist: {code_review[:400]}...
+            - Source Code Documentation: {doc_data_ctx}
+            - Code Review Checklist: {code_review_ctx}
 
             ### Output:
             - Documentation_Quality_Assurance_Checklist.md
-        """,
+        """
+
+    doc_checklist_task = TemplateTask(
+        description=doc_checklist_task_description,
         expected_output="Checklist Markdown: Documentation_Quality_Assurance_Checklist.md",
         agent=testing_agent,
         callback=lambda output: (
@@ -396,9 +460,13 @@ def create_qa_checklist_tasks(testing_agent):
         )
     )
 
-    # Task 2: System QA Checklist
-    sys_checklist_task = Task(
-        description=f"""
+    def sys_checklist_task_description():
+        # Task 2: System QA Checklist
+        doc_data_ctx, code_review_ctx = fit_sections("create_qa_checklist_tasks.sys_checklist_task", 333, [
+            ("doc_data", doc_data(), 5),
+            ("code_review", code_review(), 5),
+        ])
+        return f"""
             Tạo checklist QA để đánh giá chất lượng hệ thống tổng thể dựa trên source code và kết quả review.
 
             ### Nội dung checklist:
@@ -414,12 +482,15 @@ def create_qa_checklist_tasks(testing_agent):
             10. Hệ thống có khả năng mở rộng và bảo trì tốt
 
             ### Inputs:
-            - Source Code Documentation: {doc_data[:500]}...
-            - Code Review Checklist: {code_review[:500]}...
+            - Source Code Documentation: {doc_data_ctx}
+            - Code Review Checklist: {code_review_ctx}
 
             ### Output:
             - System_Quality_Assurance_Checklist.md
-        """,
+        """
+
+    sys_checklist_task = TemplateTask(
+        description=sys_checklist_task_description,
         expected_output="Checklist Markdown: System_Quality_Assurance_Checklist.md",
         agent=testing_agent,
         callback=lambda output: (
@@ -442,14 +513,20 @@ def create_audit_tasks(testing_agent):
     print("🚀 Bắt đầu tạo các nhiệm vụ Audit theo COBIT...")
     print("🔍 Truy xuất dữ liệu đầu vào từ shared memory...")
 
-    cobit_checklist = shared_memory.get("phase_5_testing", "cobit_checklist") or "Không tìm thấy COBIT Checklist."
-    qa_checklist = shared_memory.get("phase_5_testing", "qa_checklist") or "Không tìm thấy QA Checklist."
+    def cobit_checklist():
+        return shared_memory.get("phase_5_testing", "cobit_checklist") or "Không tìm thấy COBIT Checklist."
+    def qa_checklist():
+        return shared_memory.get("phase_5_testing", "qa_checklist") or "Không tìm thấy QA Checklist."
 
     print("✅ Dữ liệu đầu vào đã sẵn sàng.")
 
-    # Task 1: COBIT Checklist Review
-    review_task = Task(
-        description=f"""
+    def review_task_description():
+        # Task 1: COBIT Checklist Review
+        cobit_checklist_ctx, qa_checklist_ctx = fit_sections("create_audit_tasks.review_task", 533, [
+            ("cobit_checklist", cobit_checklist(), 8),
+            ("qa_checklist", qa_checklist(), 8),
+        ])
+        return f"""
             Đánh giá hệ thống theo COBIT 2019 bằng cách đối chiếu các tiêu chí kiểm thử từ QA Checklist.
 
             ### Nội dung chính:
@@ -459,12 +536,15 @@ def create_audit_tasks(testing_agent):
             4. Đánh giá tổng thể mức độ tuân thủ chuẩn COBIT
 
             ### Inputs:
-            - COBIT Checklist: {cobit_checklist[:800]}...
-            - QA Checklist: {qa_checklist[:800]}...
+            - COBIT Checklist: {cobit_checklist_ctx}
+            - QA Checklist: {qa_checklist_ctx}
 
             ### Output:
             - Markdown: COBIT_Checklist_and_Review.md
-        """,
+        """
+
+    review_task = TemplateTask(
+        description=review_task_description,
         expected_output="COBIT_Checklist_and_Review.md – Đánh giá compliance theo domain COBIT.",
         agent=testing_agent,
         callback=lambda output: (
@@ -474,9 +554,13 @@ def create_audit_tasks(testing_agent):
         )
     )
 
-    # Task 2: COBIT Audit Report
-    audit_report_task = Task(
-        description=f"""
+    def audit_report_task_description():
+        # Task 2: COBIT Audit Report
+        cobit_checklist_ctx, qa_checklist_ctx = fit_sections("create_audit_tasks.audit_report_task", 533, [
+            ("cobit_checklist", cobit_checklist(), 8),
+            ("qa_checklist", qa_checklist(), 8),
+        ])
+        return f"""
             Tổng hợp báo cáo các hoạt động audit, đối chiếu với mục tiêu COBIT và đưa ra đề xuất cải tiến.
 
             ### Nội dung bắt buộc:
@@ -488,12 +572,15 @@ def create_audit_tasks(testing_agent):
             6. Nhận xét tổng kết của auditor
 
             ### Inputs:
-            - COBIT Checklist: {cobit_checklist[:800]}...
-            - QA Checklist: {qa_checklist[:800]}...
+            - COBIT Checklist: {cobit_checklist_ctx}
+            - QA Checklist: {qa_checklist_ctx}
 
             ### Output:
             - Markdown: COBIT_Objectives_And_Audit_Activity_Report.md
-        """,
+        """
+
+    audit_report_task = TemplateTask(
+        description=audit_report_task_description,
         expected_output="COBIT_Objectives_And_Audit_Activity_Report.md – Báo cáo giám sát & đề xuất cải tiến theo COBIT.",
         agent=testing_agent,
         callback=lambda output: (
@@ -516,19 +603,25 @@ def create_test_execution_tasks(testing_agent):
     print("🚦 Bắt đầu khởi tạo Test Execution Tasks...")
     print("📥 Truy xuất dữ liệu kiểm thử từ shared memory...")
 
-    test_cases = shared_memory.get("phase_5_testing", "test_case_specification") or "Test Case Specification chưa có."
-    bug_list = shared_memory.get("phase_5_testing", "bug_list") or "Bug List chưa có."
+    def test_cases():
+        return shared_memory.get("phase_5_testing", "test_case_specification") or "Test Case Specification chưa có."
+    def bug_list():
+        return shared_memory.get("phase_5_testing", "bug_list") or "Bug List chưa có."
 
     print("✅ Dữ liệu đã sẵn sàng.")
 
-    # Task 1: Test Summary Report
-    summary_task = Task(
-        description=f"""
+    def summary_task_description():
+        # Task 1: Test Summary Report
+        test_cases_ctx, bug_list_ctx = fit_sections("create_test_execution_tasks.summary_task", 267, [
+            ("test_cases", test_cases(), 4),
+            ("bug_list", bug_list(), 4),
+        ])
+        return f"""
             Tạo tài liệu tổng hợp kết quả thực thi kiểm thử toàn hệ thống, bao gồm tỷ lệ thành công, lỗi, coverage và đánh giá sẵn sàng triển khai.
 
             ### Inputs:
-            - Test Case Specification: {test_cases[:400]}...
-            - Bug List: {bug_list[:400]}...
+            - Test Case Specification: {test_cases_ctx}
+            - Bug List: {bug_list_ctx}
 
             ### Nội dung cần có:
             1. Tổng số test case đã thực thi
@@ -542,7 +635,10 @@ def create_test_execution_tasks(testing_agent):
 
             ### Output:
             Test_Summary_Report.docx
-        """,
+        """
+
+    summary_task = TemplateTask(
+        description=summary_task_description,
         expected_output="Test_Summary_Report.docx – Tổng hợp kết quả thực thi kiểm thử hệ thống.",
         agent=testing_agent,
         callback=lambda output: (
@@ -606,19 +702,26 @@ def create_test_management_tasks(testing_agent):
     print("🛠️ Bắt đầu tạo các Test Management Tasks...")
     print("📥 Truy xuất dữ liệu từ shared_memory...")
 
-    bug_report = shared_memory.get("phase_5_testing", "bug_list") or "Bug list chưa có."
-    test_summary = shared_memory.get("phase_5_testing", "test_summary_report") or "Test summary chưa có."
+    def test_summary():
+        return shared_memory.get("phase_5_testing", "test_summary_report") or "Test summary chưa có."
+    risk_query = "lỗi nghiêm trọng critical blocker severity rủi ro nguyên nhân ảnh hưởng defect chưa khắc phục"
+    def bug_context():
+        return retrieve_context(risk_query, [("phase_5_testing", "bug_list")], budget_tokens=200,
+                                default="Bug list chưa có.")
+    def summary_context():
+        return retrieve_context(risk_query, [("phase_5_testing", "test_summary_report")], budget_tokens=200,
+                                default="Test summary chưa có.")
 
     print("✅ Dữ liệu đã được load.")
 
     # Task 1: Risk Management Register
-    risk_task = Task(
-        description=f"""
+    risk_task = TemplateTask(
+        description=lambda: f"""
             Tạo file Risk Register dựa trên các lỗi nghiêm trọng trong kiểm thử và phân tích từ báo cáo tổng hợp.
 
             ### Inputs:
-            - Bug List: {bug_report[:300]}...
-            - Test Summary Report: {test_summary[:300]}...
+            - Bug List: {bug_context()}
+            - Test Summary Report: {summary_context()}
 
             ### Output:
             - File: Risk_Management_Register.xlsx
@@ -651,13 +754,16 @@ def create_test_management_tasks(testing_agent):
         callback=lambda output: write_output("output/5_testing/Issues_Management_Log.xlsx", output)
     )
 
-    # Task 3: Project Status Report
-    status_report_task = Task(
-        description=f"""
+    def status_report_task_description():
+        # Task 3: Project Status Report
+        test_summary_ctx = fit_sections("create_test_management_tasks.status_report_task", 100, [
+            ("test_summary", test_summary(), 3),
+        ])[0]
+        return f"""
             Tạo báo cáo tiến độ dự án kiểm thử để cập nhật cho PM hoặc Stakeholder.
 
             ### Input:
-            - Test Summary Report: {test_summary[:300]}...
+            - Test Summary Report: {test_summary_ctx}
 
             ### Output:
             - File: Project_Status_Report.md
@@ -668,7 +774,10 @@ def create_test_management_tasks(testing_agent):
             3. Mức độ coverage & chất lượng
             4. UAT readiness & các milestone quan trọng
             5. Go / No-Go Recommendation
-        """,
+        """
+
+    status_report_task = TemplateTask(
+        description=status_report_task_description,
         expected_output="Project_Status_Report.md – Báo cáo tiến độ dự án dưới góc nhìn QA.",
         agent=testing_agent,
         callback=lambda output: write_output("output/5_testing/Project_Status_Report.md", output)
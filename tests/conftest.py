@@ -0,0 +1,15 @@
+# tests/conftest.py
+
+import pytest
+
+from memory.shared_memory import DictMemoryBackend, shared_memory
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    """shared_memory trên backend dict rỗng, không spill ra file; được xóa sạch sau test."""
+    monkeypatch.setenv("MAS_MEMORY_SPILL_THRESHOLD", "0")
+    shared_memory.configure(DictMemoryBackend())
+    shared_memory.clear()
+    yield shared_memory
+    shared_memory.clear()
@@ -0,0 +1,62 @@
+# tests/test_artifact_registry.py
+
+import pytest
+
+from memory.artifact_registry import ArtifactRegistry
+
+REGISTRY = """
+producers:
+  tasks.requirement_tasks:
+    phase_2: [srs_document, sla_template]
+  tasks.design_task:
+    phase_3: [architecture_document]
+phase_aliases:
+  phase_2_requirements: phase_2
+  "phase_3:_design": phase_3
+aliases:
+  phase_2_requirements/service_level_agreement_template: phase_2/sla_template
+  phase_3/srs_document: phase_2/srs_document
+"""
+
+
+@pytest.fixture
+def registry(tmp_path):
+    path = tmp_path / "artifacts.yaml"
+    path.write_text(REGISTRY, encoding="utf-8")
+    return ArtifactRegistry(str(path))
+
+
+def test_resolve_applies_key_alias_before_phase_alias(registry):
+    assert registry.resolve("phase_2_requirements", "service_level_agreement_template") == ("phase_2", "sla_template")
+    assert registry.resolve("phase_3", "srs_document") == ("phase_2", "srs_document")
+    assert registry.resolve("phase_2_requirements", "srs_document") == ("phase_2", "srs_document")
+    assert registry.resolve_phase("phase_3:_design") == "phase_3"
+
+
+def test_unknown_keys_resolve_to_themselves_and_have_no_producer(registry):
+    assert registry.resolve("phase_9", "notes") == ("phase_9", "notes")
+    assert registry.producer_of("phase_9", "notes") is None
+    assert registry.producer_of("phase_2_requirements", "service_level_agreement_template") == "tasks.requirement_tasks"
+
+
+def test_check_consumers_reports_each_missing_or_skipped_producer_once(registry):
+    reads = [("phase_3", "srs_document"), ("phase_2", "srs_document"), ("phase_4", "lld_document"),
+             ("phase_3:_design", "architecture_document")]
+
+    assert registry.check_consumers(reads) == ["'phase_4/lld_document' không có producer nào"]
+    assert registry.check_consumers(reads, produced_phases={"phase_3"}) == [
+        "'phase_2/srs_document' do tasks.requirement_tasks ghi nhưng phase 'phase_2' không chạy",
+        "'phase_4/lld_document' không có producer nào",
+    ]
+
+
+def test_missing_registry_file_leaves_keys_unchanged(tmp_path):
+    registry = ArtifactRegistry(str(tmp_path / "missing.yaml"))
+    assert registry.resolve("phase_2_requirements", "srs_document") == ("phase_2_requirements", "srs_document")
+    assert registry.check_consumers([("phase_2", "srs_document")]) == ["'phase_2/srs_document' không có producer nào"]
+
+
+def test_shipped_registry_declares_every_alias_target():
+    registry = ArtifactRegistry()
+    missing = sorted(target for target in registry.aliases.values() if target not in registry.producers)
+    assert missing == []
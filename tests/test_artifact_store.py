@@ -0,0 +1,114 @@
+# tests/test_artifact_store.py
+
+import os
+import hashlib
+
+import pytest
+
+from utils import compression
+from utils.compression import Codec
+from memory.mapped_text import MappedText, blob_path, spill
+from memory.shared_memory import DictMemoryBackend
+from memory.artifact_store import ArtifactStore, diff_manifests, load_manifest
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    monkeypatch.setenv("MAS_BLOB_DIR", str(tmp_path / "blobs"))
+    monkeypatch.setenv("MAS_MEMORY_SPILL_THRESHOLD", "64")
+    monkeypatch.setattr(compression, "_codec", Codec("off"))
+    return ArtifactStore(str(tmp_path / "blobs"))
+
+
+def test_put_is_content_addressed_and_get_round_trips(store):
+    text = "Yêu cầu chức năng:\r\n- Mượn sách\n"
+    digest = store.put(text)
+
+    assert digest == hashlib.sha256(text.encode("utf-8")).hexdigest()
+    assert store.put(text) == digest
+    assert store.get(digest) == text
+    assert store.get_writes(store.put_writes([["phase_2", "srs", text]])) == [["phase_2", "srs", text]]
+
+
+def test_large_values_come_back_mapped_and_spilled_values_are_not_copied(store):
+    large = "Kiến trúc microservice. " * 20
+    digest = store.put(large)
+
+    value = store.get(digest)
+    assert isinstance(value, MappedText) and value == large
+    assert store.put(spill(large, store.blob_dir)) == digest
+    assert os.listdir(os.path.dirname(blob_path(digest, store.blob_dir))) == [digest]
+
+
+def test_get_missing_blob_raises_file_not_found(store):
+    with pytest.raises(FileNotFoundError):
+        store.get("ab" * 32)
+
+
+def test_snapshot_and_diff_between_runs(store, tmp_path):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    (output_dir / "SRS.md").write_text("SRS v1", encoding="utf-8")
+    memory = DictMemoryBackend()
+    memory.set("phase_1", "plan", "Kế hoạch")
+    memory.set("phase_2", "srs_document", "SRS v1")
+    old = store.snapshot(str(tmp_path / "runs" / "a"), memory, str(output_dir))
+
+    (output_dir / "SRS.md").write_text("SRS v2", encoding="utf-8")
+    memory.set("phase_2", "srs_document", "SRS v2")
+    memory.set("phase_3", "architecture_document", "Kiến trúc")
+    new = store.snapshot(str(tmp_path / "runs" / "b"), memory, str(output_dir))
+
+    assert load_manifest(str(tmp_path / "runs" / "a")) == old
+    srs_path = str(output_dir / "SRS.md")
+    assert diff_manifests(old, new) == {
+        "added": ["memory:phase_3/architecture_document"],
+        "removed": [],
+        "changed": ["memory:phase_2/srs_document", f"files:{srs_path}"],
+        "unchanged": 1,
+    }
+    diff = store.diff_text(old["files"][srs_path], new["files"][srs_path], "SRS.md")
+    assert "-SRS v1" in diff and "+SRS v2" in diff
+    assert store.diff_text(old["memory"]["phase_1/plan"], new["memory"]["phase_1/plan"]) == ""
+
+
+def test_file_versions_are_copies_not_links(store, tmp_path):
+    path = tmp_path / "Plan.md"
+    path.write_text("Bản 1", encoding="utf-8")
+    digest = store.put_file(str(path))
+
+    path.write_text("Bản 2", encoding="utf-8")
+    assert store.get(digest) == "Bản 1"
+
+
+def test_pack_compresses_blobs_that_get_still_reads(store, monkeypatch):
+    text = "| Bước | Mô tả | Người phụ trách |\n" * 40
+    digest = store.put(text)
+    monkeypatch.setattr(compression, "_codec", Codec("zlib", dict_dir=store.blob_dir))
+
+    packed, before, after = store.pack()
+    assert packed == 1 and after < before
+    assert not os.path.exists(blob_path(digest, store.blob_dir))
+    assert store.get(digest) == text
+
+
+def test_spill_threshold_counts_utf8_bytes_in_put_and_get(store, monkeypatch):
+    monkeypatch.setattr(compression, "_codec", Codec("zlib", dict_dir=store.blob_dir))
+    # "ệ" là 3 byte UTF-8: cả hai chuỗi dưới 64 ký tự, nhưng chuỗi thứ hai vượt ngưỡng 64 byte.
+    small, large = "ệ" * 21, "ệ" * 50
+    assert isinstance(store.get(store.put(small)), str)
+    large_digest = store.put(large)
+    assert os.path.exists(blob_path(large_digest, store.blob_dir))
+    assert isinstance(store.get(large_digest), MappedText)
+
+
+def test_pack_refuses_while_a_run_holds_the_store(store, monkeypatch):
+    digest = store.put("| Bước | Mô tả | Người phụ trách |\n" * 40)
+    monkeypatch.setattr(compression, "_codec", Codec("zlib", dict_dir=store.blob_dir))
+
+    with store.in_use():
+        value = store.get(digest)
+        with pytest.raises(RuntimeError):
+            store.pack()
+        assert os.path.exists(value.path)
+    assert store.pack()[0] == 1
@@ -0,0 +1,72 @@
+# tests/test_batch.py
+
+import os
+import json
+
+import pytest
+
+from batch import _project_context, llm_limits_per_process, read_requests, run_batch, shared_cache_env
+
+
+def test_llm_quota_is_split_across_processes(monkeypatch):
+    monkeypatch.setenv("MAS_LLM_RPM", "15")
+    monkeypatch.setenv("MAS_LLM_TPM", "1000000")
+    monkeypatch.delenv("MAS_LLM_MAX_CONCURRENCY", raising=False)
+
+    assert llm_limits_per_process(4) == {"MAS_LLM_RPM": "3", "MAS_LLM_TPM": "250000", "MAS_LLM_MAX_CONCURRENCY": "2"}
+    # Mỗi tiến trình luôn được ít nhất 1 request/phút.
+    assert llm_limits_per_process(32)["MAS_LLM_RPM"] == "1"
+
+
+def test_read_requests_sanitizes_and_deduplicates_ids(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    lines = [
+        {"id": "../thư viện", "system_request": "Quản lý thư viện"},
+        "không phải json",
+        {"id": "thiếu request"},
+        {"request_id": "../THƯ VIỆN", "body": "Quản lý thư viện 2"},
+        {"system_request": "Không có id"},
+    ]
+    path.write_text("\n".join(l if isinstance(l, str) else json.dumps(l, ensure_ascii=False) for l in lines),
+                    encoding="utf-8")
+
+    assert list(read_requests(str(path))) == [
+        ("thư_viện", "Quản lý thư viện"),
+        ("THƯ_VIỆN-4", "Quản lý thư viện 2"),
+        ("request_0005", "Không có id"),
+    ]
+
+
+def test_run_batch_rejects_non_positive_process_count(tmp_path):
+    with pytest.raises(ValueError):
+        run_batch(str(tmp_path / "requests.jsonl"), str(tmp_path / "out"), max_processes=0)
+
+
+def test_run_batch_leaves_the_callers_environment_untouched(tmp_path, monkeypatch):
+    for name in ("MAS_BUILD_CACHE_DIR", "MAS_LLM_CACHE_PATH", "MAS_BLOB_DIR", "MAS_COMPRESSION_DICT_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("MAS_BLOB_DIR", "blobs_dùng_chung")
+    path = tmp_path / "requests.jsonl"
+    path.write_text("", encoding="utf-8")
+    before = dict(os.environ)
+
+    assert run_batch(str(path), str(tmp_path / "out"), max_processes=4) == []
+    assert dict(os.environ) == before
+
+    env = shared_cache_env(str(tmp_path / "out"))
+    assert env["MAS_BLOB_DIR"] == os.path.abspath("blobs_dùng_chung")
+    assert env["MAS_BUILD_CACHE_DIR"] == str(tmp_path / "out" / ".cache" / "build")
+
+
+def test_project_context_restores_environment_and_working_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("MAS_LLM_RPM", "15")
+    monkeypatch.delenv("MAS_LLM_TPM", raising=False)
+    cwd = os.getcwd()
+
+    with pytest.raises(RuntimeError):
+        with _project_context(str(tmp_path / "du_an"), {"MAS_LLM_RPM": "3", "MAS_LLM_TPM": "250000"}):
+            assert os.getcwd() == str(tmp_path / "du_an")
+            assert (os.environ["MAS_LLM_RPM"], os.environ["MAS_LLM_TPM"]) == ("3", "250000")
+            raise RuntimeError("dự án lỗi")
+    assert os.getcwd() == cwd
+    assert os.environ["MAS_LLM_RPM"] == "15" and "MAS_LLM_TPM" not in os.environ
@@ -0,0 +1,63 @@
+# tests/test_bm25_index.py
+
+import pytest
+
+from memory import bm25_index
+from memory.bm25_index import BM25Index, retrieve_context, split_chunks, tokenize
+from utils.prompt_budget import count_tokens
+
+FILLER = "\n".join(f"Mục {i}: nhân viên thư viện nhập thông tin độc giả vào biểu mẫu đăng ký số {i}." for i in range(40))
+SLA = f"""{FILLER}
+Cam kết SLA: sự cố nghiêm trọng được phản hồi trong 1 giờ và khắc phục trong 4 giờ.
+{FILLER}
+Bản vá bảo mật được cài trong cửa sổ bảo trì tối thứ bảy hằng tuần.
+"""
+
+
+@pytest.fixture
+def memory(memory, monkeypatch):
+    monkeypatch.setattr(bm25_index, "artifact_index", BM25Index(chunk_tokens=40))
+    return memory
+
+
+def test_tokenize_drops_stopwords_and_keeps_bigrams():
+    assert tokenize("Kiểm thử và triển khai") == ["kiểm", "thử", "triển", "khai", "kiểm thử", "thử triển", "triển khai"]
+
+
+def test_chunks_end_at_line_boundaries_and_cover_the_text():
+    chunks = split_chunks(FILLER, 40)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(FILLER)
+    assert all(FILLER[end - 1] == "\n" for _, end in chunks[:-1])
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+
+
+def test_search_ranks_chunk_with_rare_query_terms_first():
+    index = BM25Index(chunk_tokens=40)
+    index.add("phase_2/sla", SLA)
+    score, source, start, end = index.search("thời gian phản hồi sự cố SLA", k=3)[0]
+    assert source == "phase_2/sla" and "Cam kết SLA" in SLA[start:end]
+    assert index.search("thời gian phản hồi", sources={"phase_6/plan"}) == []
+
+
+def test_reindexing_a_source_replaces_its_chunks():
+    index = BM25Index(chunk_tokens=40)
+    index.add("phase_2/sla", SLA)
+    index.add("phase_2/sla", "Hỗ trợ qua email trong giờ hành chính.")
+    assert index.indexed("phase_2/sla", "Hỗ trợ qua email trong giờ hành chính.")
+    assert index.chunks_of("phase_2/sla") == [(0, 38)]
+    assert index.search("sự cố nghiêm trọng") == []
+
+
+def test_retrieve_context_returns_relevant_chunks_within_budget(memory):
+    memory.set("phase_2", "sla", SLA)
+
+    context = retrieve_context("SLA sự cố phản hồi bản vá bảo trì", [("phase_2", "sla")], budget_tokens=120)
+    assert count_tokens(context) <= 120
+    assert "Cam kết SLA" in context and "Bản vá bảo mật" in context
+    assert context.index("Cam kết SLA") < context.index("Bản vá bảo mật")
+
+
+def test_retrieve_context_returns_small_documents_whole_and_default_when_missing(memory):
+    memory.set("phase_2", "sla", "Phản hồi trong 1 giờ.")
+    assert retrieve_context("sự cố", [("phase_2", "sla")]) == "Phản hồi trong 1 giờ."
+    assert retrieve_context("sự cố", [("phase_6", "plan")], default=None) is None
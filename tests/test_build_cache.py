@@ -0,0 +1,73 @@
+# tests/test_build_cache.py
+
+from types import SimpleNamespace
+
+import pytest
+
+from memory.artifact_store import artifact_store
+from memory.build_cache import BuildCache, task_fingerprint
+
+
+@pytest.fixture(autouse=True)
+def _workdir(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("MAS_BLOB_DIR", raising=False)
+
+
+def _task(description: str = "Viết SRS", role: str = "Business Analyst"):
+    agent = SimpleNamespace(role=role, goal="Viết tài liệu", backstory="BA", llm="gemini/flash")
+    return SimpleNamespace(description=description, expected_output="SRS.md", context=None, output=None, agent=agent)
+
+
+def test_fingerprint_depends_on_prompt_agent_llm_and_context():
+    base = task_fingerprint(_task())
+    assert task_fingerprint(_task()) == base
+    assert task_fingerprint(_task(description="Viết BRD")) != base
+    assert task_fingerprint(_task(role="Architect")) != base
+    assert task_fingerprint(_task(), llm="gemini/pro") != base
+    assert task_fingerprint(_task(), context="Output task trước") != base
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = BuildCache(str(tmp_path / "build"))
+    assert cache.get("ab" * 32) is None
+    files = {"output/2_requirements/SRS.md": artifact_store.put("# SRS\r\nFR-01")}
+    cache.put("ab" * 32, "# SRS", [("phase_2", "srs_document", "# SRS")], files)
+
+    entry = cache.get("ab" * 32)
+    assert entry["output"] == "# SRS"
+    assert entry["memory"] == [["phase_2", "srs_document", "# SRS"]]
+    assert entry["files"] == {"output/2_requirements/SRS.md": "# SRS\r\nFR-01"}
+
+
+def test_restore_files_rewrites_only_missing_or_changed_files(tmp_path):
+    path = tmp_path / "output" / "SRS.md"
+    entry = {"files": {str(path): "# SRS\r\nFR-01"}}
+    cache = BuildCache(str(tmp_path / "build"))
+
+    cache.restore_files(entry)
+    assert path.read_bytes() == "# SRS\r\nFR-01".encode("utf-8")
+    mtime = path.stat().st_mtime_ns
+    cache.restore_files(entry)
+    assert path.stat().st_mtime_ns == mtime
+
+    path.write_text("người dùng đã sửa", encoding="utf-8")
+    cache.restore_files(entry)
+    assert path.read_bytes() == "# SRS\r\nFR-01".encode("utf-8")
+
+
+def test_entry_with_missing_blob_is_a_miss(tmp_path):
+    cache = BuildCache(str(tmp_path / "build"))
+    cache.put("cd" * 32, "Output", [], {})
+    for blob in (tmp_path / ".cache" / "blobs").rglob("*"):
+        if blob.is_file():
+            blob.unlink()
+    assert cache.get("cd" * 32) is None
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = BuildCache(str(tmp_path / "build"))
+    path = tmp_path / "build" / "ef" / f"{'ef' * 32}.json"
+    path.parent.mkdir(parents=True)
+    path.write_text("{khong phai json", encoding="utf-8")
+    assert cache.get("ef" * 32) is None
@@ -0,0 +1,70 @@
+# tests/test_checkpoint.py
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from memory.checkpoint import RunCheckpoint, hash_task_inputs
+
+
+@pytest.fixture(autouse=True)
+def _workdir(monkeypatch, tmp_path):
+    # Kho blob mặc định nằm trong .cache/ của thư mục hiện hành.
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("MAS_BLOB_DIR", raising=False)
+
+
+def _task(description: str, context: list = None):
+    return SimpleNamespace(description=description, expected_output="Scope.md", context=context, output=None)
+
+
+def test_hash_changes_with_upstream_output_and_implicit_context():
+    upstream = _task("Phạm vi")
+    upstream.output = SimpleNamespace(raw_output="Phiên bản 1")
+    task = _task("Ngân sách", context=[upstream])
+    first = hash_task_inputs(task)
+
+    upstream.output = SimpleNamespace(raw_output="Phiên bản 2")
+    assert hash_task_inputs(task) != first
+    assert hash_task_inputs(_task("Ngân sách"), "Phạm vi v1") != hash_task_inputs(_task("Ngân sách"), "Phạm vi v2")
+
+
+def test_resume_restores_recorded_task(tmp_path):
+    checkpoint = RunCheckpoint("run_1", str(tmp_path / "runs"))
+    checkpoint.record("Giai đoạn 0#0", "hash-1", "Tài liệu phạm vi", [("phase_0", "scope", "Tài liệu phạm vi")])
+
+    resumed = RunCheckpoint("run_1", str(tmp_path / "runs"))
+    record = resumed.get("Giai đoạn 0#0", "hash-1")
+    assert record["output"] == "Tài liệu phạm vi"
+    assert record["memory"] == [["phase_0", "scope", "Tài liệu phạm vi"]]
+    # Đầu vào đổi thì task phải chạy lại.
+    assert resumed.get("Giai đoạn 0#0", "hash-2") is None
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    checkpoint = RunCheckpoint("run_2", str(tmp_path / "runs"))
+    checkpoint.record("Nhóm#0", "hash", "Xong", [])
+    with open(checkpoint.tasks_path, "a", encoding="utf-8") as f:
+        f.write('{"task_id": "Nhóm#1", "input_ha')
+
+    resumed = RunCheckpoint("run_2", str(tmp_path / "runs"))
+    assert resumed.get("Nhóm#0", "hash")["output"] == "Xong"
+    assert resumed.get("Nhóm#1", "hash") is None
+
+
+def test_missing_blob_reruns_task(tmp_path):
+    checkpoint = RunCheckpoint("run_3", str(tmp_path / "runs"))
+    checkpoint.record("Nhóm#0", "hash", "Output bị xóa khỏi kho", [])
+    for directory, _, names in os.walk(tmp_path / ".cache" / "blobs"):
+        for name in names:
+            os.remove(os.path.join(directory, name))
+
+    assert RunCheckpoint("run_3", str(tmp_path / "runs")).get("Nhóm#0", "hash") is None
+
+
+def test_meta_round_trip(tmp_path):
+    checkpoint = RunCheckpoint("run_4", str(tmp_path / "runs"))
+    assert checkpoint.load_meta() == {}
+    checkpoint.save_meta(system_request="Quản lý thư viện", status="partial", failed_phases=["Giai đoạn 6"])
+    assert RunCheckpoint("run_4", str(tmp_path / "runs")).load_meta()["failed_phases"] == ["Giai đoạn 6"]
@@ -0,0 +1,47 @@
+# tests/test_compression.py
+
+import pytest
+
+from utils.compression import (Codec, LZMA_MAGIC, NO_DICT_ID, ZLIB_MAGIC, is_compressed, load_current_dictionary,
+                               save_dictionary, train_dictionary)
+
+DOCUMENT = ("# Tài liệu đặc tả yêu cầu\n"
+            "| ID | Yêu cầu | Ưu tiên |\n"
+            "|----|---------|---------|\n") + "".join(f"| FR-{i:02d} | Quản lý sách số {i} | Cao |\n" for i in range(20))
+
+
+def test_frames_carry_method_and_dictionary_id(tmp_path):
+    dictionary = train_dictionary([DOCUMENT.encode("utf-8"), DOCUMENT.replace("sách", "thành viên").encode("utf-8")])
+    codec = Codec("zlib", dictionary=dictionary, dict_dir=str(tmp_path))
+    data = DOCUMENT.encode("utf-8")
+
+    framed = codec.compress(data)
+    assert framed[:3] == ZLIB_MAGIC and framed[3:11] == codec.dict_id != NO_DICT_ID
+    assert codec.decompress(framed) == data
+    assert Codec("lzma").compress(data)[:11] == LZMA_MAGIC + NO_DICT_ID
+    assert len(framed) < len(Codec("zlib").compress(data))
+
+
+def test_small_or_uncompressed_data_is_passed_through():
+    codec = Codec("zlib")
+    assert codec.compress("ngắn".encode("utf-8")) == "ngắn".encode("utf-8")
+    assert codec.decompress(b'{"key": "value"}') == b'{"key": "value"}'
+    assert not is_compressed(Codec("off").compress(DOCUMENT.encode("utf-8")))
+
+
+def test_any_codec_reads_frames_using_saved_dictionaries(tmp_path):
+    dictionary = train_dictionary([DOCUMENT.encode("utf-8")] * 2)
+    dict_id = save_dictionary(dictionary, str(tmp_path))
+    assert load_current_dictionary(str(tmp_path)) == dictionary
+
+    framed = Codec("zlib", dictionary=dictionary, dict_dir=str(tmp_path)).compress(DOCUMENT.encode("utf-8"))
+    assert framed[3:11] == dict_id.encode()
+    assert Codec("off", dict_dir=str(tmp_path)).decompress(framed) == DOCUMENT.encode("utf-8")
+
+
+def test_missing_dictionary_raises_file_not_found(tmp_path):
+    dictionary = train_dictionary([DOCUMENT.encode("utf-8")] * 2)
+    framed = Codec("zlib", dictionary=dictionary).compress(DOCUMENT.encode("utf-8"))
+
+    with pytest.raises(FileNotFoundError):
+        Codec("zlib", dict_dir=str(tmp_path)).decompress(framed)
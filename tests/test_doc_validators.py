@@ -0,0 +1,94 @@
+# tests/test_doc_validators.py
+
+import pytest
+
+from utils.doc_validators import DocumentValidator
+
+RULES = """
+defaults:
+  min_chars: 40
+documents:
+  phase_5/test_cases:
+    format: csv
+    columns: [ID, Mô tả, Kết quả mong đợi]
+    id_pattern: "TC-\\\\d{3}"
+  phase_3/api_spec:
+    format: openapi
+  phase_2/requirements:
+    format: markdown_table
+    columns: [ID, Yêu cầu]
+    id_pattern: "FR-\\\\d{3}"
+    references: phase_1/scope
+  phase_2/srs_document:
+    headings: [Giới thiệu, Yêu cầu chức năng]
+"""
+
+OPENAPI = """```yaml
+openapi: 3.0.0
+info: {title: Thư viện, version: "1.0"}
+paths:
+  /books:
+    get: {summary: Danh sách sách}
+```"""
+
+
+@pytest.fixture
+def validator(tmp_path):
+    path = tmp_path / "gate_rules.yaml"
+    path.write_text(RULES, encoding="utf-8")
+    return DocumentValidator(str(path))
+
+
+def _failed(result: dict) -> list:
+    return [c["name"] for c in result["checks"] if not c["passed"]]
+
+
+def test_csv_with_required_columns_and_unique_ids_passes(validator):
+    text = ("```csv\nID,Mô tả,Kết quả mong đợi\n"
+            "TC-001,Mượn sách còn trong kho,Thành công\nTC-002,Mượn sách đã hết,Báo lỗi TC-001\n```")
+    assert validator.validate("phase_5/test_cases", text)["status"] == "pass"
+
+
+@pytest.mark.parametrize("text, check", [
+    ("ID,Mô tả,Kết quả mong đợi\nTC-001,Mượn sách còn trong kho\nTC-002,Trả sách,Thành công", "format"),
+    ("ID,Mô tả\nTC-001,Mượn sách còn trong kho thành công\nTC-002,Trả sách đúng hạn", "format"),
+    ("ID,Mô tả,Kết quả", "min_chars"),
+])
+def test_hard_rule_violation_fails_without_review(validator, text, check):
+    result = validator.validate("phase_5/test_cases", text)
+    assert result["status"] == "fail" and check in _failed(result)
+
+
+def test_duplicate_ids_in_first_column_are_borderline(validator):
+    text = "ID,Mô tả,Kết quả mong đợi\nTC-001,Mượn sách,Thành công\nTC-001,Trả sách,Thành công"
+    result = validator.validate("phase_5/test_cases", text)
+    assert result["status"] == "borderline" and _failed(result) == ["ids"]
+
+
+def test_openapi_needs_paths(validator):
+    assert validator.validate("phase_3/api_spec", OPENAPI)["status"] == "pass"
+    result = validator.validate("phase_3/api_spec", OPENAPI.replace("paths:\n  /books:\n    get: {summary: Danh sách sách}\n", ""))
+    assert result["status"] == "fail" and "thiếu ['paths']" in result["checks"][1]["message"]
+
+
+def test_ids_missing_from_referenced_artifact_are_borderline(validator, memory):
+    memory.set("phase_1", "scope", "Phạm vi gồm FR-001 (mượn sách) và FR-002 (trả sách).")
+    table = "| ID | Yêu cầu |\n|----|---------|\n| FR-001 | Mượn sách |\n| {id} | Trả sách đúng hạn |\n"
+
+    assert validator.validate("phase_2/requirements", table.format(id="FR-002"))["status"] == "pass"
+    result = validator.validate("phase_2/requirements", table.format(id="FR-003"))
+    assert result["status"] == "borderline" and _failed(result) == ["references"]
+
+
+def test_missing_heading_is_soft_and_length_only_rules_never_pass(validator):
+    srs = "# Giới thiệu\nHệ thống quản lý thư viện.\n# Yêu cầu chức năng\nMượn và trả sách trực tuyến."
+    assert validator.validate("phase_2/srs_document", srs)["status"] == "pass"
+    assert validator.validate("phase_2/srs_document", srs.replace("# Yêu cầu", "Yêu cầu"))["status"] == "borderline"
+    assert validator.validate("phase_4/lld", srs)["status"] == "borderline"
+
+
+def test_rules_digest_changes_with_document_rules(validator):
+    before = validator.rules_digest("phase_2/srs_document")
+    assert validator.rules_digest("phase_4/lld") != before
+    validator.documents["phase_2/srs_document"]["headings"].append("Phụ lục")
+    assert validator.rules_digest("phase_2/srs_document") != before
@@ -0,0 +1,78 @@
+# tests/test_fake_llm.py
+
+import random
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from utils.fake_llm import EXPECTED_OUTPUT_MARKER, FakeLLMBackend, parse_latency, target_tokens
+from utils.llm_gateway import LLMGateway, RateLimitError, TransientLLMError, estimate_tokens
+
+
+def _messages(expected_output: str = "Tài liệu SRS đầy đủ, gồm yêu cầu chức năng và phi chức năng."):
+    return [{"role": "system", "content": "Bạn là Business Analyst."},
+            {"role": "user", "content": f"Viết SRS.\n\n{EXPECTED_OUTPUT_MARKER} {expected_output}\n\nBegin!"}]
+
+
+def test_same_prompt_and_seed_give_same_document():
+    first = FakeLLMBackend(seed=7).complete("gemini-flash", _messages())
+    second = FakeLLMBackend(seed=7).complete("gemini-flash", _messages())
+    assert first == second
+    assert FakeLLMBackend(seed=8).complete("gemini-flash", _messages())["text"] != first["text"]
+    assert FakeLLMBackend(seed=7).complete("gemini-pro", _messages())["text"] != first["text"]
+
+
+def test_answer_uses_crewai_final_answer_format_and_expected_output_length():
+    expected_output = "Tài liệu SRS đầy đủ, gồm yêu cầu chức năng và phi chức năng."
+    result = FakeLLMBackend(seed=0).complete("gemini-flash", _messages(expected_output))
+    thought, _, document = result["text"].partition("\n")
+    assert thought == "Thought: I now can give a great answer"
+    assert document.startswith("Final Answer: # Tài liệu SRS đầy đủ, gồm yêu cầu chức năng và phi chức năng")
+    assert estimate_tokens(document) >= target_tokens(expected_output)
+    assert result["completion_tokens"] == estimate_tokens(result["text"])
+
+    capped = FakeLLMBackend(seed=0).complete("gemini-flash", _messages(expected_output), max_tokens=200)
+    assert capped["completion_tokens"] < result["completion_tokens"]
+
+
+def test_injected_errors_depend_only_on_prompt_attempt():
+    outcomes = []
+    for _ in range(2):
+        backend = FakeLLMBackend(seed=3, error_rate=0.5, transient_rate=0.3)
+        attempts = []
+        for _ in range(6):
+            try:
+                backend.complete("gemini-flash", _messages())
+                attempts.append("ok")
+            except RateLimitError:
+                attempts.append("429")
+            except TransientLLMError:
+                attempts.append("503")
+        outcomes.append(attempts)
+    assert outcomes[0] == outcomes[1]
+    assert "ok" in outcomes[0] and len(set(outcomes[0])) > 1
+
+
+def test_latency_spec_parsing():
+    rng = random.Random(0)
+    assert parse_latency("")(rng) == 0.0
+    assert parse_latency("fixed:0.25")(rng) == 0.25
+    assert 0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2
+    assert parse_latency("normal:0,0.0001")(rng) >= 0.0
+    with pytest.raises(ValueError):
+        parse_latency("poisson:1")
+
+
+def test_gateway_selects_backend_from_environment(monkeypatch):
+    monkeypatch.setenv("MAS_LLM_CACHE", "0")
+    monkeypatch.setenv("MAS_LLM_BACKEND", "fake")
+    monkeypatch.setenv("MAS_FAKE_LLM_SEED", "5")
+    gateway = LLMGateway(rpm=600)
+    assert isinstance(gateway.backend, FakeLLMBackend) and gateway.backend.seed == 5
+    assert gateway.generate("gemini-flash", _messages())["text"] == \
+        FakeLLMBackend(seed=5).complete("gemini-flash", _messages())["text"]
+
+    monkeypatch.setenv("MAS_LLM_BACKEND", "openai")
+    with pytest.raises(ValueError):
+        LLMGateway(rpm=600)
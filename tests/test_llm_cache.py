@@ -0,0 +1,79 @@
+# tests/test_llm_cache.py
+
+import sqlite3
+
+import pytest
+
+from utils import llm_cache
+from utils.llm_cache import LLMResponseCache, make_cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    return now
+
+
+def _response(text: str) -> dict:
+    return {"text": text, "prompt_tokens": 10, "completion_tokens": 20}
+
+
+def test_key_covers_model_prompt_and_params():
+    messages = [{"role": "user", "content": "Viết SRS"}]
+    key = make_cache_key("gemini/flash", messages, temperature=0.2)
+    assert key == make_cache_key("gemini/flash", [dict(messages[0])], temperature=0.2)
+    assert key != make_cache_key("gemini/pro", messages, temperature=0.2)
+    assert key != make_cache_key("gemini/flash", messages, temperature=0.7)
+
+
+def test_round_trip_and_ttl(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"), ttl_seconds=60)
+    cache.put("a", _response("Tài liệu"))
+    assert cache.get("a") == _response("Tài liệu")
+    clock[0] += 61
+    assert cache.get("a") is None
+    assert cache._sum_sizes() == cache._total == 0
+
+
+def test_hits_do_not_write_until_flushed(tmp_path, clock):
+    path = str(tmp_path / "llm.sqlite")
+    cache = LLMResponseCache(path)
+    cache.put("a", _response("A"))
+    changes = cache._conn.total_changes
+
+    clock[0] += 5
+    for _ in range(10):
+        assert cache.get("a") is not None
+    assert cache._conn.total_changes == changes
+
+    cache.flush()
+    last_access = sqlite3.connect(path).execute("SELECT last_access FROM responses WHERE key = 'a'").fetchone()[0]
+    assert last_access == 1005.0
+
+
+def test_lru_eviction_uses_pending_access_times(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    for key in ("a", "b", "c"):
+        clock[0] += 1
+        cache.put(key, _response(key * 100))
+    entry_size = cache._total // 3
+    # Đủ chỗ cho ba entry: entry thứ tư làm một entry bị xóa.
+    cache.max_bytes = entry_size * 3 + entry_size // 2
+
+    clock[0] += 1
+    assert cache.get("a") is not None  # "a" mới được dùng, chỉ nằm trong bộ nhớ của tiến trình.
+    clock[0] += 1
+    cache.put("d", _response("d" * 100))
+
+    assert cache.get("b") is None
+    assert [cache.get(key) is not None for key in ("a", "c", "d")] == [True, True, True]
+    assert cache._total == cache._sum_sizes() <= cache.max_bytes
+
+
+def test_running_total_tracks_replacements(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    cache.put("a", _response("ngắn"))
+    cache.put("a", _response("dài hơn nhiều " * 20))
+    cache.put("b", _response("khác"))
+    assert cache._total == cache._sum_sizes()
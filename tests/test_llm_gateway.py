@@ -0,0 +1,102 @@
+# tests/test_llm_gateway.py
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from utils import llm_gateway
+from utils.llm_gateway import AdaptiveConcurrency, LLMGateway, RateLimitError, TokenBucket, TransientLLMError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Đồng hồ giả: `sleep` chỉ tiến thời gian, nên bucket nạp lại mà test không phải chờ."""
+    state = SimpleNamespace(now=1000.0, sleeps=[])
+
+    def sleep(seconds):
+        state.sleeps.append(seconds)
+        state.now += seconds
+
+    monkeypatch.setattr(llm_gateway, "time", SimpleNamespace(monotonic=lambda: state.now, sleep=sleep))
+    monkeypatch.setattr(llm_gateway.random, "uniform", lambda a, b: 0.0)
+    return state
+
+
+def test_token_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(60)
+    bucket.acquire(60)
+    assert clock.sleeps == []
+    bucket.acquire(30)
+    # 60 token/phút = 1 token/giây: cần 30 giây để nạp đủ.
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+
+def test_token_bucket_consume_and_refund(clock):
+    bucket = TokenBucket(100)
+    bucket.acquire(80)
+    bucket.consume(40)
+    assert bucket.tokens == pytest.approx(-20)
+    bucket.refund(1000)
+    assert bucket.tokens == pytest.approx(80)
+    bucket.refund(1000)
+    assert bucket.tokens == 100
+
+
+def test_adaptive_concurrency_is_aimd():
+    concurrency = AdaptiveConcurrency(8, increase_every=2)
+    concurrency.on_rate_limited()
+    concurrency.on_rate_limited()
+    assert concurrency.limit == 2
+    concurrency.on_success()
+    assert concurrency.limit == 2
+    concurrency.on_success()
+    assert concurrency.limit == 3
+    for _ in range(5):
+        concurrency.on_rate_limited()
+    assert concurrency.limit == 1
+
+
+class _Backend:
+    name = "stub"
+
+    def __init__(self, errors: list):
+        self.errors = errors
+        self.calls = 0
+
+    def complete(self, model, messages, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"text": "OK", "prompt_tokens": 10, "completion_tokens": 5}
+
+
+def _gateway(monkeypatch, backend, **kwargs) -> LLMGateway:
+    monkeypatch.setenv("MAS_LLM_CACHE", "0")
+    return LLMGateway(rpm=600, tpm=1000, max_concurrency=8, backend=backend, **kwargs)
+
+
+def test_rate_limit_honours_retry_after_and_refunds_tokens(clock, monkeypatch):
+    backend = _Backend([RateLimitError("429", retry_after=7.0), TransientLLMError("503")])
+    gateway = _gateway(monkeypatch, backend)
+
+    with gateway.track_usage() as usage:
+        result = gateway.generate("gemini/flash", [{"role": "user", "content": "Xin chào"}])
+
+    assert result["text"] == "OK" and result["retries"] == 2
+    # Retry-After của 429 được dùng nguyên; lỗi 503 không có header thì backoff 2^attempt.
+    assert clock.sleeps == [7.0, 2.0]
+    assert gateway.concurrency.limit == 4
+    assert usage["requests"] == 1 and usage["billed_tokens"] == 15
+    # Hai request bị từ chối được hoàn token: TPM chỉ còn bị trừ đúng 15 token đã dùng (đã nạp lại trong lúc chờ).
+    assert gateway.token_bucket.tokens == pytest.approx(1000 - 15, abs=1)
+
+
+def test_gives_up_after_max_retries(clock, monkeypatch):
+    backend = _Backend([TransientLLMError("503") for _ in range(3)])
+    gateway = _gateway(monkeypatch, backend, max_retries=2)
+
+    with pytest.raises(TransientLLMError):
+        gateway.generate("gemini/flash", [{"role": "user", "content": "Xin chào"}])
+    assert backend.calls == 3
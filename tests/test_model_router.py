@@ -0,0 +1,96 @@
+# tests/test_model_router.py
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import HumanMessage
+
+from utils import llm_gateway, model_router as router_module
+from utils.llm_gateway import GatewayChatModel
+from utils.model_router import ModelRouter
+
+POLICY = """
+default_tier: standard
+tiers:
+  heavy: {model: gemini-pro, max_tokens: 8192, temperature: 0.2, fallback: standard}
+  standard: {model: gemini-flash, max_tokens: 4096, fallback: light}
+  light: {model: gemini-flash-lite, max_tokens: 1024, fallback: heavy}
+routes:
+  - tier: heavy
+    expected_output: ["\\\\bSRS\\\\b", "OpenAPI"]
+  - tier: light
+    description: ["checklist", "biểu mẫu"]
+  - tier: light
+    roles: [Project Manager]
+    task_types: [GateTask]
+"""
+
+
+@pytest.fixture
+def router(tmp_path):
+    path = tmp_path / "model_routing.yaml"
+    path.write_text(POLICY, encoding="utf-8")
+    return ModelRouter(str(path))
+
+
+def _task(expected_output="Tài liệu.md", description="Viết tài liệu.", role="Business Analyst"):
+    return SimpleNamespace(expected_output=expected_output, description=description, agent=SimpleNamespace(role=role))
+
+
+class GateTask(SimpleNamespace):
+    pass
+
+
+def test_first_matching_route_wins_and_default_applies_otherwise(router):
+    assert router.tier_for(_task(expected_output="Tài liệu SRS.md", description="Lập checklist SRS")) == "heavy"
+    assert router.tier_for(_task(description="Lập Checklist kiểm thử")) == "light"
+    assert router.tier_for(_task(role="Project Manager")) == "standard"
+    assert router.tier_for(GateTask(**vars(_task(role="Project Manager")))) == "light"
+    assert router.tier_for(_task()) == "standard"
+
+
+def test_fallback_chain_follows_tiers_and_stops_at_cycle(router):
+    assert router.fallback_chain("heavy") == ["gemini-flash", "gemini-flash-lite"]
+    assert router.fallback_chain("light") == ["gemini-pro", "gemini-flash"]
+
+
+def test_llm_is_built_once_per_tier_with_its_settings(router, monkeypatch):
+    calls = []
+    monkeypatch.setattr(router_module, "get_llm", lambda model, **params: calls.append((model, params)) or object())
+
+    heavy = router.llm_for(_task(expected_output="OpenAPI.yaml"))
+    assert router.llm_for(_task(expected_output="SRS.md")) is heavy
+    router.llm_for(_task())
+    assert calls == [
+        ("gemini-pro", {"temperature": 0.2, "max_tokens": 8192, "timeout": 120,
+                        "fallbacks": ["gemini-flash", "gemini-flash-lite"]}),
+        ("gemini-flash", {"temperature": None, "max_tokens": 4096, "timeout": 120,
+                          "fallbacks": ["gemini-flash-lite", "gemini-pro"]}),
+    ]
+
+
+def test_missing_policy_keeps_agent_llm_and_unknown_tier_is_rejected(tmp_path):
+    assert ModelRouter(str(tmp_path / "missing.yaml")).llm_for(_task()) is None
+    path = tmp_path / "bad.yaml"
+    path.write_text("tiers: {light: {model: m}}\nroutes: [{tier: heavy}]\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        ModelRouter(str(path))
+
+
+def test_gateway_model_falls_back_when_primary_fails(monkeypatch):
+    attempts = []
+
+    def generate(model, messages, **kwargs):
+        attempts.append(model)
+        if model == "gemini-pro":
+            raise RuntimeError("quá tải")
+        return {"text": f"Trả lời từ {model}", "prompt_tokens": 3, "completion_tokens": 4}
+
+    monkeypatch.setattr(llm_gateway, "get_gateway", lambda: SimpleNamespace(generate=generate))
+    llm = GatewayChatModel(model="gemini-pro", fallbacks=["gemini-pro", "gemini-flash"])
+
+    assert llm.invoke([HumanMessage(content="Xin chào")]).content == "Trả lời từ gemini-flash"
+    assert attempts == ["gemini-pro", "gemini-flash"]
@@ -0,0 +1,64 @@
+# tests/test_pipeline_benchmark.py
+
+import os
+import json
+import importlib.util
+
+import pytest
+
+# benchmarks/ là thư mục script, không phải package: nạp module theo đường dẫn.
+_spec = importlib.util.spec_from_file_location(
+    "pipeline_benchmark", os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks", "pipeline_benchmark.py"))
+pipeline_benchmark = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(pipeline_benchmark)
+compare, compare_with_baseline = pipeline_benchmark.compare, pipeline_benchmark.compare_with_baseline
+record_tasks = pipeline_benchmark.record_tasks
+
+
+def _result(total_s: float, tasks_per_s: float, factory_run_s: float) -> dict:
+    return {
+        "pipeline": {"summary": {"total_s": total_s, "tasks_per_s": tasks_per_s, "prompt_tokens": 1000,
+                                 "output_bytes": 5000, "phases_run": ["Giai đoạn 0"]}},
+        "factories": {"tasks.testing_tasks.create_test_plan_tasks": {"run_s": factory_run_s}},
+        "peak_rss_mb": 100.0,
+    }
+
+
+def test_baseline_round_trip(tmp_path):
+    baseline_path = tmp_path / "baseline.json"
+    baseline_path.write_text(json.dumps(_result(2.0, 10.0, 0.5), ensure_ascii=False), encoding="utf-8")
+
+    assert compare_with_baseline(_result(2.1, 9.8, 0.52), str(baseline_path), 0.1) == []
+    assert compare_with_baseline(_result(3.0, 6.0, 0.9), str(baseline_path), 0.1) == [
+        "pipeline.summary.total_s",
+        "pipeline.summary.tasks_per_s",
+        "factories.tasks.testing_tasks.create_test_plan_tasks.run_s",
+    ]
+
+
+def test_compare_warns_when_pipelines_ran_different_phases(capsys):
+    current = _result(2.0, 10.0, 0.5)
+    current["pipeline"]["summary"]["phases_run"] = ["Giai đoạn 0", "Giai đoạn 6"]
+    compare(current, _result(2.0, 10.0, 0.5), 0.1)
+    assert "Cảnh báo" in capsys.readouterr().out
+
+
+def test_record_tasks_observes_scheduler_tasks(monkeypatch, tmp_path):
+    pytest.importorskip("langchain_core")
+    from types import SimpleNamespace
+    from utils import task_scheduler
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MAS_LLM_BACKEND", "fake")
+    monkeypatch.setenv("MAS_LLM_CACHE", "0")
+    monkeypatch.setattr(task_scheduler, "_run_or_reuse", lambda task, *args, **kwargs: task.result)
+    tasks = [SimpleNamespace(description=f"Task {i}", context=[], agent=None, result=f"Output {i}") for i in range(2)]
+
+    records = []
+    with record_tasks(records):
+        task_scheduler.run_tasks(tasks, max_workers=2, name="Giai đoạn 6")
+    task_scheduler.run_tasks(tasks, max_workers=2, name="Ngoài khối with")
+
+    assert sorted(r["task_id"] for r in records) == ["Giai đoạn 6#0", "Giai đoạn 6#1"]
+    assert all(r["status"] == "completed" and r["phase"] == "Giai đoạn 6" and "prompt_tokens" in r for r in records)
+
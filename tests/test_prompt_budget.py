@@ -0,0 +1,85 @@
+# tests/test_prompt_budget.py
+
+from utils.prompt_budget import DROPPED, budget_reports, condense, count_tokens, fit_sections
+
+
+def _document(sections: int, sentences: int) -> str:
+    return "\n\n".join(
+        f"## Mục {s}\n" + " ".join(f"Hệ thống phải ghi nhận yêu cầu số {s}-{i} của người dùng." for i in range(sentences))
+        for s in range(sections)
+    )
+
+
+def test_condense_slightly_over_budget_keeps_most_of_the_text():
+    text = _document(sections=10, sentences=12)
+    budget = count_tokens(text) - 10
+    result, mode = condense(text, budget)
+    assert mode == "summarized"
+    assert 0.9 * budget <= count_tokens(result) <= budget
+
+
+def test_condense_fills_budget_with_following_sentences_of_each_section():
+    text = _document(sections=6, sentences=12)
+    budget = count_tokens(text) // 2
+    result, _ = condense(text, budget)
+    assert 0.9 * budget <= count_tokens(result) <= budget
+    for s in range(6):
+        # Mỗi mục giữ tiêu đề cùng các câu liền nhau từ đầu mục.
+        assert f"## Mục {s}" in result
+        assert f"yêu cầu số {s}-1 " in result
+
+
+def test_condense_single_paragraph_uses_most_of_the_budget():
+    sentences = [f"Người dùng có thể xuất báo cáo tháng thứ {i} dưới dạng PDF." for i in range(20)]
+    result, _ = condense(" ".join(sentences), 60)
+    # Phần ngân sách còn thừa không đủ cho câu kế tiếp.
+    assert 60 - count_tokens(sentences[0]) < count_tokens(result) <= 60
+    assert result.startswith("Người dùng có thể xuất báo cáo tháng thứ 0")
+
+
+def test_condense_keeps_text_that_fits():
+    assert condense("Một câu ngắn.", 50) == ("Một câu ngắn.", "full")
+
+
+def test_fit_sections_keeps_everything_that_fits():
+    sections = [("srs", "Hệ thống quản lý thư viện.", 2), ("plan", "Kế hoạch ba tháng.", 1)]
+    assert fit_sections("test.fits", 100, sections) == ["Hệ thống quản lý thư viện.", "Kế hoạch ba tháng."]
+    report = budget_reports()["test.fits"]
+    assert [s["mode"] for s in report["sections"]] == ["full", "full"]
+    assert report["used"] == sum(count_tokens(text) for _, text, _ in sections)
+
+
+def test_fit_sections_splits_budget_by_priority():
+    text = _document(sections=8, sentences=10)
+    srs, plan = fit_sections("test.weights", 600, [("srs", text, 3), ("plan", text, 1)])
+    # Cả hai phần đều quá dài: phần ưu tiên 3 nhận khoảng 3/4 ngân sách, phần ưu tiên 1 khoảng 1/4.
+    assert 0.9 * 450 <= count_tokens(srs) <= 450
+    assert 0.9 * 150 <= count_tokens(plan) <= 150
+
+
+def test_fit_sections_gives_unused_share_to_other_sections():
+    text = _document(sections=8, sentences=10)
+    short = "Ngân sách dự án: 500 triệu đồng."
+    long_part, short_part = fit_sections("test.surplus", 400, [("srs", text, 1), ("budget", short, 1)])
+    assert short_part == short
+    assert count_tokens(long_part) > 400 / 2
+    assert count_tokens(long_part) + count_tokens(short) <= 400
+
+
+def test_fit_sections_drops_lowest_priority_section_that_cannot_get_min_tokens():
+    text = _document(sections=4, sentences=10)
+    srs, notes = fit_sections("test.drop", 120, [("srs", text, 10), ("notes", text, 1)], min_tokens=24)
+    assert notes == DROPPED
+    # Phần bị lược bỏ trả phần ngân sách của nó cho phần còn lại.
+    assert count_tokens(srs) > 120 * 10 / 11
+    report = budget_reports()["test.drop"]
+    assert [(s["name"], s["mode"], s["kept"]) for s in report["sections"]][1] == ("notes", "dropped", 0)
+    assert report["used"] == count_tokens(srs) and report["budget"] == 120
+    assert report["utilization"] == round(report["used"] / 120, 3)
+
+
+def test_fit_sections_scales_budget_from_environment(monkeypatch):
+    monkeypatch.setenv("MAS_PROMPT_BUDGET_SCALE", "0.5")
+    text = _document(sections=8, sentences=10)
+    result, = fit_sections("test.scale", 400, [("srs", text, 1)])
+    assert count_tokens(result) <= 200 and budget_reports()["test.scale"]["budget"] == 200
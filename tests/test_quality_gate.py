@@ -0,0 +1,79 @@
+# tests/test_quality_gate.py
+
+import json
+
+import pytest
+
+from memory.shared_memory import shared_memory
+
+crewai = pytest.importorskip("crewai")
+
+from crewai.tasks.task_output import TaskOutput  # noqa: E402
+
+from tasks.template_task import TemplateTask  # noqa: E402
+from tasks.quality_gate_tasks import (VERDICT_FAIL, _create_reduce_task, _plan_rework,  # noqa: E402
+                                      create_document_review_task, gate_phase, load_gate_verdict)
+
+PHASE_NAME = "Phase 2: Requirements"
+
+
+def _answer(task, text: str):
+    """Hoàn thành task như khi LLM trả lời `text`: CrewAI gọi callback với TaskOutput."""
+    task.output = TaskOutput(description=task.description, raw_output=text)
+    task.callback(task.output)
+
+
+def test_gate_reads_review_text_not_task_output_repr(memory, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MAS_GATE_CACHE", "0")
+    phase = gate_phase(PHASE_NAME)
+    memory.set(phase, "meeting_notes", "Biên bản họp khởi động dự án.")
+    review = create_document_review_task(None, PHASE_NAME, "meeting_notes")
+    reduce_task = _create_reduce_task(None, PHASE_NAME, ["meeting_notes"], {"meeting_notes": review}, "")
+
+    # Mô tả task chứa hướng dẫn "'KẾT LUẬN: ĐẠT' hoặc 'KẾT LUẬN: KHÔNG ĐẠT'", bản review thì không có dòng kết luận.
+    assert VERDICT_FAIL in review.description
+    _answer(review, "Biên bản thiếu danh sách người tham dự.")
+    _answer(reduce_task, "# Báo cáo phê duyệt\nChưa đủ thông tin để phê duyệt.")
+
+    assert memory.get(phase, "gate_review_meeting_notes") == "Biên bản thiếu danh sách người tham dự."
+    assert load_gate_verdict(phase)["documents"] == {"meeting_notes": "unknown"}
+    assert memory.get(phase, "validation_report") == "# Báo cáo phê duyệt\nChưa đủ thông tin để phê duyệt."
+
+
+def test_rework_regenerates_rejected_document_as_a_new_task(memory):
+    phase_name = "Phase 2: Requirements"
+    phase = gate_phase(phase_name)
+    scope = crewai.Task(description="Xác định phạm vi.", expected_output="Scope.md")
+    srs = TemplateTask(description=lambda: f"Viết SRS cho: {shared_memory.get(phase, 'scope') or 'Không có'}",
+                       expected_output="SRS.md", context=[scope])
+    memory.set(phase, "gate_verdict", json.dumps({"documents": {"srs_document": "fail"}}))
+    memory.set(phase, "gate_review_srs_document", "Thiếu yêu cầu phi chức năng.")
+
+    rework = _plan_rework(None, phase_name, {"srs_document": srs}, "", 0, {"spent": 0, "pending": []})
+    fix = rework()[0]
+
+    assert fix is not srs and fix.id != srs.id
+    assert fix.context == [scope] and fix.context is not srs.context
+    assert fix.template is None and fix.output is None
+    assert "Thiếu yêu cầu phi chức năng." in fix.description
+    assert srs.description == "Viết SRS cho: Không có" and srs.template is not None
+
+
+def test_rework_feedback_is_the_reviewers_findings(memory, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MAS_GATE_CACHE", "0")
+    phase = gate_phase(PHASE_NAME)
+    producer = crewai.Task(description="Viết biên bản họp.", expected_output="Meeting_Notes.md")
+    memory.set(phase, "meeting_notes", "Biên bản họp khởi động dự án.")
+    review = create_document_review_task(None, PHASE_NAME, "meeting_notes", producer)
+    rework = _plan_rework(None, PHASE_NAME, {"meeting_notes": producer}, "", 0, {"spent": 0, "pending": []})
+    reduce_task = _create_reduce_task(None, PHASE_NAME, ["meeting_notes"], {"meeting_notes": review}, "", rework=rework)
+
+    _answer(review, f"Thiếu danh sách người tham dự và quyết định của cuộc họp.\n{VERDICT_FAIL}")
+    _answer(reduce_task, f"# Báo cáo phê duyệt\nmeeting_notes không đạt.\n{VERDICT_FAIL}")
+    fix = reduce_task.rework()[0]
+
+    feedback = fix.description.split("## Phản hồi từ quality gate", 1)[1]
+    assert "Thiếu danh sách người tham dự và quyết định của cuộc họp." in feedback
+    assert "checklist" not in feedback and "description=" not in feedback
@@ -0,0 +1,119 @@
+# tests/test_shared_memory.py
+
+import threading
+
+import pytest
+
+from memory.shared_memory import DictMemoryBackend, shared_memory
+
+
+def test_writes_without_live_snapshot_do_not_copy_the_phase():
+    backend = DictMemoryBackend()
+    backend.set("phase_2", "srs_document", "SRS")
+    phase_data = backend._data["phase_2"]
+    for i in range(10):
+        backend.set("phase_2", f"fr_{i}", i)
+    assert backend._data["phase_2"] is phase_data
+    assert len(phase_data) == 11
+
+
+def test_snapshot_and_phase_view_are_not_changed_by_later_writes():
+    backend = DictMemoryBackend()
+    backend.set("phase_2", "srs_document", "SRS v1")
+    snapshot = backend.snapshot()
+    phase_view = backend.get_phase("phase_2")
+
+    backend.set("phase_2", "srs_document", "SRS v2")
+    backend.set("phase_2", "brd_document", "BRD")
+    backend.set("phase_3", "hld", "HLD")
+
+    assert snapshot == {"phase_2": {"srs_document": "SRS v1"}}
+    assert dict(phase_view) == {"srs_document": "SRS v1"}
+    assert backend.get("phase_2", "srs_document") == "SRS v2"
+    assert sorted(backend.keys()) == [("phase_2", "brd_document"), ("phase_2", "srs_document"), ("phase_3", "hld")]
+
+
+def test_isolated_reads_stay_on_snapshot_and_report_overwritten_inputs(memory):
+    memory.set("phase_2", "srs_document", "SRS v1")
+    memory.set("phase_3", "hld", "HLD v1")
+    with memory.isolated() as view:
+        assert memory.get("phase_2", "srs_document") == "SRS v1"
+        thread = threading.Thread(target=memory.set, args=("phase_2", "srs_document", "SRS v2"))
+        thread.start()
+        thread.join()
+        assert memory.get("phase_2", "srs_document") == "SRS v1"
+
+        memory.set("phase_3", "hld", "HLD v2")
+        assert memory.get("phase_3", "hld") == "HLD v2"
+        assert dict(memory.get_phase_data("phase_3")) == {"hld": "HLD v2"}
+
+    assert memory.get("phase_2", "srs_document") == "SRS v2"
+    assert view.changed_keys() == [("phase_2", "srs_document")]
+    assert view.version_of("phase_2", "srs_document") < memory.version_of("phase_2", "srs_document")
+
+
+def test_snapshot_versions_are_not_changed_by_later_writes(memory):
+    memory.set("phase_0", "charter", "v1")
+    snapshot = memory.snapshot()
+    memory.set("phase_0", "charter", "v2")
+    memory.set("phase_0", "scope", "v1")
+
+    assert snapshot.version_of("phase_0", "scope") == 0
+    assert snapshot.version_of("phase_0", "charter") < memory.version_of("phase_0", "charter")
+    assert snapshot.changed_keys([("phase_0", "charter"), ("phase_0", "scope")]) == [
+        ("phase_0", "charter"), ("phase_0", "scope")]
+
+
+def test_subscribers_are_called_per_key_phase_and_globally(memory):
+    calls = []
+    unsubscribe_key = memory.subscribe("phase_2", "srs_document", lambda *args: calls.append(("key",) + args))
+    unsubscribe_phase = memory.subscribe("phase_2", callback=lambda *args: calls.append(("phase",) + args))
+    unsubscribe_all = memory.subscribe(None, callback=lambda *args: calls.append(("all",) + args))
+
+    memory.set("phase_2", "srs_document", "SRS")
+    memory.set("phase_2", "brd_document", "BRD")
+    memory.set("phase_3", "hld", "HLD")
+    unsubscribe_key()
+    unsubscribe_phase()
+    unsubscribe_all()
+    memory.set("phase_2", "srs_document", "SRS v2")
+
+    assert calls == [
+        ("key", "phase_2", "srs_document", "SRS"),
+        ("phase", "phase_2", "srs_document", "SRS"),
+        ("all", "phase_2", "srs_document", "SRS"),
+        ("phase", "phase_2", "brd_document", "BRD"),
+        ("all", "phase_2", "brd_document", "BRD"),
+        ("all", "phase_3", "hld", "HLD"),
+    ]
+
+
+def test_failing_subscriber_does_not_break_writes(memory):
+    calls = []
+    unsubscribe_broken = memory.subscribe("phase_0", "charter", lambda *_: 1 / 0)
+    unsubscribe = memory.subscribe("phase_0", "charter", lambda *args: calls.append(args))
+    try:
+        memory.set("phase_0", "charter", "Hiến chương")
+    finally:
+        unsubscribe_broken()
+        unsubscribe()
+    assert memory.get("phase_0", "charter") == "Hiến chương"
+    assert calls == [("phase_0", "charter", "Hiến chương")]
+
+
+def test_wait_for_returns_existing_value_or_blocks_until_written(memory):
+    memory.set("phase_0", "charter", "Hiến chương")
+    assert memory.wait_for("phase_0", "charter", timeout=0) == "Hiến chương"
+
+    timer = threading.Timer(0.05, memory.set, args=("phase_1", "project_plan", "Kế hoạch"))
+    timer.start()
+    try:
+        assert memory.wait_for("phase_1", "project_plan", timeout=5) == "Kế hoạch"
+    finally:
+        timer.cancel()
+
+
+def test_wait_for_times_out_and_unsubscribes(memory):
+    with pytest.raises(TimeoutError):
+        memory.wait_for("phase_1", "budget", timeout=0.01)
+    assert ("phase_1", "budget") not in type(memory)._subscribers
@@ -0,0 +1,80 @@
+# tests/test_sqlite_memory.py
+
+import os
+import json
+import sqlite3
+
+import pytest
+
+from utils import compression
+from utils.compression import Codec, is_compressed
+from memory.mapped_text import MappedText, spill
+from memory.sqlite_memory import SQLiteMemoryBackend, BLOB_REF_KEY
+
+
+@pytest.fixture(autouse=True)
+def _blob_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("MAS_BLOB_DIR", str(tmp_path / "blobs"))
+    monkeypatch.setattr(compression, "_codec", Codec("off"))
+
+
+def _rows(path: str) -> dict:
+    with sqlite3.connect(path) as conn:
+        return {(phase, key): (value, version) for phase, key, value, version
+                in conn.execute("SELECT phase, key, value, version FROM memory")}
+
+
+def test_writes_are_committed_in_batches_and_readable_before_commit(tmp_path):
+    path = str(tmp_path / "memory.sqlite")
+    backend = SQLiteMemoryBackend(path, batch_size=3, flush_interval=60)
+
+    backend.set("phase_0", "charter", "Hiến chương")
+    backend.set("phase_0", "scope", {"in": ["quản lý sách"]})
+    assert _rows(path) == {}
+    assert backend.get("phase_0", "charter") == "Hiến chương"
+    assert backend.get("phase_0", "scope") == {"in": ["quản lý sách"]}
+
+    backend.set("phase_0", "risks", ["trễ hạn"])
+    assert set(_rows(path)) == {("phase_0", "charter"), ("phase_0", "scope"), ("phase_0", "risks")}
+
+    backend.set("phase_0", "charter", "Hiến chương v2")
+    assert _rows(path)[("phase_0", "charter")][1] == 1
+    backend.flush()
+    assert _rows(path)[("phase_0", "charter")] == (json.dumps("Hiến chương v2", ensure_ascii=False), 2)
+
+
+def test_commit_from_another_connection_invalidates_read_cache(tmp_path):
+    path = str(tmp_path / "memory.sqlite")
+    writer = SQLiteMemoryBackend(path, flush_interval=0)
+    reader = SQLiteMemoryBackend(path, flush_interval=0)
+
+    writer.set("phase_2", "srs_document", "SRS v1")
+    assert reader.get("phase_2", "srs_document") == "SRS v1"
+    writer.set("phase_2", "srs_document", "SRS v2")
+    assert reader.get("phase_2", "srs_document") == "SRS v2"
+    assert reader.get_phase("phase_2") == {"srs_document": "SRS v2"}
+    assert reader.keys() == [("phase_2", "srs_document")]
+
+
+def test_mapped_text_is_stored_as_blob_reference(tmp_path):
+    path = str(tmp_path / "memory.sqlite")
+    text = "Tài liệu thiết kế. " * 1000
+    value = spill(text)
+    SQLiteMemoryBackend(path, flush_interval=0).set("phase_3", "hld", value)
+
+    stored, _ = _rows(path)[("phase_3", "hld")]
+    assert json.loads(stored) == {BLOB_REF_KEY: os.path.basename(value.path)}
+    loaded = SQLiteMemoryBackend(path).get("phase_3", "hld")
+    assert isinstance(loaded, MappedText)
+    assert loaded == text
+
+
+def test_values_are_compressed_with_the_configured_codec(monkeypatch, tmp_path):
+    monkeypatch.setattr(compression, "_codec", Codec("zlib", dict_dir=str(tmp_path / "zdict")))
+    path = str(tmp_path / "memory.sqlite")
+    value = {"sections": ["Giới thiệu", "Phạm vi", "Yêu cầu chức năng"] * 20}
+    SQLiteMemoryBackend(path, flush_interval=0).set("phase_2", "srs_outline", value)
+
+    stored, _ = _rows(path)[("phase_2", "srs_outline")]
+    assert isinstance(stored, bytes) and is_compressed(stored)
+    assert SQLiteMemoryBackend(path).get("phase_2", "srs_outline") == value
@@ -0,0 +1,178 @@
+# tests/test_task_scheduler.py
+
+from types import SimpleNamespace
+
+import pytest
+
+from memory.shared_memory import shared_memory
+from utils import task_scheduler
+from utils.task_scheduler import TaskGroup, DataflowError, build_dependency_graph, run_dataflow, run_tasks
+
+
+def _templated(template, expected_output: str):
+    # Như TemplateTask (tasks/template_task.py): mô tả render từ template khi tạo task.
+    return SimpleNamespace(description=template(), template=template, expected_output=expected_output)
+
+
+def _build():
+    return [
+        _templated(lambda: f"Phạm vi: {shared_memory.get('test_phase_1', 'scope') or 'Không có'}", "Scope.md"),
+        _templated(lambda: f"Ngân sách: {shared_memory.get('test_phase_1', 'budget') or 'Không có'}", "Budget.md"),
+    ]
+
+
+def test_materialize_reports_missing_inputs_per_task():
+    group = TaskGroup("Nhóm thử", _build, writes={"test_phase_2"})
+    tasks = _build()
+    shared_memory.set("test_phase_1", "scope", "Hệ thống quản lý thư viện.")
+
+    with shared_memory.isolated():
+        assert group.materialize(tasks[0], 0) == []
+        assert group.materialize(tasks[1], 1) == [("test_phase_1", "budget")]
+    assert tasks[0].description == "Phạm vi: Hệ thống quản lý thư viện."
+    assert group._built is None
+
+
+def test_materialize_rebuilds_untemplated_factory_only_when_its_inputs_change():
+    builds = []
+
+    def build():
+        builds.append(1)
+        plan = shared_memory.get("test_phase_4", "plan")
+        return [SimpleNamespace(description=f"Kế hoạch: {plan}", expected_output=f"Bước {i}.md") for i in range(3)]
+
+    group = TaskGroup("Nhóm không template", build, writes={"test_phase_5"})
+    tasks = build()
+    shared_memory.set("test_phase_4", "plan", "v1")
+    builds.clear()
+
+    for i, task in enumerate(tasks[:2]):
+        group.materialize(task, i)
+        shared_memory.set("test_phase_5", f"output_{i}", "Nội dung")
+    assert len(builds) == 1 and tasks[1].description == "Kế hoạch: v1"
+
+    shared_memory.set("test_phase_4", "plan", "v2")
+    assert group.materialize(tasks[2], 2) == []
+    assert len(builds) == 2 and tasks[2].description == "Kế hoạch: v2"
+
+
+def _fake_execute(task, task_id=None, *args):
+    if task.fail:
+        raise RuntimeError(f"{task_id} lỗi")
+    return task.result
+
+
+def test_run_dataflow_reports_group_failed_when_rework_fails(monkeypatch):
+    monkeypatch.setattr(task_scheduler, "_execute_task", _fake_execute)
+    fix = SimpleNamespace(context=[], fail=True, result=None)
+    reduce = SimpleNamespace(context=[], fail=False, result="KẾT LUẬN: KHÔNG ĐẠT", rework=lambda: [fix])
+    group = TaskGroup("Nhóm sửa lại", lambda: [reduce], writes={"test_phase_3"}, lazy=False)
+
+    with pytest.raises(DataflowError) as error:
+        run_dataflow([group], max_workers=1)
+    assert error.value.failed_groups == ["Nhóm sửa lại"]
+
+
+def test_run_tasks_returns_verdict_of_last_rework(monkeypatch):
+    monkeypatch.setattr(task_scheduler, "_execute_task", _fake_execute)
+    second = SimpleNamespace(context=[], fail=False, result="KẾT LUẬN: ĐẠT")
+    first = SimpleNamespace(context=[], fail=False, result="KẾT LUẬN: KHÔNG ĐẠT", rework=lambda: [second])
+
+    assert run_tasks([first], max_workers=1, name="Nhóm") == "KẾT LUẬN: ĐẠT"
+
+
+class _SequentialTask:
+    """Task tối giản ghép ngữ cảnh như `crewai.Task.execute` và ghi lại prompt, ngữ cảnh mà nó nhận."""
+
+    def __init__(self, name: str, prompts: list, context: list = None):
+        self.description = f"Viết tài liệu {name}"
+        self.expected_output = f"{name}.md"
+        self.context = context
+        self.agent = None
+        self.output = None
+        self.name = name
+        self.prompts = prompts
+
+    def execute(self, agent=None, context=None):
+        if self.context:
+            context = "\n".join(t.output.raw_output for t in self.context if t.output)
+        self.prompts.append((self.description, context))
+        self.output = SimpleNamespace(raw_output=f"Nội dung {self.name}")
+        return self.output.raw_output
+
+
+def _maintenance_like_tasks(prompts: list) -> list:
+    plan = _SequentialTask("plan", prompts)
+    lessons = _SequentialTask("lessons", prompts)
+    transition = _SequentialTask("transition", prompts)
+    review = _SequentialTask("review", prompts, context=[plan, transition])
+    return [plan, lessons, transition, review]
+
+
+def test_tasks_without_context_depend_on_previous_task():
+    tasks = _maintenance_like_tasks([])
+    assert build_dependency_graph(tasks) == {0: set(), 1: {0}, 2: {1}, 3: {0, 2}}
+    assert build_dependency_graph(tasks, chain=False) == {0: set(), 1: set(), 2: set(), 3: {0, 2}}
+
+
+def test_single_worker_gives_same_prompts_as_sequential_crew(monkeypatch):
+    monkeypatch.setattr(task_scheduler, "_run_or_reuse",
+                        lambda task, task_id, checkpoint, cache, span, context=None: task.execute(context=context))
+    baseline = []
+    output = ""
+    # Vòng lặp của `Crew._run_sequential_process`: task nhận output của task chạy ngay trước nó.
+    for task in _maintenance_like_tasks(baseline):
+        output = task.execute(context=output)
+
+    scheduled = []
+    run_tasks(_maintenance_like_tasks(scheduled), max_workers=1, name="Bảo trì")
+    # Task đầu tiên nhận "" từ Crew và None từ scheduler: cả hai đều là không có ngữ cảnh.
+    assert [(d, c or None) for d, c in scheduled] == [(d, c or None) for d, c in baseline]
+    assert scheduled[1] == ("Viết tài liệu lessons", "Nội dung plan")
+
+
+def test_crew_and_scheduler_send_same_prompts(monkeypatch, tmp_path):
+    crewai = pytest.importorskip("crewai")
+    from utils.llm_gateway import get_llm
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OTEL_SDK_DISABLED", "true")
+    prompts = []
+
+    def execute_task(agent, task, context=None, tools=None):
+        prompts.append((task.prompt(), context or None))
+        return f"Nội dung: {task.expected_output}"
+
+    monkeypatch.setattr(crewai.Agent, "execute_task", execute_task)
+    agent = crewai.Agent(role="SRE", goal="Bảo trì hệ thống", backstory="Kỹ sư vận hành.", llm=get_llm(),
+                         allow_delegation=False)
+
+    def build():
+        plan = crewai.Task(description="Lập kế hoạch bảo trì.", expected_output="Maintenance_Plan.md", agent=agent)
+        lessons = crewai.Task(description="Tổng hợp bài học.", expected_output="Lessons_Learned.md", agent=agent)
+        review = crewai.Task(description="Review kế hoạch.", expected_output="Review.md", agent=agent, context=[plan])
+        return [plan, lessons, review]
+
+    crewai.Crew(agents=[agent], tasks=build(), process=crewai.Process.sequential).kickoff()
+    baseline, prompts[:] = list(prompts), []
+    run_tasks(build(), max_workers=1, name="Bảo trì")
+    assert prompts == baseline
+
+
+def test_run_dataflow_starts_group_when_its_input_is_written(monkeypatch):
+    def execute(task, task_id=None, *args):
+        if task.writes:
+            shared_memory.set("test_flow_1", "plan", task.writes)
+        return task.writes or task.description
+
+    def build_consumer():
+        plan = shared_memory.get("test_flow_1", "plan")
+        return [SimpleNamespace(context=[], writes=None, description=f"Thiết kế theo: {plan or 'Không có'}")]
+
+    monkeypatch.setattr(task_scheduler, "_execute_task", execute)
+    consumer = TaskGroup("Nhóm đọc", build_consumer, writes={"test_flow_2"}, lazy=False)
+    producer = TaskGroup("Nhóm ghi", lambda: [SimpleNamespace(context=[], writes="Kế hoạch v1", description="")],
+                         writes={"test_flow_1"}, lazy=False)
+
+    outputs = run_dataflow([consumer, producer], max_workers=2)
+    assert outputs == {"Nhóm ghi": "Kế hoạch v1", "Nhóm đọc": "Thiết kế theo: Kế hoạch v1"}
@@ -0,0 +1,91 @@
+# tests/test_tracing.py
+
+import json
+import threading
+
+import pytest
+
+from utils.tracing import Tracer
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer()
+    tracer.enable()
+    return tracer
+
+
+def _task(tracer: Tracer, name: str, barrier: threading.Barrier):
+    with tracer.span("task", "task", task=name):
+        barrier.wait()
+        with tracer.span("llm_call", "llm", model="fake"):
+            tracer.accumulate(prompt_tokens=100, completion_tokens=20)
+        with tracer.span("llm_call", "llm", model="fake"):
+            tracer.accumulate(prompt_tokens=50)
+        with tracer.span("write_output", "io"):
+            tracer.accumulate(bytes_written=1024)
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.span("task", "task") as args:
+        tracer.accumulate(prompt_tokens=10)
+    assert tracer.spans == [] and args == {}
+
+
+def test_counters_accumulate_into_open_spans_of_the_same_thread_only(tracer):
+    barrier = threading.Barrier(2)
+    threads = [threading.Thread(target=_task, args=(tracer, name, barrier), name=f"worker-{name}")
+               for name in ("srs", "brd")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    tasks = {span["args"]["task"]: span for span in tracer.spans if span["name"] == "task"}
+    assert set(tasks) == {"srs", "brd"}
+    for span in tasks.values():
+        assert span["args"] == {"task": span["args"]["task"], "prompt_tokens": 150, "completion_tokens": 20,
+                                "bytes_written": 1024}
+        children = [s for s in tracer.spans if s["tid"] == span["tid"] and s is not span]
+        assert len(children) == 3
+        assert all(span["start_s"] <= c["start_s"] and c["end_s"] <= span["end_s"] for c in children)
+    assert tasks["srs"]["tid"] != tasks["brd"]["tid"]
+
+
+def test_span_records_error_and_reraises(tracer):
+    with pytest.raises(ValueError):
+        with tracer.span("task", "task"):
+            raise ValueError("hết quota")
+    assert tracer.spans[0]["args"] == {"error": "hết quota"}
+
+
+def test_export_writes_jsonl_and_chrome_trace(tracer, tmp_path):
+    barrier = threading.Barrier(2)
+    threads = [threading.Thread(target=_task, args=(tracer, name, barrier), name=f"worker-{name}")
+               for name in ("srs", "brd")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tracer.add_span("queue_wait", "scheduler", tracer.origin + 0.25, tracer.origin + 0.75, task="srs")
+
+    jsonl_path, chrome_path = tracer.export(str(tmp_path))
+    with open(jsonl_path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    with open(chrome_path, encoding="utf-8") as f:
+        trace = json.load(f)
+
+    assert len(lines) == len(tracer.spans) == 9
+    assert [line["start_s"] for line in lines] == sorted(line["start_s"] for line in lines)
+    complete = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    metadata = [e for e in trace["traceEvents"] if e["ph"] == "M"]
+    assert len(complete) == 9 and trace["displayTimeUnit"] == "ms"
+    # ts và dur tính bằng micro giây kể từ lúc bật tracing.
+    wait = next(e for e in complete if e["name"] == "queue_wait")
+    assert wait["ts"] == pytest.approx(250000, abs=1) and wait["dur"] == pytest.approx(500000, abs=1)
+    # Mỗi luồng worker có một tid riêng và một sự kiện thread_name.
+    worker_tids = {e["tid"] for e in complete if e["name"] == "task"}
+    assert len(worker_tids) == 2
+    names = {e["tid"]: e["args"]["name"] for e in metadata if e["name"] == "thread_name"}
+    assert {names[tid] for tid in worker_tids} == {"worker-srs", "worker-brd"}
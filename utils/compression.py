@@ -0,0 +1,193 @@
+# utils/compression.py
+
+import os
+import sys
+import zlib
+import lzma
+import hashlib
+import argparse
+import threading
+from collections import Counter
+
+from memory.mapped_text import DEFAULT_BLOB_DIR
+
+DEFAULT_DICT_SIZE = 32 * 1024  # Cửa sổ của deflate: phần từ điển xa hơn 32 KB không dùng được.
+MIN_COMPRESS_BYTES = 128
+
+# Khung dữ liệu nén: magic (bắt đầu bằng byte NUL nên không trùng với JSON/văn bản UTF-8) + id từ điển + payload.
+ZLIB_MAGIC = b"\x00MZ"
+LZMA_MAGIC = b"\x00MX"
+NO_DICT_ID = b"00000000"
+
+
+def default_dict_dir() -> str:
+    """
+    Thư mục từ điển (tuyệt đối): MAS_COMPRESSION_DICT_DIR, mặc định `zdict/` cạnh kho blob (MAS_BLOB_DIR),
+    vì blob nén chỉ đọc được với từ điển đã nén nó.
+    """
+    dict_dir = os.getenv("MAS_COMPRESSION_DICT_DIR") or os.path.join(
+        os.path.dirname(os.path.abspath(os.getenv("MAS_BLOB_DIR", DEFAULT_BLOB_DIR))), "zdict")
+    return os.path.abspath(dict_dir)
+
+
+def train_dictionary(samples: list[bytes], size: int = DEFAULT_DICT_SIZE) -> bytes:
+    """
+    Dựng từ điển preset cho zlib từ các output cũ: chọn các dòng xuất hiện trong nhiều tài liệu
+    (tiêu đề, dòng kẻ bảng, câu mẫu trong template...) theo điểm `độ dài * số tài liệu chứa dòng`.
+    Dòng có điểm cao nhất được đặt cuối từ điển, gần dữ liệu nhất nên khoảng cách tham chiếu ngắn nhất.
+    """
+    document_frequency = Counter()
+    for sample in samples:
+        document_frequency.update({line for line in sample.splitlines(keepends=True) if len(line.strip()) > 3})
+    scored = sorted(((len(line) * count, line) for line, count in document_frequency.items() if count > 1),
+                    reverse=True)
+    chosen, total = [], 0
+    for _, line in scored:
+        if total + len(line) > size:
+            continue
+        chosen.append(line)
+        total += len(line)
+    if not chosen and samples:
+        # Không có dòng lặp lại giữa các tài liệu: dùng phần cuối của mẫu gần nhất.
+        return samples[-1][-size:]
+    return b"".join(reversed(chosen))
+
+
+class Codec:
+    """
+    Nén/giải nén bytes bằng thư viện chuẩn.
+
+    - "zlib": deflate với từ điển preset (xem `train_dictionary`), nên cả tài liệu nhỏ cũng nén tốt.
+    - "lzma": tỉ lệ nén cao hơn cho tài liệu lớn; module lzma của Python không hỗ trợ từ điển preset.
+    - "off": không nén.
+
+    Dữ liệu nén tự mô tả (magic + id từ điển), nên `decompress` đọc được mọi cấu hình và cả dữ liệu
+    cũ chưa nén. Payload không nhỏ hơn bản gốc thì được giữ nguyên, không nén. Thiếu file từ điển của
+    một payload thì `decompress` ném FileNotFoundError; các cache coi đó là chưa có entry.
+    `dict_dir` được chuyển thành đường dẫn tuyệt đối khi tạo codec, nên không phụ thuộc thư mục hiện hành sau đó.
+    """
+
+    def __init__(self, method: str = "zlib", level: int = None, dictionary: bytes = b"", dict_dir: str = None):
+        if method not in ("off", "zlib", "lzma"):
+            raise ValueError(f"Phương thức nén không hợp lệ: {method}")
+        self.method = method
+        self.level = level if level is not None else (9 if method == "zlib" else 6)
+        self.dictionary = dictionary
+        self.dict_id = hashlib.sha256(dictionary).hexdigest()[:8].encode() if dictionary else NO_DICT_ID
+        self.dict_dir = os.path.abspath(dict_dir or default_dict_dir())
+        self._dictionaries = {self.dict_id: dictionary}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.method != "off"
+
+    def compress(self, data: bytes) -> bytes:
+        if not self.enabled or len(data) < MIN_COMPRESS_BYTES:
+            return data
+        if self.method == "zlib":
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15, zdict=self.dictionary) \
+                if self.dictionary else zlib.compressobj(self.level, zlib.DEFLATED, -15)
+            framed = ZLIB_MAGIC + self.dict_id + compressor.compress(data) + compressor.flush()
+        else:
+            framed = LZMA_MAGIC + NO_DICT_ID + lzma.compress(data, preset=self.level)
+        return framed if len(framed) < len(data) else data
+
+    def _dictionary(self, dict_id: bytes) -> bytes:
+        with self._lock:
+            if dict_id not in self._dictionaries:
+                with open(os.path.join(self.dict_dir, f"{dict_id.decode()}.bin"), "rb") as f:
+                    self._dictionaries[dict_id] = f.read()
+            return self._dictionaries[dict_id]
+
+    def decompress(self, blob: bytes) -> bytes:
+        magic, dict_id, payload = blob[:3], blob[3:11], blob[11:]
+        if magic == ZLIB_MAGIC:
+            decompressor = zlib.decompressobj(-15, zdict=self._dictionary(dict_id)) \
+                if dict_id != NO_DICT_ID else zlib.decompressobj(-15)
+            return decompressor.decompress(payload) + decompressor.flush()
+        if magic == LZMA_MAGIC:
+            return lzma.decompress(payload)
+        return blob
+
+
+def is_compressed(blob: bytes) -> bool:
+    return blob[:3] in (ZLIB_MAGIC, LZMA_MAGIC)
+
+
+def save_dictionary(dictionary: bytes, dict_dir: str = None) -> str:
+    """Lưu từ điển theo id và đặt làm từ điển hiện hành cho các lần nén sau."""
+    dict_dir = dict_dir or default_dict_dir()
+    dict_id = hashlib.sha256(dictionary).hexdigest()[:8]
+    os.makedirs(dict_dir, exist_ok=True)
+    with open(os.path.join(dict_dir, f"{dict_id}.bin"), "wb") as f:
+        f.write(dictionary)
+    with open(os.path.join(dict_dir, "current"), "w", encoding="utf-8") as f:
+        f.write(dict_id)
+    return dict_id
+
+
+def load_current_dictionary(dict_dir: str = None) -> bytes:
+    current = os.path.join(dict_dir or default_dict_dir(), "current")
+    if not os.path.exists(current):
+        return b""
+    with open(current, "r", encoding="utf-8") as f:
+        dict_id = f.read().strip()
+    with open(os.path.join(os.path.dirname(current), f"{dict_id}.bin"), "rb") as f:
+        return f.read()
+
+
+_codec = None
+_codec_lock = threading.Lock()
+
+
+def get_codec() -> Codec:
+    """
+    Codec dùng chung, cấu hình qua MAS_COMPRESSION ("off" mặc định, "zlib", "lzma"),
+    MAS_COMPRESSION_LEVEL và từ điển hiện hành trong `default_dict_dir()`.
+    """
+    global _codec
+    if _codec is None:
+        with _codec_lock:
+            if _codec is None:
+                method = os.getenv("MAS_COMPRESSION", "off")
+                level = os.getenv("MAS_COMPRESSION_LEVEL")
+                dict_dir = default_dict_dir()
+                dictionary = load_current_dictionary(dict_dir) if method == "zlib" else b""
+                _codec = Codec(method, int(level) if level else None, dictionary, dict_dir)
+    return _codec
+
+
+def _iter_samples(paths: list[str]):
+    for root in paths:
+        if os.path.isfile(root):
+            candidates = [root]
+        else:
+            candidates = [os.path.join(d, n) for d, _, names in os.walk(root) for n in names]
+        for path in candidates:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Bỏ qua file nhị phân (docx, xlsx...) và blob đã nén.
+            if data and not is_compressed(data) and b"\x00" not in data[:512]:
+                yield data
+
+
+if __name__ == "__main__":
+    # Huấn luyện từ điển từ output cũ, ví dụ: python -m utils.compression output .cache/blobs
+    parser = argparse.ArgumentParser(description="Huấn luyện từ điển zlib từ các tài liệu đã sinh.")
+    parser.add_argument("paths", nargs="*", default=["output"], help="File hoặc thư mục chứa tài liệu mẫu.")
+    parser.add_argument("--size", type=int, default=DEFAULT_DICT_SIZE, help="Kích thước từ điển (byte).")
+    parser.add_argument("--dict-dir", default=default_dict_dir())
+    args = parser.parse_args()
+
+    samples = list(_iter_samples(args.paths))
+    if not samples:
+        sys.exit("Không tìm thấy tài liệu mẫu.")
+    dictionary = train_dictionary(samples, args.size)
+    dict_id = save_dictionary(dictionary, args.dict_dir)
+    raw = sum(len(s) for s in samples)
+    plain, trained = Codec("zlib"), Codec("zlib", dictionary=dictionary)
+    print(f"Từ điển {dict_id}: {len(dictionary)} byte từ {len(samples)} tài liệu ({raw} byte).")
+    print(f"zlib không từ điển: {sum(len(plain.compress(s)) for s in samples)} byte; "
+          f"có từ điển: {sum(len(trained.compress(s)) for s in samples)} byte.")
+    print(f"Đặt MAS_COMPRESSION=zlib để dùng từ điển {dict_id}.")
@@ -0,0 +1,207 @@
+# utils/doc_validators.py
+
+import io
+import os
+import re
+import csv
+import json
+import hashlib
+import logging
+from collections import Counter
+
+import yaml
+
+from memory.shared_memory import shared_memory
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "gate_rules.yaml")
+
+_FENCE = re.compile(r"```[ \t]*(\w*)[^\n]*\n(.*?)```", re.DOTALL)
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+_TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+# Tăng khi logic kiểm tra thay đổi, để các kết luận đã cache theo logic cũ không còn được dùng lại.
+VALIDATOR_VERSION = 2
+
+
+def _fenced(text: str, languages: tuple) -> str:
+    """Nội dung khối code đầu tiên có ngôn ngữ trong `languages`; không có thì trả về cả văn bản."""
+    for language, body in _FENCE.findall(text):
+        if language.lower() in languages:
+            return body
+    return text
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[\s`*_\"']+", " ", name).strip().lower()
+
+
+def _markdown_tables(text: str) -> list[list[str]]:
+    """Header (danh sách tên cột) của các bảng Markdown trong văn bản."""
+    lines = text.splitlines()
+    return [[cell.strip() for cell in lines[i - 1].strip().strip("|").split("|")]
+            for i in range(1, len(lines)) if _TABLE_SEPARATOR.match(lines[i]) and "|" in lines[i - 1]]
+
+
+def _first_cells(text: str, fmt: str) -> list[str]:
+    """Ô đầu tiên của mỗi dòng dữ liệu trong bảng (CSV hoặc Markdown), nơi đặt mã định danh của dòng."""
+    if fmt == "csv":
+        rows = [row for row in csv.reader(io.StringIO(_fenced(text, ("csv",)).strip())) if row]
+        return [row[0] for row in rows[1:]]
+    lines = text.splitlines()
+    return [line.strip().strip("|").split("|")[0].strip() for i, line in enumerate(lines)
+            if line.lstrip().startswith("|") and not _TABLE_SEPARATOR.match(line)
+            and not (i + 1 < len(lines) and _TABLE_SEPARATOR.match(lines[i + 1]))]
+
+
+def _missing_columns(header: list[str], columns: list[str]) -> list[str]:
+    cells = [_normalize(cell) for cell in header]
+    return [column for column in columns if not any(_normalize(column) in cell for cell in cells)]
+
+
+def _check_csv(text: str, rules: dict) -> tuple[bool, str]:
+    body = _fenced(text, ("csv",)).strip()
+    try:
+        rows = [row for row in csv.reader(io.StringIO(body)) if any(cell.strip() for cell in row)]
+    except csv.Error as e:
+        return False, f"CSV không hợp lệ: {e}"
+    if len(rows) < 2 or len(rows[0]) < 2:
+        return False, "CSV cần header và ít nhất một dòng dữ liệu"
+    ragged = [i + 1 for i, row in enumerate(rows) if len(row) != len(rows[0])]
+    if ragged:
+        return False, f"Số cột không khớp header ở dòng {ragged[:5]}"
+    missing = _missing_columns(rows[0], rules.get("columns", []))
+    if missing:
+        return False, f"Thiếu cột {missing}"
+    return True, f"CSV hợp lệ: {len(rows) - 1} dòng, {len(rows[0])} cột"
+
+
+def _check_yaml(text: str, rules: dict, openapi: bool) -> tuple[bool, str]:
+    try:
+        document = yaml.safe_load(_fenced(text, ("yaml", "yml")))
+    except yaml.YAMLError as e:
+        return False, f"YAML không hợp lệ: {str(e).splitlines()[0]}"
+    if not isinstance(document, dict):
+        return False, "YAML không phải một mapping"
+    if openapi:
+        missing = [field for field in ("openapi", "info", "paths") if field not in document]
+        if missing:
+            return False, f"Đặc tả OpenAPI thiếu {missing}"
+        if not isinstance(document["paths"], dict) or not document["paths"]:
+            return False, "Đặc tả OpenAPI không có endpoint nào trong 'paths'"
+        return True, f"OpenAPI {document['openapi']}: {len(document['paths'])} path"
+    return True, "YAML hợp lệ"
+
+
+def _check_markdown_table(text: str, rules: dict) -> tuple[bool, str]:
+    headers = _markdown_tables(text)
+    if not headers:
+        return False, "Không có bảng Markdown nào"
+    columns = rules.get("columns", [])
+    if columns and all(_missing_columns(header, columns) for header in headers):
+        return False, f"Không bảng nào đủ cột {columns}"
+    return True, f"{len(headers)} bảng Markdown"
+
+
+class DocumentValidator:
+    """
+    Kiểm tra tĩnh tài liệu theo luật khai báo trong config/gate_rules.yaml (MAS_GATE_RULES).
+
+    Mỗi tài liệu nhận một kết luận:
+    - "fail": vi phạm luật cứng (không parse được, thiếu cột bắt buộc, quá ngắn); loại ngay không cần LLM.
+    - "pass": tài liệu có luật cấu trúc riêng (format, headings hoặc id_pattern) và qua tất cả các luật;
+      không cần LLM review.
+    - "borderline": còn lại (chỉ vi phạm luật mềm, hoặc chỉ có luật độ dài); chuyển cho LLM review.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("MAS_GATE_RULES", DEFAULT_RULES_PATH)
+        self.defaults = {}
+        self.documents = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            logging.warning(f"DocumentValidator: không tìm thấy {self.path}, mọi tài liệu sẽ được LLM review.")
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        self.defaults = dict(config.get("defaults") or {})
+        self.documents = dict(config.get("documents") or {})
+
+    def rules_for(self, key: str) -> dict:
+        """Bộ luật áp dụng cho tài liệu `key`: luật mặc định được ghi đè bởi luật riêng của tài liệu."""
+        return {**self.defaults, **self.documents.get(key, {})}
+
+    def rules_digest(self, key: str) -> str:
+        """
+        Hash của mọi thứ quyết định kết luận tĩnh của `key`: phiên bản validator, bộ luật đã gộp
+        và luật riêng của tài liệu (chỉ luật riêng mới cho phép kết luận "pass").
+        """
+        rules = [VALIDATOR_VERSION, self.rules_for(key), self.documents.get(key, {})]
+        return hashlib.sha256(json.dumps(rules, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+    def validate(self, key: str, text) -> dict:
+        """
+        Kiểm tra một tài liệu.
+
+        Returns:
+            dict: {"status": "pass" | "fail" | "borderline",
+                   "checks": [{"name", "passed", "hard", "message"}]}
+        """
+        rules = self.rules_for(key)
+        text = str(text or "")
+        checks = []
+
+        def check(name, hard, result):
+            passed, message = result
+            checks.append({"name": name, "passed": passed, "hard": hard, "message": message})
+
+        length = len(text.strip())
+        min_chars = rules.get("min_chars", 0)
+        check("min_chars", True, (length >= min_chars, f"{length} ký tự (tối thiểu {min_chars})"))
+
+        fmt = rules.get("format")
+        if fmt == "csv":
+            check("format", True, _check_csv(text, rules))
+        elif fmt in ("yaml", "openapi"):
+            check("format", True, _check_yaml(text, rules, openapi=fmt == "openapi"))
+        elif fmt == "markdown_table":
+            check("format", True, _check_markdown_table(text, rules))
+
+        if rules.get("headings"):
+            found = [_normalize(heading) for heading in _HEADING.findall(text)]
+            missing = [h for h in rules["headings"] if not any(_normalize(h) in heading for heading in found)]
+            check("headings", False, (not missing, f"Thiếu tiêu đề {missing}" if missing else "Đủ các tiêu đề bắt buộc"))
+
+        if rules.get("id_pattern"):
+            if fmt in ("csv", "markdown_table"):
+                # Mỗi dòng của bảng mang một mã ở cột đầu; các cột khác có thể nhắc lại mã (ví dụ TC-FR-001).
+                ids = [m.group(0) for m in map(re.compile(rules["id_pattern"]).search, _first_cells(text, fmt)) if m]
+                duplicates = sorted(i for i, count in Counter(ids).items() if count > 1)
+            else:
+                ids, duplicates = re.findall(rules["id_pattern"], text), []
+            if not ids:
+                check("ids", False, (False, f"Không có mã định danh nào khớp {rules['id_pattern']}"))
+            else:
+                check("ids", False, (not duplicates, f"Mã trùng lặp {duplicates[:5]}" if duplicates else f"{len(set(ids))} mã định danh"))
+            min_ids = rules.get("min_ids", 0)
+            if min_ids:
+                check("min_ids", False, (len(set(ids)) >= min_ids, f"{len(set(ids))} mã định danh (tối thiểu {min_ids})"))
+            reference = rules.get("references")
+            source = shared_memory.get(*reference.split("/", 1)) if reference and ids else None
+            if source:
+                dangling = sorted(set(ids) - set(re.findall(rules["id_pattern"], str(source))))
+                check("references", False, (not dangling, f"Mã không có trong {reference}: {dangling[:5]}" if dangling
+                                            else f"Mọi mã đều có trong {reference}"))
+
+        if any(c["hard"] and not c["passed"] for c in checks):
+            status = "fail"
+        elif (any(rule in self.documents.get(key, {}) for rule in ("format", "headings", "id_pattern"))
+              and all(c["passed"] for c in checks)):
+            status = "pass"
+        else:
+            status = "borderline"
+        return {"status": status, "checks": checks}
+
+
+# Khởi tạo instance duy nhất
+document_validator = DocumentValidator()
@@ -0,0 +1,135 @@
+# utils/fake_llm.py
+
+import os
+import re
+import time
+import random
+import hashlib
+import threading
+
+from utils.llm_gateway import RateLimitError, TransientLLMError, estimate_tokens
+
+# Dấu hiệu CrewAI chèn vào prompt trước expected_output của task.
+EXPECTED_OUTPUT_MARKER = "This is the expect criteria for your final answer:"
+
+_WORDS = (
+    "hệ thống", "người dùng", "yêu cầu", "chức năng", "dữ liệu", "quy trình", "kiểm thử", "triển khai",
+    "bảo trì", "rủi ro", "phạm vi", "tài liệu", "thiết kế", "kiến trúc", "module", "giao diện", "bảo mật",
+    "hiệu năng", "tiến độ", "ngân sách", "stakeholder", "review", "phê duyệt", "tích hợp", "API",
+    "database", "sprint", "backlog", "release", "monitoring",
+)
+
+
+def parse_latency(spec: str):
+    """
+    Đọc cấu hình độ trễ (MAS_FAKE_LLM_LATENCY) và trả về hàm sinh độ trễ (giây) từ một `random.Random`.
+
+    Hỗ trợ: "fixed:<s>", "uniform:<min>,<max>", "normal:<mean>,<std>", "lognormal:<mu>,<sigma>".
+    Chuỗi rỗng hoặc "0" nghĩa là không có độ trễ.
+    """
+    if not spec or spec == "0":
+        return lambda rng: 0.0
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"MAS_FAKE_LLM_LATENCY không hợp lệ: {spec}")
+
+
+def extract_expected_output(prompt: str) -> str:
+    """Lấy đoạn expected_output của task từ prompt CrewAI (chuỗi rỗng nếu không tìm thấy)."""
+    _, found, rest = prompt.partition(EXPECTED_OUTPUT_MARKER)
+    if not found:
+        return ""
+    return rest.split("\n\n", 1)[0].strip()
+
+
+def target_tokens(expected_output: str) -> int:
+    """
+    Ước lượng độ dài tài liệu cần sinh từ expected_output: mô tả càng dài, càng nhiều mục
+    thì tài liệu càng dài. Giới hạn trong khoảng [200, 4000] token.
+    """
+    items = len(re.findall(r"[,;]|\band\b|\bvà\b", expected_output))
+    return max(200, min(4000, 200 + estimate_tokens(expected_output) * 8 + items * 80))
+
+
+def synthesize_document(rng: random.Random, title: str, tokens: int) -> str:
+    """Sinh một tài liệu Markdown (tiêu đề, đoạn văn, bảng) dài khoảng `tokens` token."""
+    def sentence():
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 12))]
+        return " ".join(words).capitalize() + "."
+
+    lines = [f"# {title or 'Tài liệu'}", ""]
+    section = 0
+    while estimate_tokens("\n".join(lines)) < tokens:
+        section += 1
+        lines += [f"## {section}. {sentence()[:-1]}", ""]
+        lines += [" ".join(sentence() for _ in range(rng.randint(3, 6))), ""]
+        if section % 3 == 0:
+            lines += ["| ID | Hạng mục | Trạng thái |", "|----|----------|------------|"]
+            lines += [f"| {section}.{i} | {rng.choice(_WORDS)} | {rng.choice(['Mở', 'Đang xử lý', 'Đóng'])} |"
+                      for i in range(1, rng.randint(3, 6))]
+            lines.append("")
+    return "\n".join(lines)
+
+
+class FakeLLMBackend:
+    """
+    Backend LLM offline, tất định, dùng để benchmark và kiểm thử tầng điều phối mà không gọi Gemini.
+
+    - Cùng prompt và seed (MAS_FAKE_LLM_SEED) luôn cho cùng tài liệu, và cùng độ trễ, lỗi tiêm ở lần gửi thứ n
+      của prompt đó, bất kể thứ tự các luồng; độ dài theo expected_output của task.
+    - Độ trễ mỗi request theo phân phối MAS_FAKE_LLM_LATENCY (xem `parse_latency`).
+    - Tiêm lỗi: MAS_FAKE_LLM_ERROR_RATE (429) và MAS_FAKE_LLM_TRANSIENT_RATE (5xx/mạng), xác suất trong [0, 1].
+    - Câu trả lời theo định dạng "Final Answer:" để agent CrewAI kết thúc ngay sau một lượt.
+    """
+
+    name = "fake"
+
+    def __init__(self, seed: int = None, latency: str = None, error_rate: float = None,
+                 transient_rate: float = None):
+        self.seed = seed if seed is not None else int(os.getenv("MAS_FAKE_LLM_SEED", 0))
+        self.latency = parse_latency(latency if latency is not None else os.getenv("MAS_FAKE_LLM_LATENCY", ""))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("MAS_FAKE_LLM_ERROR_RATE", 0))
+        self.transient_rate = (transient_rate if transient_rate is not None
+                               else float(os.getenv("MAS_FAKE_LLM_TRANSIENT_RATE", 0)))
+        self.calls = 0
+        self._attempts = {}  # digest của prompt -> số lần prompt đó đã được gửi
+        self._lock = threading.Lock()
+
+    def complete(self, model: str, messages: list[dict], stop: list[str] = None, temperature: float = None,
+                 max_tokens: int = None, timeout: float = 120) -> dict:
+        prompt = "\n".join(m["content"] for m in messages)
+        digest = hashlib.sha256(f"{self.seed}\0{model}\0{prompt}".encode("utf-8")).digest()
+        with self._lock:
+            self.calls += 1
+            attempt = self._attempts[digest] = self._attempts.get(digest, 0) + 1
+        # Nội dung chỉ phụ thuộc prompt; độ trễ và lỗi tiêm thêm phụ thuộc cả số lần gửi lại chính prompt đó
+        # để một request bị lỗi có thể thành công khi gửi lại, mà không phụ thuộc thứ tự các luồng gọi.
+        content_rng = random.Random(digest)
+        event_rng = random.Random(digest + attempt.to_bytes(8, "big"))
+
+        time.sleep(min(self.latency(event_rng), timeout))
+        roll = event_rng.random()
+        if roll < self.error_rate:
+            raise RateLimitError("FakeLLMBackend: lỗi 429 được tiêm.", retry_after=0.0)
+        if roll < self.error_rate + self.transient_rate:
+            raise TransientLLMError("FakeLLMBackend: lỗi 503 được tiêm.", retry_after=0.0)
+
+        expected_output = extract_expected_output(prompt)
+        tokens = target_tokens(expected_output)
+        if max_tokens:
+            tokens = min(tokens, max_tokens)
+        title = expected_output.split(".")[0][:80] if expected_output else ""
+        text = f"Thought: I now can give a great answer\nFinal Answer: {synthesize_document(content_rng, title, tokens)}"
+        return {
+            "text": text,
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(text),
+        }
@@ -1,12 +1,48 @@
 # utils/file_writer.py
 
 import os
+import threading
+from contextlib import contextmanager
+
+from utils.tracing import tracer
+from memory.artifact_store import artifact_store
+
+_local = threading.local()
 
 def write_output(file_path: str, content: str):
-    """Ghi nội dung vào một file, tạo thư mục nếu chưa tồn tại."""
-    directory = os.path.dirname(file_path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory)
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(content)
-    print(f"Đã ghi output vào: {file_path}")
\ No newline at end of file
+    """
+    Ghi nội dung vào một file, tạo thư mục nếu chưa tồn tại.
+
+    File được ghi ra file tạm rồi thay thế nguyên tử, nên không bao giờ có file ghi dở. File ở chế độ
+    nhị phân (không đổi "\n" thành "\r\n" trên Windows) để đúng từng byte với nội dung UTF-8 mà
+    kho artifact băm theo. File trong output/ không bao giờ dùng chung inode với blob trong kho:
+    người dùng sửa file không làm hỏng cache hay lịch sử các lần chạy.
+    """
+    with tracer.span("write_output", "io", path=file_path):
+        directory = os.path.dirname(file_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content.encode("utf-8"))
+        os.replace(tmp_path, file_path)
+        if tracer.enabled:
+            tracer.accumulate(bytes_written=os.path.getsize(file_path))
+    files = getattr(_local, "files", None)
+    if files is not None:
+        files[file_path] = artifact_store.put(content)
+    print(f"Đã ghi output vào: {file_path}")
+
+@contextmanager
+def track_output_files():
+    """
+    Ghi lại các file được `write_output` ghi trong luồng hiện tại, dạng đường dẫn -> hash nội dung
+    trong `artifact_store` (nội dung được lưu vào kho ngay khi ghi, không giữ trong RAM).
+    """
+    previous = getattr(_local, "files", None)
+    files = {}
+    _local.files = files
+    try:
+        yield files
+    finally:
+        _local.files = previous
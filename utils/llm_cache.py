@@ -0,0 +1,158 @@
+# utils/llm_cache.py
+
+import os
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import logging
+import threading
+
+from utils.compression import get_codec, is_compressed
+
+DEFAULT_LLM_CACHE_PATH = os.path.join(".cache", "llm_responses.sqlite")
+# Tổng dung lượng được giữ trong tiến trình; cứ ngần này lần ghi thì đồng bộ lại bằng SUM(size),
+# vì các tiến trình khác cũng ghi vào cùng file.
+RESYNC_EVERY = 256
+# Số lần truy cập được gom trong tiến trình trước khi ghi `last_access` xuống file.
+TOUCH_BATCH = 64
+
+
+def make_cache_key(model: str, messages: list[dict], **params) -> str:
+    """Khóa cache: hash của model, toàn bộ prompt (mọi message) và các tham số sampling."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Cache response LLM lưu trong một file SQLite, dùng chung giữa các lần chạy và tiến trình.
+
+    - Giới hạn dung lượng `max_bytes`; khi vượt, xóa các entry ít được dùng gần đây nhất (LRU).
+    - Mỗi entry có TTL riêng (`ttl_seconds`); entry hết hạn bị coi như miss và bị xóa.
+    - Với MAS_COMPRESSION, response được nén thành BLOB; `size` (dùng cho giới hạn dung lượng)
+      là kích thước sau nén.
+    - Tổng `size` được cộng dồn khi ghi/xóa thay vì quét cả bảng ở mỗi lần `put`; chỉ tính lại bằng
+      SUM(size) khi mở cache, mỗi RESYNC_EVERY lần ghi và trước khi xóa theo LRU.
+    - Cache hit chỉ đọc: thời điểm truy cập được gom trong tiến trình và ghi trong transaction của `put`
+      kế tiếp, khi đủ TOUCH_BATCH lần truy cập, hoặc khi thoát tiến trình (`flush`). Trước khi xóa theo LRU,
+      các thời điểm đang chờ được ghi trước để thứ tự LRU đúng.
+    """
+
+    def __init__(self, path: str = DEFAULT_LLM_CACHE_PATH, max_bytes: int = None, ttl_seconds: int = None):
+        self.path = path
+        self.max_bytes = max_bytes or int(os.getenv("MAS_LLM_CACHE_MAX_MB", 512)) * 1024 * 1024
+        self.ttl_seconds = ttl_seconds or int(os.getenv("MAS_LLM_CACHE_TTL", 30 * 24 * 3600))
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._touched = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_lru ON responses(last_access)")
+        self._conn.commit()
+        self._total = self._sum_sizes()
+        atexit.register(self.flush)
+
+    def _sum_sizes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, size, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, size, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._touched.pop(key, None)
+                self._total -= size
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= TOUCH_BATCH:
+                self._write_touched()
+                self._conn.commit()
+        if isinstance(value, bytes):
+            try:
+                value = get_codec().decompress(value).decode("utf-8")
+            except FileNotFoundError as e:
+                # Từ điển đã nén entry không còn (ví dụ thư mục từ điển khác): coi như chưa cache.
+                logging.warning(f"LLMResponseCache: không giải nén được entry {key[:12]}: {e}")
+                return None
+        return json.loads(value)
+
+    def put(self, key: str, response: dict, ttl_seconds: int = None):
+        now = time.time()
+        value = json.dumps(response, ensure_ascii=False)
+        compressed = get_codec().compress(value.encode("utf-8"))
+        if is_compressed(compressed):
+            value = compressed
+        expires_at = now + (ttl_seconds or self.ttl_seconds)
+        size = len(value) if isinstance(value, bytes) else len(value.encode("utf-8"))
+        with self._lock:
+            self._touched.pop(key, None)
+            self._write_touched()
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, size, now, expires_at, now),
+            )
+            self._puts += 1
+            if self._puts % RESYNC_EVERY == 0:
+                self._total = self._sum_sizes()
+            else:
+                self._total += size - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict(now)
+            self._conn.commit()
+
+    def _write_touched(self):
+        """Ghi các thời điểm truy cập đang chờ vào transaction hiện tại (người gọi giữ khóa và commit)."""
+        if self._touched:
+            touched, self._touched = self._touched, {}
+            self._conn.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                   [(at, key) for key, at in touched.items()])
+
+    def flush(self):
+        """Ghi các thời điểm truy cập đang chờ xuống file."""
+        with self._lock:
+            if self._touched:
+                self._write_touched()
+                self._conn.commit()
+
+    def _evict(self, now: float):
+        """Xóa entry hết hạn, rồi xóa theo LRU cho đến khi tổng dung lượng về dưới giới hạn."""
+        self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+        total = self._total = self._sum_sizes()
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._total = total
+        logging.info(f"LLMResponseCache: đã xóa {evicted} entry theo LRU.")
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total = 0
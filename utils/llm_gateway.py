@@ -0,0 +1,373 @@
+# utils/llm_gateway.py
+
+import os
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from utils.llm_cache import LLMResponseCache, make_cache_key, DEFAULT_LLM_CACHE_PATH
+from utils.tracing import tracer
+from utils.prompt_budget import count_tokens
+
+DEFAULT_MODEL = "gemini/gemini-1.5-flash-latest"
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+
+
+class TransientLLMError(Exception):
+    """Lỗi tạm thời của provider (mạng, timeout, 5xx); request có thể được gửi lại."""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitError(TransientLLMError):
+    """Provider trả về 429 (hết quota RPM/TPM)."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số token (xem `utils.prompt_budget.count_tokens`) để trừ quota trước khi gửi request."""
+    return max(1, count_tokens(text))
+
+
+class TokenBucket:
+    """
+    Token bucket nạp lại liên tục theo `capacity` đơn vị mỗi phút.
+
+    `acquire` chặn cho đến khi đủ token; `consume` trừ ngay (có thể âm) để bù phần chênh lệch
+    giữa số token ước lượng và số token thực tế provider báo về; `refund` trả lại token đã giữ cho
+    một request không được provider xử lý (429, 5xx).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def acquire(self, amount: int = 1):
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait_s = (amount - self.tokens) * 60.0 / self.capacity
+            time.sleep(wait_s)
+
+    def consume(self, amount: int):
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+    def refund(self, amount: int):
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+
+class AdaptiveConcurrency:
+    """
+    Giới hạn số request đồng thời theo kiểu AIMD: giảm một nửa khi gặp 429,
+    tăng thêm 1 sau mỗi `increase_every` request thành công liên tiếp.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, increase_every: int = 10):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self.increase_every = increase_every
+        self.active = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.increase_every and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def on_rate_limited(self):
+        with self._cond:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._successes = 0
+            logging.warning(f"LLMGateway: bị giới hạn tốc độ, giảm concurrency xuống {self.limit}.")
+
+
+class GeminiBackend:
+    """Backend gọi Gemini generateContent qua một `requests.Session` keep-alive có connection pool."""
+
+    name = "gemini"
+
+    def __init__(self, pool_maxsize: int):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+
+    def complete(self, model: str, messages: list[dict], stop: list[str] = None, temperature: float = None,
+                 max_tokens: int = None, timeout: float = 120) -> dict:
+        provider, _, model_name = model.partition("/")
+        if provider != "gemini" or not model_name:
+            raise ValueError(f"GeminiBackend không hỗ trợ model: {model}")
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise RuntimeError("Biến môi trường GEMINI_API_KEY chưa được thiết lập.")
+
+        payload = {"contents": [], "generationConfig": {}}
+        for message in messages:
+            if message["role"] == "system":
+                payload["systemInstruction"] = {"parts": [{"text": message["content"]}]}
+            else:
+                role = "model" if message["role"] == "assistant" else "user"
+                payload["contents"].append({"role": role, "parts": [{"text": message["content"]}]})
+        if stop:
+            payload["generationConfig"]["stopSequences"] = stop[:5]
+        if temperature is not None:
+            payload["generationConfig"]["temperature"] = temperature
+        if max_tokens is not None:
+            payload["generationConfig"]["maxOutputTokens"] = max_tokens
+
+        try:
+            response = self.session.post(
+                GEMINI_API_URL.format(model=model_name),
+                params={"key": api_key},
+                json=payload,
+                timeout=timeout,
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise TransientLLMError(str(e)) from e
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            raise RateLimitError(response.text[:200], float(retry_after) if retry_after else None)
+        if response.status_code >= 500:
+            raise TransientLLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+        response.raise_for_status()
+
+        data = response.json()
+        usage = data.get("usageMetadata", {})
+        candidates = data.get("candidates") or [{}]
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return {
+            "text": "".join(part.get("text", "") for part in parts),
+            "prompt_tokens": usage.get("promptTokenCount", 0),
+            "completion_tokens": usage.get("candidatesTokenCount", 0),
+        }
+
+
+def _create_backend(name: str, max_concurrency: int):
+    """Chọn backend theo tên (MAS_LLM_BACKEND): "gemini" (mặc định) hoặc "fake" (offline, tất định)."""
+    if name == "gemini":
+        return GeminiBackend(pool_maxsize=max_concurrency)
+    if name == "fake":
+        from utils.fake_llm import FakeLLMBackend
+        return FakeLLMBackend()
+    raise ValueError(f"MAS_LLM_BACKEND không hợp lệ: {name}")
+
+
+class LLMGateway:
+    """
+    Cổng gọi LLM dùng chung cho mọi agent.
+
+    - Backend chọn bằng MAS_LLM_BACKEND; Gemini dùng một session keep-alive có connection pool.
+    - Token bucket cho requests/phút (MAS_LLM_RPM) và tokens/phút (MAS_LLM_TPM).
+    - Concurrency thích ứng (MAS_LLM_MAX_CONCURRENCY) lùi lại khi provider trả 429.
+    - Retry có backoff cho lỗi tạm thời (429/5xx/mạng), tôn trọng header Retry-After.
+    - Cache response trên đĩa (MAS_LLM_CACHE, MAS_LLM_CACHE_PATH): prompt trùng lặp không gọi provider.
+
+    Giới hạn: token bucket và concurrency chỉ có hiệu lực trong một tiến trình. Nhiều tiến trình dùng chung
+    một quota (batch.py) phải chia các giới hạn trên cho nhau (`batch.llm_limits_per_process`).
+    """
+
+    def __init__(self, rpm: int = None, tpm: int = None, max_concurrency: int = None, max_retries: int = None,
+                 backend=None):
+        rpm = rpm or int(os.getenv("MAS_LLM_RPM", 15))
+        tpm = tpm or int(os.getenv("MAS_LLM_TPM", 1_000_000))
+        max_concurrency = max_concurrency or int(os.getenv("MAS_LLM_MAX_CONCURRENCY", 8))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("MAS_LLM_MAX_RETRIES", 5))
+        self.request_bucket = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.backend = backend or _create_backend(os.getenv("MAS_LLM_BACKEND", "gemini"), max_concurrency)
+
+        self.cache = None
+        if os.getenv("MAS_LLM_CACHE", "1") == "1":
+            self.cache = LLMResponseCache(os.getenv("MAS_LLM_CACHE_PATH", DEFAULT_LLM_CACHE_PATH))
+
+    _local = threading.local()
+
+    @contextmanager
+    def track_usage(self):
+        """
+        Cộng dồn số request/token mà luồng hiện tại dùng trong khối `with` (để đo theo từng task).
+        `billed_tokens` chỉ tính các response lấy từ provider, không tính response lấy từ cache.
+        Các khối lồng nhau đều được cộng (ví dụ benchmark đo quanh task mà scheduler cũng đo).
+        """
+        usage = {"requests": 0, "cached": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                 "billed_tokens": 0}
+        stack = getattr(self._local, "usages", None)
+        if stack is None:
+            stack = self._local.usages = []
+        stack.append(usage)
+        try:
+            yield usage
+        finally:
+            stack.remove(usage)
+
+    def _record_usage(self, result: dict):
+        tracer.accumulate(
+            llm_requests=1, cached=int(result["cached"]), retries=result["retries"],
+            prompt_tokens=result["prompt_tokens"], completion_tokens=result["completion_tokens"],
+        )
+        for usage in getattr(self._local, "usages", None) or []:
+            usage["requests"] += 1
+            usage["cached"] += int(result["cached"])
+            usage["retries"] += result["retries"]
+            usage["prompt_tokens"] += result["prompt_tokens"]
+            usage["completion_tokens"] += result["completion_tokens"]
+            if not result["cached"]:
+                usage["billed_tokens"] += result["prompt_tokens"] + result["completion_tokens"]
+
+    def generate(self, model: str, messages: list[dict], stop: list[str] = None, temperature: float = None,
+                 max_tokens: int = None, timeout: float = 120) -> dict:
+        """
+        Gửi một lượt hội thoại tới provider.
+
+        Args:
+            model (str): Tên model dạng "<provider>/<model>", ví dụ "gemini/gemini-1.5-flash-latest".
+            messages (list[dict]): Các message {"role": "system"|"user"|"assistant", "content": str}.
+
+        Returns:
+            dict: {"text", "prompt_tokens", "completion_tokens", "retries", "cached"}.
+        """
+        with tracer.span("llm", "llm", model=model, backend=self.backend.name):
+            return self._generate(model, messages, stop, temperature, max_tokens, timeout)
+
+    def _generate(self, model, messages, stop, temperature, max_tokens, timeout) -> dict:
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_cache_key(
+                model, messages, backend=self.backend.name, stop=stop, temperature=temperature, max_tokens=max_tokens,
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                result = {**cached, "retries": 0, "cached": True}
+                self._record_usage(result)
+                return result
+
+        estimated = estimate_tokens("".join(m["content"] for m in messages)) + (max_tokens or 0)
+        for attempt in range(self.max_retries + 1):
+            self.request_bucket.acquire(1)
+            self.token_bucket.acquire(estimated)
+            try:
+                with self.concurrency:
+                    response = self.backend.complete(
+                        model, messages, stop=stop, temperature=temperature,
+                        max_tokens=max_tokens, timeout=timeout,
+                    )
+            except TransientLLMError as e:
+                # Request bị từ chối không tốn quota TPM: trả lại phần đã giữ trước khi thử lại.
+                self.token_bucket.refund(estimated)
+                if isinstance(e, RateLimitError):
+                    self.concurrency.on_rate_limited()
+                if attempt == self.max_retries:
+                    raise
+                delay = e.retry_after if e.retry_after is not None else min(60.0, 2 ** attempt) + random.uniform(0, 1)
+                logging.warning(f"LLMGateway: lỗi tạm thời ({e.__class__.__name__}), thử lại sau {delay:.1f}s.")
+                time.sleep(delay)
+                continue
+
+            self.concurrency.on_success()
+            # Bù phần chênh lệch giữa ước lượng và thực tế để TPM phản ánh đúng lượng đã dùng.
+            self.token_bucket.consume(response["prompt_tokens"] + response["completion_tokens"] - estimated)
+            if self.cache is not None:
+                self.cache.put(cache_key, response)
+            result = {**response, "retries": attempt, "cached": False}
+            self._record_usage(result)
+            return result
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Trả về LLMGateway dùng chung của tiến trình (khởi tạo lười)."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+class GatewayChatModel(BaseChatModel):
+    """
+    Chat model LangChain mà CrewAI dùng làm `llm` của agent; mọi lời gọi đi qua LLMGateway.
+    Nếu `model` vẫn lỗi sau khi gateway đã retry, các model trong `fallbacks` được thử lần lượt.
+    """
+
+    model: str = DEFAULT_MODEL
+    temperature: float | None = None
+    max_tokens: int | None = None
+    timeout: float = 120
+    fallbacks: list[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "mas-gateway"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        role_of = {"human": "user", "ai": "assistant", "system": "system"}
+        converted = [
+            {"role": "system" if isinstance(m, SystemMessage) else role_of.get(m.type, "user"), "content": str(m.content)}
+            for m in messages
+        ]
+        models = [self.model] + [m for m in self.fallbacks if m != self.model]
+        for i, model in enumerate(models):
+            try:
+                result = get_gateway().generate(
+                    model, converted, stop=stop, temperature=self.temperature,
+                    max_tokens=self.max_tokens, timeout=self.timeout,
+                )
+                break
+            except Exception as e:
+                if i == len(models) - 1:
+                    raise
+                logging.warning(f"LLM '{model}' lỗi ({e}); chuyển sang model dự phòng '{models[i + 1]}'.")
+        usage = {"prompt_tokens": result["prompt_tokens"], "completion_tokens": result["completion_tokens"]}
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=result["text"]))],
+            llm_output={"token_usage": usage, "model_name": model},
+        )
+
+
+def get_llm(model: str = DEFAULT_MODEL, **params) -> GatewayChatModel:
+    """Tạo LLM cho agent; mọi agent dùng chung session, rate limiter và concurrency của gateway."""
+    return GatewayChatModel(model=model, **params)
@@ -0,0 +1,103 @@
+# utils/model_router.py
+
+import os
+import re
+import logging
+import threading
+
+import yaml
+
+from utils.llm_gateway import get_llm
+
+DEFAULT_ROUTING_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "model_routing.yaml")
+
+
+class ModelRouter:
+    """
+    Chọn tier model cho từng task theo config/model_routing.yaml (MAS_MODEL_ROUTING).
+
+    Mỗi tier có model, max_tokens, temperature, timeout và tier dự phòng; LLM của một tier gồm cả chuỗi
+    model dự phòng (`GatewayChatModel.fallbacks`). Không có file cấu hình thì không định tuyến:
+    task chạy với LLM của agent như trước.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("MAS_MODEL_ROUTING", DEFAULT_ROUTING_PATH)
+        self.tiers = {}
+        self.routes = []
+        self.default_tier = None
+        self._llms = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Nạp (lại) chính sách; route được biên dịch regex một lần."""
+        self._llms = {}
+        if not os.path.exists(self.path):
+            logging.info(f"ModelRouter: không tìm thấy {self.path}, mọi task dùng LLM của agent.")
+            self.tiers, self.routes, self.default_tier = {}, [], None
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        self.tiers = dict(config.get("tiers") or {})
+        self.default_tier = config.get("default_tier")
+        self.routes = []
+        for route in config.get("routes") or []:
+            if route.get("tier") not in self.tiers:
+                raise ValueError(f"ModelRouter: route dùng tier không khai báo: {route.get('tier')}")
+            self.routes.append({
+                "tier": route["tier"],
+                "expected_output": [re.compile(p, re.IGNORECASE) for p in route.get("expected_output", [])],
+                "description": [re.compile(p, re.IGNORECASE) for p in route.get("description", [])],
+                "roles": set(route.get("roles", [])),
+                "task_types": set(route.get("task_types", [])),
+            })
+
+    @staticmethod
+    def _matches(route: dict, task) -> bool:
+        if route["expected_output"] and not any(p.search(str(task.expected_output)) for p in route["expected_output"]):
+            return False
+        if route["description"] and not any(p.search(str(task.description)) for p in route["description"]):
+            return False
+        if route["roles"] and getattr(task.agent, "role", None) not in route["roles"]:
+            return False
+        if route["task_types"] and type(task).__name__ not in route["task_types"]:
+            return False
+        return True
+
+    def tier_for(self, task) -> str | None:
+        """Tier của task: route đầu tiên khớp, hoặc `default_tier`."""
+        for route in self.routes:
+            if self._matches(route, task):
+                return route["tier"]
+        return self.default_tier
+
+    def fallback_chain(self, tier: str) -> list[str]:
+        """Các model dự phòng của tier theo thứ tự, bỏ model trùng và dừng nếu gặp vòng lặp."""
+        chain, seen = [], {tier}
+        tier = self.tiers[tier].get("fallback")
+        while tier and tier not in seen and tier in self.tiers:
+            seen.add(tier)
+            model = self.tiers[tier]["model"]
+            if model not in chain:
+                chain.append(model)
+            tier = self.tiers[tier].get("fallback")
+        return chain
+
+    def llm_for(self, task):
+        """LLM (dùng chung theo tier) cho task, hoặc None nếu không định tuyến được (giữ LLM của agent)."""
+        tier = self.tier_for(task)
+        if tier is None:
+            return None
+        with self._lock:
+            if tier not in self._llms:
+                config = self.tiers[tier]
+                fallbacks = [m for m in self.fallback_chain(tier) if m != config["model"]]
+                self._llms[tier] = get_llm(config["model"], temperature=config.get("temperature"),
+                                           max_tokens=config.get("max_tokens"), timeout=config.get("timeout", 120),
+                                           fallbacks=fallbacks)
+            return self._llms[tier]
+
+
+# Khởi tạo instance duy nhất
+model_router = ModelRouter()
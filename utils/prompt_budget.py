@@ -0,0 +1,179 @@
+# utils/prompt_budget.py
+
+import os
+import re
+import time
+import logging
+import threading
+
+from utils.tracing import tracer
+
+_PIECE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE_END = re.compile(r"(?<=[.!?…:;])\s+|\n+")
+DROPPED = "(lược bỏ do giới hạn độ dài prompt)"
+
+
+def count_tokens(text: str) -> int:
+    """
+    Ước lượng số token không cần tokenizer của provider: mỗi từ tốn khoảng một token cho mỗi 4 byte
+    UTF-8 (âm tiết tiếng Việt có dấu như 'được' thành 2 token, từ tiếng Anh ngắn thành 1),
+    mỗi dấu câu một token, khoảng trắng không tính.
+    """
+    return sum((len(piece.encode("utf-8")) + 3) // 4 for piece in _PIECE.findall(str(text)))
+
+
+def _sentences(text: str) -> list[str]:
+    return [s for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def _take(pieces: list[str], max_tokens: int) -> tuple[list[str], bool]:
+    """Các phần tử đầu của `pieces` vừa `max_tokens`; bool cho biết có bỏ bớt phần tử nào không."""
+    kept, used = [], 0
+    for piece in pieces:
+        cost = count_tokens(piece)
+        if used + cost > max_tokens:
+            return kept, True
+        kept.append(piece)
+        used += cost
+    return kept, False
+
+
+def _units(block: str) -> list[tuple[str, str]]:
+    """
+    Tách một đoạn/mục thành các đơn vị (dấu nối với đơn vị trước, nội dung) theo thứ tự: tiêu đề và
+    mỗi dòng bảng là một đơn vị, văn bản còn lại là từng câu.
+    """
+    lines = block.splitlines()
+    if lines[0].lstrip().startswith("|"):
+        return [("\n", line) for line in lines]
+    units = []
+    if lines[0].lstrip().startswith("#"):
+        units.append(("\n", lines[0]))
+        lines = lines[1:]
+    return units + [("\n" if i == 0 else " ", sentence.strip()) for i, sentence in enumerate(_sentences("\n".join(lines)))]
+
+
+def condense(text: str, max_tokens: int) -> tuple[str, str]:
+    """
+    Rút gọn `text` về tối đa `max_tokens` token mà không cắt giữa câu.
+
+    Nếu cả văn bản không vừa, giữ dàn ý (tiêu đề Markdown và câu đầu của mỗi đoạn/mục) rồi dùng phần
+    ngân sách còn lại cho các câu tiếp theo của từng mục, theo thứ tự trong tài liệu; mục bị cắt kết thúc
+    bằng "…". Nếu dàn ý cũng không vừa thì giữ các câu đầu tiên.
+
+    Returns:
+        (văn bản, cách xử lý): "full", "summarized" hoặc "trimmed".
+    """
+    text = str(text).strip()
+    if count_tokens(text) <= max_tokens:
+        return text, "full"
+    blocks = [_units(block.strip()) for block in re.split(r"\n\s*\n|\n(?=\s*(?:#|[-*+] |\d+\. ))|(?<!\|)\n(?=\s*\|)", text)
+              if block.strip()]
+    blocks = [units for units in blocks if units]
+    kept = [1] * len(blocks)
+    # Mỗi mục chưa giữ hết tốn thêm một token cho dấu "…".
+    used = sum(count_tokens(units[0][1]) + (len(units) > 1) for units in blocks)
+    if blocks and used <= max_tokens:
+        # Lấp phần ngân sách còn lại theo từng vòng: mỗi vòng thêm câu kế tiếp của mọi mục, theo thứ tự
+        # trong tài liệu; mục có câu kế tiếp không còn vừa thì dừng để các câu giữ lại luôn liền nhau.
+        growing = [b for b, units in enumerate(blocks) if len(units) > 1]
+        while growing:
+            for b in list(growing):
+                units = blocks[b]
+                cost = count_tokens(units[kept[b]][1]) - (kept[b] + 1 == len(units))
+                if used + cost > max_tokens:
+                    growing.remove(b)
+                    continue
+                kept[b] += 1
+                used += cost
+                if kept[b] == len(units):
+                    growing.remove(b)
+        parts = ["".join(sep + unit for sep, unit in units[:kept[b]]).lstrip("\n") + (" …" if kept[b] < len(units) else "")
+                 for b, units in enumerate(blocks)]
+        return "\n".join(parts), "summarized"
+    kept, _ = _take(_sentences(text), max_tokens - 1)
+    if not kept:
+        # Câu đầu tiên đã dài hơn ngân sách (ví dụ bảng hoặc đoạn không có dấu câu): cắt theo từ.
+        kept, _ = _take(text.split(" "), max_tokens - 1)
+    return (" ".join(kept) + " …") if kept else "", "trimmed"
+
+
+def _allocate(needs: list[int], priorities: list[float], budget: int) -> list[int]:
+    """Chia `budget` theo trọng số ưu tiên; phần dư của mục cần ít hơn phần được chia chuyển cho các mục khác."""
+    allocation = [0] * len(needs)
+    open_items = [i for i, need in enumerate(needs) if need > 0]
+    remaining = budget
+    while open_items:
+        weight = sum(priorities[i] for i in open_items)
+        satisfied = [i for i in open_items if needs[i] <= remaining * priorities[i] / weight]
+        if not satisfied:
+            for i in open_items:
+                allocation[i] = int(remaining * priorities[i] / weight)
+            break
+        for i in satisfied:
+            allocation[i] = needs[i]
+            remaining -= needs[i]
+            open_items.remove(i)
+    return allocation
+
+
+_reports = {}
+_reports_lock = threading.Lock()
+
+
+def fit_sections(task_name: str, budget_tokens: int, sections: list[tuple], min_tokens: int = None) -> list[str]:
+    """
+    Gói các phần ngữ cảnh của một prompt vào `budget_tokens` token.
+
+    Args:
+        task_name (str): Tên task, dùng trong báo cáo mức sử dụng ngân sách.
+        budget_tokens (int): Ngân sách token cho toàn bộ các phần; nhân với MAS_PROMPT_BUDGET_SCALE.
+        sections (list): Các bộ (tên, văn bản, độ ưu tiên). Phần vừa ngân sách được giữ nguyên,
+            phần dài được rút gọn theo dàn ý hoặc cắt ở ranh giới câu, phần được chia dưới
+            `min_tokens` (MAS_PROMPT_MIN_SECTION_TOKENS) bị lược bỏ và phần ngân sách được chia lại.
+
+    Returns:
+        list[str]: Văn bản của từng phần, theo đúng thứ tự `sections`.
+    """
+    budget_tokens = int(budget_tokens * float(os.getenv("MAS_PROMPT_BUDGET_SCALE", 1.0)))
+    min_tokens = min_tokens if min_tokens is not None else int(os.getenv("MAS_PROMPT_MIN_SECTION_TOKENS", 24))
+    texts = [str(text or "").strip() for _, text, _ in sections]
+    needs = [count_tokens(text) for text in texts]
+    priorities = [max(float(priority), 0.01) for _, _, priority in sections]
+
+    dropped = set()
+    while True:
+        allocation = _allocate([0 if i in dropped else need for i, need in enumerate(needs)], priorities, budget_tokens)
+        too_small = {i for i, tokens in enumerate(allocation) if i not in dropped and tokens < min(min_tokens, needs[i])}
+        if not too_small:
+            break
+        # Bỏ phần ít ưu tiên nhất trong số phần không đủ chỗ rồi chia lại.
+        dropped.add(min(too_small, key=lambda i: priorities[i]))
+
+    results, report = [], []
+    for i, (name, _, _) in enumerate(sections):
+        if i in dropped:
+            text, mode = DROPPED, "dropped"
+        else:
+            text, mode = condense(texts[i], allocation[i])
+        results.append(text)
+        report.append({"name": name, "tokens": needs[i], "kept": count_tokens(text) if mode != "dropped" else 0, "mode": mode})
+
+    used = sum(item["kept"] for item in report)
+    summary = {"budget": budget_tokens, "used": used, "utilization": round(used / budget_tokens, 3) if budget_tokens else 0,
+               "sections": report}
+    with _reports_lock:
+        _reports[task_name] = summary
+    now = time.perf_counter()
+    tracer.add_span("prompt_budget", "prompt", now, now, task=task_name, **summary)
+    shrunk = ", ".join(f"{item['name']} {item['tokens']}→{item['kept']} ({item['mode']})"
+                       for item in report if item["mode"] != "full")
+    logging.info(f"PromptBudget '{task_name}': {used}/{budget_tokens} token ({summary['utilization']:.0%})"
+                 + (f"; {shrunk}" if shrunk else ""))
+    return results
+
+
+def budget_reports() -> dict:
+    """Báo cáo sử dụng ngân sách gần nhất của từng task: {task: {budget, used, utilization, sections}}."""
+    with _reports_lock:
+        return dict(_reports)
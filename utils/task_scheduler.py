@@ -0,0 +1,649 @@
+# utils/task_scheduler.py
+
+import os
+import copy
+import time
+import functools
+import logging
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from memory.shared_memory import shared_memory
+from memory.checkpoint import hash_task_inputs
+from memory.build_cache import task_fingerprint
+from utils.file_writer import track_output_files
+from utils.tracing import tracer
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class MissingInputsError(RuntimeError):
+    """Prompt của task cần các key shared_memory chưa có giá trị (MAS_MISSING_INPUTS=skip)."""
+
+
+class DataflowError(RuntimeError):
+    """Một số nhóm của `run_dataflow` có task thất bại; `failed_groups` là tên các nhóm đó."""
+
+    def __init__(self, message: str, failed_groups: list):
+        super().__init__(message)
+        self.failed_groups = failed_groups
+
+
+_task_usage = {}
+_task_usage_lock = threading.Lock()
+
+
+_task_observers = []
+_task_observers_lock = threading.Lock()
+
+
+def observe_tasks(callback):
+    """
+    Đăng ký `callback(record)` được gọi sau mỗi task mà scheduler chạy, kể cả task thất bại hoặc lấy từ
+    checkpoint/cache, trên luồng vừa chạy task. `record` gồm task_id, phase, status ("completed"/"failed"),
+    source, start_s (theo `time.perf_counter`), wall_s và lượng request/token đo qua `LLMGateway.track_usage`.
+    Dùng cho benchmark (benchmarks/pipeline_benchmark.py); có hiệu lực với mọi lần chạy trong tiến trình.
+
+    Returns:
+        Hàm không tham số để hủy đăng ký.
+    """
+    with _task_observers_lock:
+        _task_observers.append(callback)
+
+    def unsubscribe():
+        with _task_observers_lock:
+            if callback in _task_observers:
+                _task_observers.remove(callback)
+    return unsubscribe
+
+
+def pop_task_usage(task) -> dict | None:
+    """
+    Lấy (và xóa) lượng request/token đo qua gateway của lần chạy LLM gần nhất của `task`
+    (xem `LLMGateway.track_usage`); None nếu task chưa gọi LLM (dùng checkpoint, precheck hoặc cache).
+    """
+    with _task_usage_lock:
+        entry = _task_usage.pop(id(task), None)
+    # Giữ tham chiếu tới task trong entry nên id không bị task khác dùng lại khi entry còn đó.
+    return entry[1] if entry is not None and entry[0] is task else None
+
+
+def implicit_predecessor(tasks: list, i: int) -> int | None:
+    """
+    Task liền trước mà task `i` nhận output làm ngữ cảnh ngầm, hoặc None.
+
+    Với `Process.sequential`, CrewAI truyền output của task chạy ngay trước cho mọi task không khai báo
+    `context` (None hoặc rỗng); scheduler giữ đúng hành vi đó bằng một cạnh phụ thuộc tới task liền trước.
+    """
+    return i - 1 if i > 0 and not tasks[i].context else None
+
+
+def build_dependency_graph(tasks: list, chain: bool = True) -> dict[int, set[int]]:
+    """
+    Dựng đồ thị phụ thuộc từ thuộc tính `context` của các task.
+
+    Trả về dict: chỉ số task -> tập chỉ số các task (trong cùng danh sách) mà nó phụ thuộc.
+    Các task trong `context` nằm ngoài danh sách (ví dụ thuộc phase trước) được coi là đã hoàn thành.
+    Nếu `chain`, task không có `context` phụ thuộc vào task liền trước (`implicit_predecessor`).
+    """
+    index_of = {id(task): i for i, task in enumerate(tasks)}
+    graph = {}
+    for i, task in enumerate(tasks):
+        deps = set()
+        for upstream in (task.context or []):
+            j = index_of.get(id(upstream))
+            if j is not None and j != i:
+                deps.add(j)
+        previous = implicit_predecessor(tasks, i) if chain else None
+        if previous is not None:
+            deps.add(previous)
+        graph[i] = deps
+    return graph
+
+
+def _find_cycle(graph: dict[int, set[int]]) -> list[int] | None:
+    """Tìm một chu trình trong đồ thị phụ thuộc (nếu có) để báo lỗi rõ ràng."""
+    visiting, done = set(), set()
+
+    def visit(node, path):
+        visiting.add(node)
+        path.append(node)
+        for dep in graph[node]:
+            if dep in visiting:
+                return path[path.index(dep):] + [dep]
+            if dep not in done:
+                cycle = visit(dep, path)
+                if cycle:
+                    return cycle
+        visiting.discard(node)
+        done.add(node)
+        path.pop()
+        return None
+
+    for node in graph:
+        if node not in done:
+            cycle = visit(node, [])
+            if cycle:
+                return cycle
+    return None
+
+
+def _task_output(task, output: str):
+    # CrewAI và LLM gateway chỉ được import khi một task thực sự chạy: đồ thị, dataflow và prompt lười
+    # của scheduler dùng được (và kiểm thử được) mà không cần cài chúng.
+    from crewai.tasks.task_output import TaskOutput
+    return TaskOutput(description=task.description, exported_output=output, raw_output=output)
+
+
+def _restore_task(task, record: dict) -> str:
+    """Nạp lại kết quả đã lưu của một task (các key shared_memory và task.output) thay vì gọi LLM."""
+    for phase, key, value in record["memory"]:
+        shared_memory.set(phase, key, value)
+    output = record["output"]
+    task.output = _task_output(task, output)
+    return output
+
+
+def _complete_task(task, output: str) -> str:
+    """Hoàn thành task với output có sẵn: gán task.output và chạy callback như khi LLM trả lời."""
+    task.output = _task_output(task, output)
+    if task.callback:
+        task.callback(task.output)
+    return output
+
+
+def _execute_task(task, task_id: str = None, checkpoint=None, cache=None, submitted_at: float = None,
+                  materialize=None, context: str = None):
+    """
+    Thực thi một task trên bản sao nông của agent.
+
+    Nhiều task của cùng một phase dùng chung một agent; CrewAI gắn executor và task hiện tại
+    vào chính instance agent, nên mỗi luồng cần một bản sao riêng để không ghi đè lẫn nhau.
+    LLM của bản sao được thay bằng LLM của tier mà `model_router` chọn cho task.
+
+    `context` là output của task liền trước (xem `implicit_predecessor`), truyền cho `task.execute`
+    như `Process.sequential` của CrewAI; task có `context` riêng thì CrewAI tự ghép output của các task đó.
+
+    Task chạy trong `shared_memory.isolated()`: mọi lần đọc thấy snapshot chụp lúc task bắt đầu;
+    nếu một key đã đọc bị task khác ghi lại trong lúc chạy, cảnh báo được ghi vào log và trace.
+
+    Nếu có `materialize` (xem `TaskGroup.materialize`), mô tả của task được render lại từ snapshot
+    ngay trước khi tra cứu cache và gọi LLM, nên prompt chứa giá trị upstream mới nhất.
+
+    Thứ tự tra cứu trước khi gọi LLM:
+    1. checkpoint của lần chạy hiện tại (resume): task đã hoàn thành được bỏ qua.
+    2. `task.precheck()` (nếu có): trả về output thì task hoàn thành ngay, không gọi LLM.
+    3. build cache: task có cùng fingerprint ở bất kỳ lần chạy nào được tái sử dụng, kể cả file output.
+    Task chạy thật được ghi vào cả hai, cùng các key shared_memory và file mà callback của nó đã ghi.
+
+    Khi tracing bật, task được ghi thành một span (kèm thời gian chờ trong hàng đợi từ `submitted_at`,
+    token, retries và số byte đã ghi của các lời gọi con). Các observer đăng ký qua `observe_tasks`
+    nhận một bản ghi thời gian và token của task khi nó kết thúc.
+    """
+    if submitted_at is not None:
+        tracer.add_span(f"{task_id} (chờ)", "queue", submitted_at, time.perf_counter(), task_id=task_id)
+    with _task_observers_lock:
+        observers = list(_task_observers)
+    if not observers:
+        return _run_task(task, task_id, checkpoint, cache, materialize, context, {})
+
+    from utils.llm_gateway import get_gateway
+    started = time.perf_counter()
+    info = {}
+    status = "failed"
+    with get_gateway().track_usage() as usage:
+        try:
+            result = _run_task(task, task_id, checkpoint, cache, materialize, context, info)
+            status = "completed"
+            return result
+        finally:
+            record = {"task_id": task_id, "phase": (task_id or "").split("#", 1)[0], "status": status,
+                      "source": info.get("source"), "start_s": started,
+                      "wall_s": round(time.perf_counter() - started, 4), **usage}
+            for observer in observers:
+                try:
+                    observer(record)
+                except Exception as e:
+                    logging.error(f"Observer của task '{task_id}' lỗi: {e}")
+
+
+def _run_task(task, task_id: str, checkpoint, cache, materialize, context: str, info: dict):
+    """Thân của `_execute_task`; `info` nhận các thuộc tính của span task (ví dụ "source") cho observer."""
+    name = task_id or str(task.description)[:60]
+    with tracer.span(name, "task", phase=name.rsplit("#", 1)[0], agent=getattr(task.agent, "role", None)) as span, \
+            shared_memory.isolated() as view:
+        if materialize is not None:
+            _check_missing_inputs(task_id, materialize(task), span)
+        span["prompt"] = str(task.description)[:120]
+        result = _run_or_reuse(task, task_id, checkpoint, cache, span, context)
+        stale = view.changed_keys()
+        if stale and span.get("source") == "llm":
+            # Task đã đọc một snapshot; các key này bị task khác ghi lại trong lúc nó chạy.
+            logging.warning(f"Task '{task_id}': đầu vào thay đổi trong lúc chạy: {stale}")
+            span["stale_inputs"] = [f"{phase}.{key}" for phase, key in stale]
+        info.update(span)
+        return result
+
+
+def _check_missing_inputs(task_id: str, missing: list, span: dict):
+    """
+    Xử lý các key đầu vào chưa có giá trị theo MAS_MISSING_INPUTS: "warn" (mặc định, vẫn chạy
+    với placeholder trong prompt) hoặc "skip" (không gọi LLM, task được coi là thất bại).
+    """
+    if not missing:
+        return
+    span["missing_inputs"] = [f"{phase}.{key}" for phase, key in missing]
+    if os.getenv("MAS_MISSING_INPUTS", "warn") == "skip":
+        raise MissingInputsError(f"Task '{task_id}' thiếu đầu vào: {missing}")
+    logging.warning(f"Task '{task_id}' chạy với đầu vào chưa có: {missing}")
+
+
+def _run_or_reuse(task, task_id: str, checkpoint, cache, span: dict, context: str = None):
+    input_hash = None
+    if checkpoint is not None:
+        input_hash = hash_task_inputs(task, context)
+        record = checkpoint.get(task_id, input_hash)
+        if record is not None:
+            logging.info(f"Checkpoint: bỏ qua '{task_id}' (đã hoàn thành trước đó).")
+            span["source"] = "checkpoint"
+            return _restore_task(task, record)
+
+    # Task có `precheck` (ví dụ review của quality gate) có thể cho ra output mà không cần gọi LLM.
+    precheck = getattr(task, "precheck", None)
+    output = precheck() if precheck is not None else None
+    # Tier model của task theo config/model_routing.yaml; None thì giữ LLM của agent.
+    from utils.model_router import model_router
+    from utils.llm_gateway import get_gateway
+    llm = model_router.llm_for(task) if output is None else None
+    fingerprint = task_fingerprint(task, llm, context) if cache is not None and output is None else None
+    entry = cache.get(fingerprint) if fingerprint is not None else None
+    if output is not None:
+        logging.info(f"Precheck: '{task_id}' hoàn thành không cần LLM.")
+        span["source"] = "precheck"
+        with shared_memory.track_writes() as writes:
+            result = _complete_task(task, output)
+    elif entry is not None:
+        logging.info(f"BuildCache: tái sử dụng '{task_id}' (đầu vào không đổi).")
+        span["source"] = "cache"
+        result = _restore_task(task, entry)
+        cache.restore_files(entry)
+        writes = entry["memory"]
+    else:
+        span["source"] = "llm"
+        agent = copy.copy(task.agent) if task.agent is not None else None
+        if agent is not None and llm is not None:
+            agent.llm = llm
+            span["model"] = llm.model
+        # File output chỉ cần ghi nhận (lưu vào kho artifact) khi có build cache để tái sử dụng.
+        with shared_memory.track_writes() as writes, track_output_files() if cache is not None else nullcontext() as files, \
+                get_gateway().track_usage() as usage:
+            result = task.execute(agent=agent, context=context)
+        with _task_usage_lock:
+            _task_usage[id(task)] = (task, usage)
+        if cache is not None:
+            output = task.output.raw_output if task.output is not None else result
+            cache.put(fingerprint, str(output), writes, files)
+
+    if checkpoint is not None:
+        output = task.output.raw_output if task.output is not None else result
+        checkpoint.record(task_id, input_hash, str(output), writes)
+    return result
+
+
+class TaskGroup:
+    """
+    Một nhóm task được tạo bởi cùng một hàm factory (thường là toàn bộ một phase).
+
+    Args:
+        name (str): Tên hiển thị của nhóm, ví dụ "Giai đoạn 6: Triển khai (Deployment)".
+        build (callable): Hàm không tham số trả về danh sách task của nhóm.
+        writes (set[str]): Các phase trong shared_memory mà nhóm này ghi kết quả vào.
+        lazy (bool): Render lại prompt của từng task ngay trước khi chạy (`materialize`).
+            Mặc định lấy từ biến môi trường MAS_LAZY_PROMPTS (bật).
+    """
+
+    def __init__(self, name: str, build, writes: set = None, lazy: bool = None):
+        self.name = name
+        self.build = build
+        self.writes = set(writes or ())
+        self.reads = set()
+        self.lazy = lazy if lazy is not None else os.getenv("MAS_LAZY_PROMPTS", "1") == "1"
+        self._built = None
+        self._build_lock = threading.Lock()
+
+    @property
+    def materializer(self):
+        """Hàm truyền cho `run_tasks`/`_DagRunner.add`, hoặc None nếu nhóm không dùng prompt lười."""
+        return self.materialize if self.lazy else None
+
+    def materialize(self, task, index: int) -> list:
+        """
+        Render lại mô tả của `task` (vị trí `index` trong nhóm) từ trạng thái shared_memory hiện tại,
+        ngay trước khi task chạy, để prompt chứa dữ liệu upstream mới nhất.
+
+        Task có `template` (tasks/template_task.py) chỉ render template của chính nó: các key đọc trong lần
+        render đó là đầu vào của riêng task này. Task không có template (factory nhúng giá trị vào f-string
+        lúc dựng) được lấy từ một lần dựng lại cả factory; lần dựng đó được dùng lại cho các task khác của
+        nhóm cho đến khi một key mà factory đã đọc được ghi lại.
+
+        Returns:
+            list: Các (phase, key) ngoài các phase của nhóm mà prompt cần nhưng chưa có giá trị. Với task
+                  không có template, không biết key nào thuộc task nào nên đó là mọi key thiếu của nhóm.
+        """
+        template = getattr(task, "template", None)
+        if template is not None:
+            with shared_memory.track_reads() as reads:
+                task.description = template()
+            return self._missing(reads)
+
+        with self._build_lock:
+            if self._built is None or any(shared_memory.version_of(*read) != version
+                                          for read, version in self._built[0].items()):
+                before = shared_memory.snapshot()
+                with shared_memory.track_reads() as reads:
+                    tasks = self.build()
+                self._built = ({read: before.version_of(*read) for read in reads}, tasks, self._missing(reads))
+            _, tasks, missing = self._built
+        if index >= len(tasks):
+            return []
+        task.description = tasks[index].description
+        task.expected_output = tasks[index].expected_output
+        return missing
+
+    def _missing(self, reads) -> list:
+        # Key trong các phase nhóm tự ghi do task trước trong nhóm tạo ra (thứ tự theo `context`).
+        return sorted((p, k) for p, k in reads if p not in self.writes and shared_memory.get(p, k) is None)
+
+    def discover_reads(self):
+        """
+        Dựng thử các task để ghi lại các key shared_memory mà factory đọc.
+        Các task tạo ra ở bước này bị bỏ đi; nhóm sẽ được dựng lại khi đầu vào đã sẵn sàng.
+        """
+        with shared_memory.track_reads() as reads:
+            self.build()
+        self.reads = {(phase, key) for phase, key in reads if phase not in self.writes}
+        return self.reads
+
+
+class _DagRunner:
+    """Bộ chạy đồ thị task dùng chung cho `run_tasks` và `run_dataflow`; task có thể được thêm dần."""
+
+    def __init__(self, pool, checkpoint=None, cache=None, on_task_done=None):
+        self.pool = pool
+        self.checkpoint = checkpoint
+        self.cache = cache
+        self.on_task_done = on_task_done
+        self.tasks = []
+        self.task_ids = []
+        self.materializers = []
+        self.predecessors = []
+        self.dependents = {}
+        self.remaining = {}
+        self.results = {}
+        self.failed = set()
+        self.skipped = set()
+        self.running = {}
+        self.first_error = None
+        # Lô gốc sở hữu mỗi task (vị trí task đầu của lô) và các task của từng lô gốc, gồm cả lô sửa lại.
+        self.owners = []
+        self.batches = {}
+        # Task reduce -> task reduce của lô sửa lại thay thế kết luận của nó.
+        self.superseded = {}
+
+    def add(self, tasks: list, name: str = "", materialize=None, owner: int = None, chain: bool = True) -> list[int]:
+        """
+        Thêm một lô task (phụ thuộc lẫn nhau qua `context`) và đưa các task sẵn sàng vào pool.
+        Mỗi task được định danh ổn định là "<name>#<vị trí trong lô>" để dùng cho checkpoint.
+        `materialize` (nếu có) render lại prompt của task ngay trước khi nó chạy.
+        `owner` là lô gốc mà lô này thuộc về (lô sửa lại của quality gate); mặc định là một lô gốc mới.
+        `chain`: task không có `context` nhận output của task liền trước trong lô (xem `build_dependency_graph`).
+        """
+        offset = len(self.tasks)
+        graph = build_dependency_graph(tasks, chain)
+        cycle = _find_cycle(graph)
+        if cycle:
+            raise ValueError(f"Phát hiện phụ thuộc vòng giữa các task: {' -> '.join(map(str, cycle))}")
+        self.tasks.extend(tasks)
+        self.task_ids.extend(f"{name}#{i}" for i in graph)
+        self.materializers.extend(
+            functools.partial(materialize, index=i) if materialize is not None else None for i in graph
+        )
+        for i in graph:
+            previous = implicit_predecessor(tasks, i) if chain else None
+            self.predecessors.append(offset + previous if previous is not None else None)
+        indices = [offset + i for i in graph]
+        owner = offset if owner is None else owner
+        self.owners.extend(owner for _ in graph)
+        self.batches.setdefault(owner, []).extend(indices)
+        for i in graph:
+            self.dependents[offset + i] = set()
+        for i, deps in graph.items():
+            for d in deps:
+                self.dependents[offset + d].add(offset + i)
+            self.remaining[offset + i] = len(deps)
+        self._submit_ready(indices)
+        return indices
+
+    def is_settled(self, i: int) -> bool:
+        return i in self.results or i in self.failed or i in self.skipped
+
+    def batch_of(self, indices: list) -> list[int]:
+        """Mọi task của lô gốc chứa `indices` (kể cả các lô sửa lại được thêm sau); [] nếu lô rỗng."""
+        return list(self.batches[self.owners[indices[0]]]) if indices else []
+
+    def final(self, i: int) -> int:
+        """Task mang kết quả cuối cùng thay cho `i`: task reduce cuối của chuỗi sửa lại bắt đầu từ `i`."""
+        while i in self.superseded:
+            i = self.superseded[i]
+        return i
+
+    def _submit_ready(self, candidates):
+        for i in sorted(candidates):
+            if self.remaining[i] == 0 and i not in self.skipped:
+                previous = self.predecessors[i]
+                context = self.results.get(previous) if previous is not None else None
+                future = self.pool.submit(_execute_task, self.tasks[i], self.task_ids[i], self.checkpoint, self.cache,
+                                          time.perf_counter(), self.materializers[i], context)
+                if self.on_task_done is not None:
+                    future.add_done_callback(lambda _: self.on_task_done())
+                self.running[future] = i
+
+    def _skip_downstream(self, i: int):
+        stack = list(self.dependents[i])
+        while stack:
+            j = stack.pop()
+            if j not in self.skipped:
+                self.skipped.add(j)
+                stack.extend(self.dependents[j])
+
+    def wait_any(self, timeout: float = None):
+        """
+        Chờ ít nhất một task đang chạy kết thúc (tối đa `timeout` giây; 0 = chỉ thu các task đã xong),
+        rồi mở khóa các task phụ thuộc vào nó.
+        """
+        finished, _ = wait(self.running, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in finished:
+            i = self.running.pop(future)
+            try:
+                self.results[i] = future.result()
+            except Exception as e:
+                logging.error(f"Task '{self.task_ids[i]}' thất bại: {e}")
+                self.failed.add(i)
+                self.first_error = self.first_error or e
+                self._skip_downstream(i)
+                continue
+            self._add_rework(i)
+            ready = set()
+            for j in self.dependents[i]:
+                self.remaining[j] -= 1
+                if self.remaining[j] == 0:
+                    ready.add(j)
+            self._submit_ready(ready)
+
+    def _add_rework(self, i: int):
+        """
+        Task có hook `rework` (ví dụ task reduce của quality gate) được hỏi sau khi hoàn thành; các task
+        nó trả về được thêm vào đồ thị như một lô mới "<task_id>~rework", nên định danh ổn định khi resume.
+        Lô mới thuộc cùng lô gốc với task, và task cuối của nó (reduce mới) thay kết luận của task.
+        Task trong lô sửa lại không nhận output của task liền trước: thứ tự trong lô không phải thứ tự SDLC.
+        """
+        rework = getattr(self.tasks[i], "rework", None)
+        if rework is None:
+            return
+        try:
+            tasks = rework()
+        except Exception as e:
+            logging.error(f"Không tạo được task sửa lại sau '{self.task_ids[i]}': {e}")
+            return
+        if tasks:
+            indices = self.add(tasks, f"{self.task_ids[i]}~rework", owner=self.owners[i], chain=False)
+            self.superseded[i] = indices[-1]
+
+    def finish(self):
+        """Báo các task bị bỏ qua và ném lại lỗi đầu tiên (nếu có)."""
+        if self.skipped:
+            logging.warning(f"Bỏ qua {len(self.skipped)} task do task phụ thuộc thất bại: {sorted(self.skipped)}")
+        if self.first_error is not None:
+            raise self.first_error
+
+
+def run_tasks(tasks: list, max_workers: int = DEFAULT_MAX_WORKERS, checkpoint=None, cache=None,
+              name: str = "", materialize=None) -> str | None:
+    """
+    Chạy các task theo đồ thị `context` trên một pool luồng giới hạn.
+
+    Một task được đưa vào pool ngay khi mọi task nó phụ thuộc đã hoàn thành, nên các task độc lập
+    (ví dụ dfd/db/api/security/hld trong Design) chờ LLM song song với nhau. Task không khai báo `context`
+    chờ và nhận output của task liền trước như `Process.sequential` của CrewAI, nên với `max_workers=1`
+    mọi task nhận đúng prompt và ngữ cảnh như khi chạy bằng `Crew.kickoff()`.
+    Nếu một task lỗi, các task phụ thuộc vào nó bị bỏ qua; lỗi đầu tiên được ném lại sau khi
+    các task đang chạy kết thúc.
+
+    Args:
+        checkpoint (RunCheckpoint): Nếu có, task đã hoàn thành được bỏ qua và task mới được ghi lại.
+        cache (BuildCache): Nếu có, task có fingerprint không đổi được tái sử dụng thay vì sinh lại.
+        name (str): Tên nhóm task, dùng làm tiền tố định danh task trong checkpoint.
+        materialize (callable): `TaskGroup.materializer`; render lại prompt từng task ngay trước khi chạy.
+
+    Returns:
+        Output của task cuối cùng trong danh sách (tương đương kết quả `Crew.kickoff()`); nếu task đó
+        có lô sửa lại thì là output của task reduce cuối cùng trong chuỗi.
+    """
+    if not tasks:
+        return None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="task") as pool:
+        runner = _DagRunner(pool, checkpoint, cache)
+        runner.add(tasks, name, materialize)
+        while runner.running:
+            runner.wait_any()
+
+    runner.finish()
+    return runner.results.get(runner.final(len(tasks) - 1))
+
+
+def _group_ready(group: TaskGroup, unfinished: list) -> bool:
+    """
+    Một nhóm sẵn sàng khi mọi key nó đọc đã có trong shared_memory, hoặc không còn nhóm
+    chưa hoàn thành nào có thể ghi key đó (key sẽ không bao giờ xuất hiện).
+    """
+    for phase, key in group.reads:
+        if key in shared_memory.get_phase_data(phase):
+            continue
+        if any(phase in other.writes for other in unfinished if other is not group):
+            return False
+    return True
+
+
+def run_dataflow(groups: list, max_workers: int = DEFAULT_MAX_WORKERS, checkpoint=None, cache=None) -> dict:
+    """
+    Chạy toàn bộ dự án theo luồng dữ liệu thay vì rào chắn giữa các phase.
+
+    Đầu vào của mỗi nhóm được suy ra từ các lời gọi `shared_memory.get` của factory.
+    Một nhóm được dựng (để prompt nhúng giá trị thật) và đưa vào pool chung ngay khi các key
+    nó đọc đã tồn tại, kể cả khi các task khác của phase trước vẫn đang chạy; với prompt lười
+    (`TaskGroup.lazy`), mỗi task còn được render lại ngay trước khi chạy. Vòng điều phối
+    không thăm dò: nó ngủ cho đến khi một key được đăng ký (`shared_memory.subscribe`) được ghi
+    hoặc một task kết thúc.
+    Vì vậy độ trễ toàn trình bị chặn bởi đường găng thay vì tổng thời gian các phase.
+    Một nhóm chỉ hoàn thành khi cả các lô sửa lại của quality gate trong nhóm đã kết thúc.
+
+    Args:
+        checkpoint (RunCheckpoint): Nếu có, task đã hoàn thành được bỏ qua và task mới được ghi lại.
+        cache (BuildCache): Nếu có, task có fingerprint không đổi được tái sử dụng thay vì sinh lại.
+
+    Returns:
+        dict: tên nhóm -> output task cuối cùng của nhóm, sau mọi vòng sửa lại (None nếu nhóm lỗi).
+
+    Raises:
+        DataflowError: Có nhóm dựng lỗi hoặc có task thất bại/bị bỏ qua (lỗi gốc nằm trong `__cause__`).
+    """
+    for group in groups:
+        group.discover_reads()
+        logging.info(f"[dataflow] {group.name} đọc: {sorted(group.reads) or 'không có'}")
+
+    pending = list(groups)
+    started = {}
+    build_errors = {}
+    outputs = {}
+    wake = threading.Event()
+    subscriptions = [
+        shared_memory.subscribe(phase, key, lambda *_: wake.set())
+        for phase, key in {read for group in groups for read in group.reads}
+    ]
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="task") as pool:
+            runner = _DagRunner(pool, checkpoint, cache, on_task_done=wake.set)
+
+            def unfinished():
+                return pending + [g for g, idx in started.items()
+                                  if not all(runner.is_settled(i) for i in runner.batch_of(idx))]
+
+            def start(group):
+                logging.info(f"[dataflow] Bắt đầu {group.name}")
+                try:
+                    started[group] = runner.add(group.build(), group.name, group.materializer)
+                except Exception as e:
+                    logging.error(f"Lỗi khi dựng {group.name}: {e}")
+                    started[group] = []
+                    build_errors[group] = e
+
+            while pending or runner.running:
+                for group in list(pending):
+                    if _group_ready(group, unfinished()):
+                        pending.remove(group)
+                        start(group)
+
+                if runner.running:
+                    # Xóa cờ trước khi thu task và kiểm tra lại, nên sự kiện đến sau đó không bị bỏ lỡ.
+                    wake.wait()
+                    wake.clear()
+                    runner.wait_any(timeout=0)
+                elif pending:
+                    # Không còn task nào đang chạy mà vẫn có nhóm chờ nhau: chạy với dữ liệu hiện có.
+                    group = pending.pop(0)
+                    logging.warning(f"[dataflow] {group.name} chờ key chưa được ghi; chạy với dữ liệu hiện có.")
+                    start(group)
+    finally:
+        for unsubscribe in subscriptions:
+            unsubscribe()
+
+    failed_groups = []
+    for group, indices in started.items():
+        outputs[group.name] = runner.results.get(runner.final(indices[-1])) if indices else None
+        indices = runner.batch_of(indices)
+        if group in build_errors or any(i in runner.failed or i in runner.skipped for i in indices):
+            logging.error(f"[dataflow] {group.name} có task thất bại hoặc bị bỏ qua.")
+            failed_groups.append(group.name)
+        else:
+            logging.info(f"[dataflow] Hoàn thành {group.name}.")
+    try:
+        runner.finish()
+    except Exception as e:
+        raise DataflowError(f"{len(failed_groups)}/{len(groups)} nhóm thất bại: {e}", failed_groups) from e
+    if build_errors:
+        first = next(iter(build_errors.values()))
+        raise DataflowError(f"{len(failed_groups)}/{len(groups)} nhóm thất bại: {first}", failed_groups) from first
+    return outputs
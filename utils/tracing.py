@@ -0,0 +1,129 @@
+# utils/tracing.py
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+
+class Tracer:
+    """
+    Ghi lại các span (task, lời gọi LLM, SharedMemory.set/get, write_output) của một lần chạy.
+
+    Khi chưa bật (`enable`), `span` không ghi gì và gần như không tốn chi phí. Mỗi span gồm
+    tên, nhóm (cat), luồng, thời điểm bắt đầu/kết thúc và các thuộc tính (token, retries, bytes...).
+    Các số đếm cộng qua `accumulate` được cộng vào mọi span đang mở trong luồng hiện tại, nhờ đó
+    span của task tổng hợp được token và số byte mà các lời gọi con đã dùng.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self.origin = time.perf_counter()
+        self.origin_epoch = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def enable(self):
+        """Bật tracing và xóa các span của lần chạy trước."""
+        with self._lock:
+            self.spans = []
+            self.origin = time.perf_counter()
+            self.origin_epoch = time.time()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args):
+        """Đo một khối code; `args` trả về có thể được cập nhật bên trong khối `with`."""
+        if not self.enabled:
+            yield args
+            return
+        stack = self._stack()
+        stack.append(args)
+        start = time.perf_counter()
+        try:
+            yield args
+        except Exception as e:
+            args["error"] = str(e)
+            raise
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            self.add_span(name, cat, start, end, **args)
+
+    def add_span(self, name: str, cat: str, start: float, end: float, **args):
+        """Ghi một span đã biết thời điểm (theo `time.perf_counter`), ví dụ thời gian task chờ trong hàng đợi."""
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        record = {
+            "name": name,
+            "cat": cat,
+            "start_s": round(start - self.origin, 6),
+            "end_s": round(end - self.origin, 6),
+            "duration_s": round(end - start, 6),
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "thread": thread.name,
+            "args": args,
+        }
+        with self._lock:
+            self.spans.append(record)
+
+    def accumulate(self, **counters):
+        """Cộng các số đếm (ví dụ prompt_tokens=120) vào mọi span đang mở trong luồng hiện tại."""
+        if not self.enabled:
+            return
+        for args in self._stack():
+            for key, amount in counters.items():
+                args[key] = args.get(key, 0) + amount
+
+    def export(self, directory: str) -> tuple[str, str]:
+        """
+        Ghi `trace.jsonl` (mỗi dòng một span) và `trace.json` (định dạng Chrome trace event,
+        mở bằng chrome://tracing hoặc https://ui.perfetto.dev) vào `directory`.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_s"])
+        jsonl_path = os.path.join(directory, "trace.jsonl")
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span, ensure_ascii=False, default=str) + "\n")
+
+        events, threads = [], {}
+        for span in spans:
+            threads[(span["pid"], span["tid"])] = span["thread"]
+            events.append({
+                "name": span["name"],
+                "cat": span["cat"],
+                "ph": "X",
+                "ts": round(span["start_s"] * 1e6, 1),
+                "dur": round(span["duration_s"] * 1e6, 1),
+                "pid": span["pid"],
+                "tid": span["tid"],
+                "args": span["args"],
+            })
+        for (pid, tid), thread_name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+        chrome_path = os.path.join(directory, "trace.json")
+        with open(chrome_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"started_at": self.origin_epoch}}, f, ensure_ascii=False, default=str)
+        logging.info(f"Tracing: đã ghi {len(spans)} span vào {jsonl_path} và {chrome_path}.")
+        return jsonl_path, chrome_path
+
+
+# Khởi tạo instance duy nhất
+tracer = Tracer()